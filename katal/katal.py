@@ -37,24 +37,47 @@
         see README.md for more documentation.
 """
 import argparse
-from base64 import b64encode
-from collections import namedtuple
+from array import array
+import atexit
+from base64 import b64decode, b64encode
+from bisect import bisect_left, bisect_right
+from collections import deque, namedtuple, OrderedDict
+import concurrent.futures
 import configparser
+import csv
 import ctypes
+import errno
 import hashlib
-from datetime import datetime
-import filecmp
+from datetime import datetime, timedelta
 import fnmatch
+import gzip
 import itertools
+import json
+import math
 import os
 import platform
 import re
 import shutil
 import sqlite3
+import struct
 import urllib.request
 import sys
+import threading
+import time
 import unicodedata
 
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, see copy_file__reflink() :
+    fcntl = None
+
+try:
+    import lzma
+except ImportError:
+    # Python may be compiled without it, see get_logfile_compression() :
+    lzma = None
+
 #===============================================================================
 # project's settings
 #
@@ -89,11 +112,27 @@ CFG_PARAMETERS = None  # see documentation:configuration file
 INFOS_ABOUT_SRC_PATH = (None, None, None)  # initialized by show_infos_about_source_path()
                                            # ((int)total_size, (int)files_number, (dict)extensions)
 
-TARGET_DB = dict()      # see documentation:database; initialized by read_target_db()
+TARGET_DB = None        # see documentation:database; initialized by read_target_db()
+                        # a TargetDB object (a LazyTargetDB object if the database
+                        # is too large)
+
+OTHER_TARGET_DBS = []   # initialized by read_target_db() : a list of LazyTargetDB
+                        # objects, one for each database listed in the
+                        # [database]other catalogues option.
 
 USE_LOGFILE = False     # (bool) initialized from the configuration file
 LOGFILE = None          # the file descriptor, initialized by logfile_opening()
 LOGFILE_SIZE = 0        # size of the current logfile.
+LOGFILE_BACKUPS = None  # a ThreadPoolExecutor (one thread) compressing and removing
+                        # the backuped log files, see backup_logfile().
+
+MSG_WRITER = None       # a MessageWriter object, initialized by main() : see msg().
+
+PROGRESS = None         # a Progress object while the progress line is displayed,
+                        # see progress_begin().
+
+IO_THROTTLE = None      # an IOThrottle object, initialized by main_warmup() : see
+                        # the io_throttle() function.
 
 SELECT = {}               # see documentation:selection; initialized by action__select()
 SELECT_SIZE_IN_BYTES = 0  # initialized by action__select()
@@ -121,37 +160,174 @@ SELECTELEMENT = namedtuple('SELECTELEMENT', ["fullname",
 # global constants : CST__*
 #===============================================================================
 
+# name of the journal written by action__add() in the CST__TASKS_SUBSUBDIR
+# directory, see action__add__resume() :
+CST__ADD_JOURNALNAME = "add.journal"
+
 # this minimal subset of characters are the only characters to be used in the
 # eval() function. Other characters are forbidden to avoid malicious code execution.
 # keywords an symbols : filter, parentheses, "and", "or", "not", "xor", "True", "False"
 #                       space, &, |, ^, (, ), 0, 1, 2, 3, 4, 5, 6, 7, 8, 9
 CST__AUTHORIZED_EVALCHARS = " TFasdlfiteruxnot0123456789&|^()"
 
+# Bloom filter (see the BloomFilter class) :
+#   o false positive rate
+#   o header of the file : magic string, capacity, number of bits, number of hashes,
+#     number of files, greatest rowid, number of removed files
+#   o magic string at the beginning of the file
+#   o minimal capacity (number of files)
+#   o name of the file stored in the CST__KATALSYS_SUBDIR directory
+#   o the filter is rebuilt if the number of removed files is greater than
+#     capacity*CST__BLOOMFILTER_REMOVEDRATIO
+CST__BLOOMFILTER_FALSEPOSITIVES = 0.01
+CST__BLOOMFILTER_HEADER = "<8sQQQQQQ"
+CST__BLOOMFILTER_MAGIC = b"KATALBF1"
+CST__BLOOMFILTER_MINCAPACITY = 100000
+CST__BLOOMFILTER_NAME = "katal.bloom"
+CST__BLOOMFILTER_REMOVEDRATIO = 0.25
+
+# the ways a file can be copied (see copy_file()) :
+CST__COPY_METHODS = ("copy", "reflink", "hardlink", "fastest")
+
+# the ways a file can be exported by --findtag --copyto (see get_copyto_mode()) :
+# a symbolic link is only allowed outside the target directory.
+CST__COPYTO_MODES = CST__COPY_METHODS + ("symlink",)
+
+# default values of the (optional) [database] section of the configuration file :
+# see the get_database_parameter() and db_connect() functions.
+CST__DATABASE_DEFAULTPARAMETERS = {"journal mode"             : "WAL",
+                                   "synchronous"              : "NORMAL",
+                                   "cache size"               : "65536",
+                                   "transaction batch size"   : "10000",
+                                   "transaction batch bytes"  : "1073741824",
+                                   "target db.max files in memory" : "1000000",
+                                   "shards"                   : "1",
+                                   "other catalogues"         : "",}
+
+# accepted values for [database]journal mode :
+CST__DATABASE_JOURNALMODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+
 CST__DATABASE_NAME = "katal.db"
 
+# maximal value of [database]shards : the shards are attached to the connection
+# opened on the main database and sqlite can't attach more than 10 databases.
+CST__DATABASE_SHARDS_MAX = 8
+
+# accepted values for [database]synchronous :
+CST__DATABASE_SYNCHRONOUSMODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# value of "PRAGMA user_version" in the databases whose hashids/partialhashids are
+# stored as raw digests (BLOBs) : older databases, whose user_version is 0, store
+# them as base64 strings. See the Catalogue class.
+CST__DATABASE_USERVERSION_BINARYDIGESTS = 1
+
+# number of source files compared at once with the database(s) by fill_select() :
+# see the thefileshavetobeadded__db() function.
+CST__DEDUPE_BATCH_SIZE = 10000
+
 CST__DEFAULT_CONFIGFILE_NAME = "katal.ini"
 
 CST__DEFAULTCFGFILE_URL = \
         "https://raw.githubusercontent.com/suizokukan/katal/master/katal/katal.ini"
 
+# size of a raw digest, in bytes; see the hashfile() function.
+CST__DIGEST_SIZE = hashlib.sha256().digest_size
+
 # date's string format used by Katal :
 CST__DTIME_FORMAT = "%Y-%m-%d %H:%M"  # e.g. "2015-09-17 20:01"
 
 # let's compute the length of such a string :
 CST__DTIME_FORMAT_LENGTH = len(datetime.strftime(datetime.now(), CST__DTIME_FORMAT))
 
+# ioctl() request cloning a file on Linux (btrfs, xfs, ...), see copy_file__reflink() :
+CST__FICLONE = 0x40049409
+
 # when the program verifies that there's enough free space on disk, it multiplies
 # the required amount of space by these coefficient
 CST__FREESPACE_MARGIN = 1.1
 
+# --exportdb/--importdb :
+#   o the columns written/read, in this order
+#   o the formats, according to the extension of the file
+#   o number of rows imported by transaction
+CST__IMPORTEXPORT_COLUMNS = ("hashid", "partialhashid", "size", "name",
+                             "sourcename", "sourcedate", "tagsstr")
+CST__IMPORTEXPORT_FORMATS = {".csv"   : "csv",
+                             ".jsonl" : "jsonl",
+                             ".json"  : "jsonl"}
+CST__IMPORT_TRANSACTION_SIZE = 100000
+
+# default values of the (optional) [io] section of the configuration file :
+# see the get_io_parameter() function.
+CST__IO_DEFAULTPARAMETERS = {"workers"                      : "4",
+                             "max bytes in flight"          : "268435456",
+                             "max read bytes per second"    : "0",
+                             "max written bytes per second" : "0",
+                             "max operations per second"    : "0",
+                             "priority"                     : "normal",
+                             "durability"                   : "none",
+                             "durability batch files"       : "1000",
+                             "durability batch bytes"       : "1073741824",}
+
+# accepted values for [io]durability, see the get_io_durability() function :
+CST__IO_DURABILITIES = ("none", "batch", "file")
+
+# options of the [io] section limiting the I/O (0 = no limit), see the IOThrottle
+# class : bytes read per second, bytes written per second, I/O operations per second.
+CST__IO_LIMITS = ("max read bytes per second",
+                  "max written bytes per second",
+                  "max operations per second")
+
+# accepted values for [io]priority, see the set_io_priority() function :
+CST__IO_PRIORITIES = ("normal", "low", "idle")
+
+# control file, stored in the CST__KATALSYS_SUBDIR directory, whose [io] section
+# may modify the I/O limits (see CST__IO_LIMITS) while Katal is running; it is
+# read again every CST__IOCONTROL_DELAY seconds if it has been modified. See
+# the IOThrottle class.
+CST__IOCONTROL_DELAY = 1.0
+CST__IOCONTROL_NAME = "io.ini"
+
+# number of the ioprio_set() system call (Linux), according to platform.machine() :
+# see the set_io_priority() function.
+CST__IOPRIO_SET_SYSCALLS = {"x86_64"  : 251,
+                            "i686"    : 289,
+                            "aarch64" : 30,
+                            "armv7l"  : 314}
+
 CST__KATALSYS_SUBDIR = ".katal"
 
 CST__LOG_SUBSUBDIR = "logs"
 
+# accepted values for [log file]compression and extension added to the name of
+# the compressed backuped log files, see backup_logfile__compress() :
+CST__LOGFILE_COMPRESSIONS = {"none" : "",
+                             "gzip" : ".gz",
+                             "lzma" : ".xz"}
+
+# default values of the optional options of the [log file] section, see
+# get_logfile_parameter() :
+CST__LOGFILE_DEFAULTPARAMETERS = {"compression"                 : "gzip",
+                                  "maximal number of backups"   : "10",
+                                  "maximal size of the backups" : "0"}
+
 CST__LOGFILE_DTIMEFORMATSTR = "%Y_%m_%d__%H%M%S__%f"  # constant of the time format added to old
                                                       # logfiles' filename .
                                                       # see the backup_logfile() function .
 
+# --maintenance :
+#   o maximal number of rows read in each index by ANALYZE (see "PRAGMA analysis_limit")
+#   o number of pages freed at once by an incremental vacuum : the time budget
+#     is checked between two steps.
+CST__MAINTENANCE_ANALYSISLIMIT = 1000
+CST__MAINTENANCE_VACUUMPAGES = 2000
+
+# MessageWriter class :
+#   o maximal number of messages written at once by the thread (and flushed once)
+#   o delay (in seconds) between two checks of the messages to be written
+CST__MSGWRITER_BATCHSIZE = 1000
+CST__MSGWRITER_DELAY = 0.05
+
 # suffix, multiple :
 # about the multiples of bytes, see e.g. https://en.wikipedia.org/wiki/Megabyte
 CST__MULTIPLES = (("kB", 1000),
@@ -176,18 +352,98 @@ CST__MULTIPLES = (("kB", 1000),
 # See the thefilehastobeadded__db() and the hashfile64() functions.
 CST__PARTIALHASHID_BYTESNBR = 1000000
 
+# Progress class : minimal delay (in seconds) between two refreshes of the
+# progress line.
+CST__PROGRESS_DELAY = 0.5
+
+# name of the journal written by action__rebaseinplace() in the CST__TASKS_SUBSUBDIR
+# directory, see action__rebaseinplace__resume() :
+CST__REBASEINPLACE_JOURNALNAME = "rebaseinplace.journal"
+
 # string used to create the database :
 CST__SQL__CREATE_DB = ('CREATE TABLE dbfiles ('
-                       'hashid varchar(44) PRIMARY KEY UNIQUE, '
-                       'partialhashid varchar(44), '
+                       'hashid BLOB PRIMARY KEY UNIQUE, '
+                       'partialhashid BLOB, '
                        'size INTEGER, '
                        'name TEXT UNIQUE, '
                        'sourcename TEXT, sourcedate INTEGER, tagsstr TEXT)')
 
+# string used to create the table storing the number of shards of a sharded
+# database (see the create_empty_db() function); this table only exists in the
+# main database.
+CST__SQL__CREATE_DBSHARDS = 'CREATE TABLE dbshards (number INTEGER)'
+
+# strings used to create the full-text index (see the create_fts_index() function) :
+#   o dbfiles_fts is an "external content" FTS5 table : the indexed strings are
+#     read from dbfiles, the index itself being stored in dbfiles_fts.
+#   o the three triggers keep dbfiles_fts up to date : every INSERT/UPDATE/DELETE
+#     on dbfiles (action__add(), the tags' actions, --rebase, --reset, ...) is
+#     automatically reported in the index.
+#   o {schema} is replaced by the name of the database (e.g. "main", see the
+#     Catalogue class) and {tokenizer} by the tokenizer (see CST__SQL__FTS_TOKENIZERS)
+CST__SQL__CREATE_FTS = (
+    "CREATE VIRTUAL TABLE {schema}.dbfiles_fts USING fts5("
+    "name, sourcename, tagsstr, content='dbfiles', content_rowid='rowid', "
+    "tokenize='{tokenizer}')",
+
+    "CREATE TRIGGER {schema}.dbfiles_fts__insert AFTER INSERT ON dbfiles BEGIN "
+    "INSERT INTO dbfiles_fts(rowid, name, sourcename, tagsstr) "
+    "VALUES (new.rowid, new.name, new.sourcename, new.tagsstr); END",
+
+    "CREATE TRIGGER {schema}.dbfiles_fts__delete AFTER DELETE ON dbfiles BEGIN "
+    "INSERT INTO dbfiles_fts(dbfiles_fts, rowid, name, sourcename, tagsstr) "
+    "VALUES ('delete', old.rowid, old.name, old.sourcename, old.tagsstr); END",
+
+    "CREATE TRIGGER {schema}.dbfiles_fts__update AFTER UPDATE OF name, sourcename, tagsstr "
+    "ON dbfiles BEGIN "
+    "INSERT INTO dbfiles_fts(dbfiles_fts, rowid, name, sourcename, tagsstr) "
+    "VALUES ('delete', old.rowid, old.name, old.sourcename, old.tagsstr); "
+    "INSERT INTO dbfiles_fts(rowid, name, sourcename, tagsstr) "
+    "VALUES (new.rowid, new.name, new.sourcename, new.tagsstr); END",)
+
+# string used to create the temporary table where the sizes/hashids of the source
+# files are written before being joined with the table dbfiles; see
+# Catalogue.known_sizes() and Catalogue.known_hashids().
+CST__SQL__CREATE_SCAN = 'CREATE TEMP TABLE IF NOT EXISTS scan (size INTEGER, hashid BLOB)'
+
+# strings used to create the temporary view named "dbfiles" which gathers the
+# files of all the shards of a sharded database : the queries reading the
+# table dbfiles read this view instead. See the db_connect() function.
+CST__SQL__CREATE_SHARDS_VIEW = 'CREATE TEMP VIEW dbfiles AS {0}'
+CST__SQL__CREATE_SHARDS_VIEW_SELECT = ('SELECT hashid, partialhashid, size, name, '
+                                       'sourcename, sourcedate, tagsstr FROM {0}.dbfiles')
+
+# string used to create the index on the size of the files; see LazyTargetDB.
+# {0} is replaced by the name of the database (e.g. "main").
+CST__SQL__CREATE_SIZE_INDEX = 'CREATE INDEX IF NOT EXISTS {0}.dbfiles__size ON dbfiles (size)'
+
+# strings used to drop the index on the size of the files and the full-text index
+# (before a bulk import, see action__importdb()); {0} is replaced by the name of
+# the database (e.g. "main").
+CST__SQL__DROP_SECONDARY_INDEXES = ("DROP INDEX IF EXISTS {0}.dbfiles__size",
+                                    "DROP TRIGGER IF EXISTS {0}.dbfiles_fts__insert",
+                                    "DROP TRIGGER IF EXISTS {0}.dbfiles_fts__delete",
+                                    "DROP TRIGGER IF EXISTS {0}.dbfiles_fts__update",
+                                    "DROP TABLE IF EXISTS {0}.dbfiles_fts")
+
+# tokenizers used by the full-text index, by order of preference :
+#   o "trigram" (sqlite >= 3.34) allows to search any substring (3 characters or more)
+#   o "unicode61" (older versions of sqlite) allows to search words and prefixes ("wed*")
+CST__SQL__FTS_TOKENIZERS = ("trigram", "unicode61")
+
+# size of the blocks read by strictcmp(), in bytes (a multiple of the page size) :
+CST__STRICTCMP_BLOCKSIZE = 1024*1024
+
 CST__TAG_SEPARATOR = ";"  # symbol used in the database between two tags.
 
+# accepted values for [target]mode :
+CST__TARGET_MODES = ("copy", "move", "nocopy") + CST__COPY_METHODS[1:]
+
 CST__TASKS_SUBSUBDIR = "tasks"
 
+# size of the blocks copied by copy_file__throttled(), in bytes :
+CST__THROTTLEDCOPY_BLOCKSIZE = 1024*1024
+
 CST__TRASH_SUBSUBDIR = "trash"
 
 # foreground colors :
@@ -203,237 +459,1930 @@ CST__LINUXCONSOLECOLORS = {
 CST__PLATFORM = platform.system()
 
 ################################################################################
-class KatalError(BaseException):
+class BloomFilter(object):
     """
-        KatalError class
+        BloomFilter class
 
-        A very basic class called when an error is raised by the program.
+        A Bloom filter over the sizes, the partial hashids and the hashids of the
+        files stored in a database, saved in the .katal directory next to the
+        database (see CST__BLOOMFILTER_NAME) : if the filter says that a file
+        isn't in the database, it's true and the database doesn't have to be
+        read. The answer "may be in the database" has to be checked.
+
+        A Bloom filter can't forget a file : the removed files are only counted
+        (see .removed) and the filter is rebuilt when they're too numerous. The
+        filter is rebuilt too if it doesn't match the database anymore (see
+        .files_number and .maxrowid) : see Catalogue.bloomfilter .
     """
     #///////////////////////////////////////////////////////////////////////////
-    def __init__(self, value):
-        BaseException.__init__(self)
-        self.value = value
+    def __init__(self, capacity):
+        """
+                PARAMETER :
+                    o capacity : (int) number of files expected in the filter;
+                                 three keys are added for each file.
+        """
+        self.capacity = capacity
+        self.bits_number = 8*max(1, int(-3*capacity*math.log(CST__BLOOMFILTER_FALSEPOSITIVES) /
+                                         math.log(2)**2/8))
+        self.hashes_number = max(1, round(self.bits_number/(3*capacity)*math.log(2)))
+        self.bits = bytearray(self.bits_number//8)
+
+        self.files_number = 0   # number of files in the database
+        self.maxrowid = 0       # greatest rowid in the database
+        self.removed = 0        # number of files removed from the database
+        self.modified = False   # has the filter to be written ?
+
     #///////////////////////////////////////////////////////////////////////////
-    def __str__(self):
-        return repr(self.value)
+    def _add(self, key):
+        """
+                Add (bytes)key to the filter.
+        """
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
 
-#///////////////////////////////////////////////////////////////////////////////
-def action__add():
+    #///////////////////////////////////////////////////////////////////////////
+    def _contains(self, key):
+        """
+                Return False if (bytes)key is certainly not in the filter.
+        """
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def _positions(self, key):
+        """
+                Yield the positions of the bits set for (bytes)key .
+        """
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        hash1 = int.from_bytes(digest[:8], "little")
+        hash2 = int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hashes_number):
+            yield (hash1 + index*hash2) % self.bits_number
+
+    #///////////////////////////////////////////////////////////////////////////
+    def add_file(self, size, partialhashid, hashid):
+        """
+                Add a file to the filter; partialhashid and hashid are raw
+                digests.
+        """
+        self._add(b"s" + size.to_bytes(8, "little"))
+        self._add(b"p" + partialhashid)
+        self._add(b"h" + hashid)
+        self.files_number += 1
+        self.modified = True
+
+    #///////////////////////////////////////////////////////////////////////////
+    def may_contain_hashid(self, hashid):
+        """
+                Return False if no file in the database has the (raw digest)
+                hashid <hashid>.
+        """
+        return self._contains(b"h" + hashid)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def may_contain_partialhashid(self, partialhashid):
+        """
+                Return False if no file in the database has the (raw digest)
+                partial hashid <partialhashid>.
+        """
+        return self._contains(b"p" + partialhashid)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def may_contain_size(self, size):
+        """
+                Return False if no file in the database has the size <size>.
+        """
+        return self._contains(b"s" + size.to_bytes(8, "little"))
+
+    #///////////////////////////////////////////////////////////////////////////
+    @staticmethod
+    def read(filename):
+        """
+                Read the filter stored in <filename>; return None if the file
+                doesn't exist or is ill-formed.
+        """
+        if not os.path.exists(filename):
+            return None
+
+        with open(filename, "rb") as bloomfile:
+            header = bloomfile.read(struct.calcsize(CST__BLOOMFILTER_HEADER))
+            bits = bloomfile.read()
+
+        if len(header) != struct.calcsize(CST__BLOOMFILTER_HEADER):
+            return None
+
+        magic, capacity, bits_number, hashes_number, files_number, maxrowid, removed = \
+            struct.unpack(CST__BLOOMFILTER_HEADER, header)
+
+        if magic != CST__BLOOMFILTER_MAGIC or capacity == 0:
+            return None
+
+        res = BloomFilter(capacity)
+        if (res.bits_number, res.hashes_number) != (bits_number, hashes_number) or \
+           len(bits) != len(res.bits):
+            return None
+
+        res.bits = bytearray(bits)
+        res.files_number = files_number
+        res.maxrowid = maxrowid
+        res.removed = removed
+        return res
+
+    #///////////////////////////////////////////////////////////////////////////
+    def write(self, filename):
+        """
+                Write the filter in <filename> .
+        """
+        with open(filename + ".tmp", "wb") as bloomfile:
+            bloomfile.write(struct.pack(CST__BLOOMFILTER_HEADER,
+                                        CST__BLOOMFILTER_MAGIC,
+                                        self.capacity,
+                                        self.bits_number,
+                                        self.hashes_number,
+                                        self.files_number,
+                                        self.maxrowid,
+                                        self.removed))
+            bloomfile.write(self.bits)
+        os.replace(filename + ".tmp", filename)
+
+        self.modified = False
+
+################################################################################
+class Catalogue(object):
     """
-        action__add()
-        ________________________________________________________________________
+        Catalogue class
 
-        Add the source files described in SELECT/SELECT_SIZE_IN_BYTES to the
-        target path.
-        ________________________________________________________________________
+        The database stored in a target directory (see documentation:database).
 
-        no PARAMETER
+        A Catalogue object owns one connection, opened by db_connect() the first
+        time it is required and kept open until close() is called : main()
+        creates one Catalogue object per run and gives it to the action__*()
+        functions.
 
-        RETURNED VALUE
-                (int) 0 if success, -1 if an error occured.
+        The queries return plain tuples made of the required columns only.
+
+        The hashids given to/returned by the methods are base64 strings (see
+        hashfile64()) whatever the way they are stored in the database : see
+        CST__DATABASE_USERVERSION_BINARYDIGESTS. files_for_targetdb(),
+        known_hashids() and known_sizes() use the raw digests (see hashfile()).
+
+        A sharded database (see create_empty_db()) is read through the temporary
+        view created by db_connect(); the methods modifying the database write
+        each record in its shard, chosen by the first byte of its hashid : see
+        _sharded_sqlorder().
+
+        The databases of the other target directories (see read_other_catalogues())
+        are opened read-only : their indexes aren't created and their Bloom
+        filter isn't written on disk.
     """
-    msg("  = copying data =")
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, db_name, readonly=False):
+        """
+                PARAMETERS :
+                    o db_name  : (str) the database's name, e.g. the string
+                                 returned by get_database_fullname()
+                    o readonly : (bool) True to open the database read-only
+        """
+        self.db_name = db_name
+        self.readonly = readonly
+        self._connection = None
+        self._binary_digests = False  # initialized by the connection property
+        self._bloomfilter = None      # initialized by the bloomfilter property
+        self._schemas = None          # initialized by the schemas property
 
-    db_connection = sqlite3.connect(get_database_fullname())
-    db_cursor = db_connection.cursor()
+    #///////////////////////////////////////////////////////////////////////////
+    @property
+    def connection(self):
+        """
+                Return the sqlite3.Connection object, opening the database if
+                required.
 
-    if get_disk_free_space(ARGS.targetpath) < SELECT_SIZE_IN_BYTES*CST__FREESPACE_MARGIN:
-        msg("    ! Not enough space on disk. Stopping the program.",
-            consolecolor="red")
-        # returned value : -1 = error
-        return -1
+                If --off has been used and if the database doesn't exist, an
+                empty database is created in memory : nothing is written on disk.
+        """
+        if self._connection is None:
+            if ARGS.off and not self.readonly and not self.exists():
+                self._connection = sqlite3.connect(":memory:")
+                self._connection.execute(CST__SQL__CREATE_DB)
+                self._connection.execute("PRAGMA user_version={0}".format(
+                    CST__DATABASE_USERVERSION_BINARYDIGESTS))
+            else:
+                self._connection = db_connect(self.db_name, readonly=self.readonly)
 
-    files_to_be_added = []
-    len_select = len(SELECT)
-    for index, hashid in enumerate(SELECT):
+            self._binary_digests = \
+                self._connection.execute("PRAGMA user_version").fetchone()[0] >= \
+                CST__DATABASE_USERVERSION_BINARYDIGESTS
 
-        complete_source_filename = SELECT[hashid].fullname
-        target_name = os.path.join(normpath(ARGS.targetpath), SELECT[hashid].targetname)
+        return self._connection
 
-        sourcedate = datetime.utcfromtimestamp(os.path.getmtime(complete_source_filename))
-        sourcedate = sourcedate.replace(second=0, microsecond=0)
+    #///////////////////////////////////////////////////////////////////////////
+    @property
+    def bloomfilter(self):
+        """
+                Return the BloomFilter object of the database, reading it from
+                the disk or building it if the file is missing, ill-formed, too
+                small or out of date.
+
+                The filter of a database opened read-only is never written on
+                disk (see close()) : instead of reading the whole database at
+                each run, None is returned if there's no up-to-date file, the
+                caller querying the database directly.
+        """
+        if self._bloomfilter is None:
+            bloomfilter = BloomFilter.read(self.bloomfilter_name)
+            files_number = self.count()
+
+            if bloomfilter is None or \
+               bloomfilter.files_number != files_number or \
+               bloomfilter.maxrowid != self._maxrowid() or \
+               bloomfilter.files_number > bloomfilter.capacity or \
+               bloomfilter.removed > bloomfilter.capacity*CST__BLOOMFILTER_REMOVEDRATIO:
+
+                if self.readonly:
+                    bloomfilter = False
+                else:
+                    msg("    ... building the Bloom filter of the database ({0} files)".format(
+                        files_number))
+                    bloomfilter = BloomFilter(max(CST__BLOOMFILTER_MINCAPACITY, 2*files_number))
+                    for size, hashid, partialhashid in self.files_for_targetdb():
+                        bloomfilter.add_file(size, partialhashid, hashid)
+                    bloomfilter.maxrowid = self._maxrowid()
 
-        # converting the datetime object in epoch value (=the number of seconds from 1970-01-01 :
-        sourcedate -= datetime(1970, 1, 1)
-        sourcedate = sourcedate.total_seconds()
+            # False : no filter, see above.
+            self._bloomfilter = bloomfilter
 
-        if not ARGS.off:
-            if CFG_PARAMETERS["target"]["mode"] == "nocopy":
-                # nothing to do
-                msg("    ... ({0}/{1}) due to the mode=nocopy' option, "
-                    "\"{2}\" will be simply added "
-                    "in the target database.".format(index+1, len_select,
-                                                     complete_source_filename))
-
-            elif CFG_PARAMETERS["target"]["mode"] == "copy":
-                # copying the file :
-                msg("    ... ({0}/{1}) about to "
-                    "copy \"{2}\" to \"{3}\" .".format(index+1,
-                                                       len_select,
-                                                       complete_source_filename,
-                                                       target_name))
-                shutil.copyfile(complete_source_filename, target_name)
-                os.utime(target_name, (sourcedate, sourcedate))
-
-            elif CFG_PARAMETERS["target"]["mode"] == "move":
-                # moving the file :
-                msg("    ... ({0}/{1}) about to "
-                    "move \"{2}\" to \"{3}\" .".format(index+1,
-                                                       len_select,
-                                                       complete_source_filename,
-                                                       target_name))
-                shutil.move(complete_source_filename, target_name)
-                os.utime(target_name, (sourcedate, sourcedate))
-
-        files_to_be_added.append((hashid,
-                                  SELECT[hashid].partialhashid,
-                                  SELECT[hashid].size,
-                                  SELECT[hashid].targetname,
-                                  complete_source_filename,
-                                  sourcedate,
-                                  SELECT[hashid].targettags))
-
-    msg("    = all files have been copied, let's update the database... =")
+        return self._bloomfilter or None
 
-    try:
-        if not ARGS.off:
-            db_cursor.executemany('INSERT INTO dbfiles VALUES (?,?,?,?,?,?,?)', files_to_be_added)
+    #///////////////////////////////////////////////////////////////////////////
+    @property
+    def bloomfilter_name(self):
+        """
+                Return the name of the file where the Bloom filter is stored.
+        """
+        return os.path.join(os.path.dirname(self.db_name), CST__BLOOMFILTER_NAME)
 
-    except sqlite3.IntegrityError as exception:
-        msg("!!! An error occured while writing the database : "+str(exception),
-            consolecolor="red")
-        msg("!!! files_to_be_added : ",
-            consolecolor="red")
-        for file_to_be_added in files_to_be_added:
-            msg("     ! hashid={0}; partialhashid={1}; size={2}; name={3}; sourcename={4}; "
-                "sourcedate={5}; tagsstr={6}".format(*file_to_be_added),
-                consolecolor="red")
-        raise KatalError("An error occured while writing the database : "+str(exception))
+    #///////////////////////////////////////////////////////////////////////////
+    @property
+    def schemas(self):
+        """
+                Return the list of the names of the shards attached to the
+                connection (see db_connect()) : ["main"] if the database isn't
+                sharded, ["main", "shard1", "shard2", ...] otherwise.
+        """
+        if self._schemas is None:
+            self._schemas = [name for _, name, _ in self.connection.execute("PRAGMA database_list")
+                             if name == "main" or name.startswith("shard")]
+        return self._schemas
 
-    db_connection.commit()
-    db_connection.close()
+    #///////////////////////////////////////////////////////////////////////////
+    @property
+    def shards(self):
+        """
+                Return the number of shards of the database (1 if the database
+                isn't sharded).
+        """
+        return len(self.schemas)
 
-    msg("    = ... database updated =")
+    #///////////////////////////////////////////////////////////////////////////
+    def _digest_in(self, hashid):
+        """
+                Convert a base64 hashid into the value stored in the database.
+        """
+        if self._binary_digests:
+            return b64decode(hashid)
+        return hashid
 
-    # returned value : 0 = success
-    return 0
+    #///////////////////////////////////////////////////////////////////////////
+    def _digest_out(self, value):
+        """
+                Convert a value stored in the database into a base64 hashid.
+        """
+        if self._binary_digests:
+            return b64encode(value).decode()
+        return value
 
-#///////////////////////////////////////////////////////////////////////////////
-def action__addtag(tag, dest):
-    """
-        action__addtag()
-        ________________________________________________________________________
+    #///////////////////////////////////////////////////////////////////////////
+    def _digest_raw(self, value):
+        """
+                Convert a value stored in the database into a raw digest.
+        """
+        if self._binary_digests:
+            return value
+        return b64decode(value)
 
-        Add a tag dest the files given by the "dest" parameter.
-        ________________________________________________________________________
+    #///////////////////////////////////////////////////////////////////////////
+    def _maxrowid(self):
+        """
+                Return the greatest rowid in the database (0 if it's empty).
+        """
+        # the temporary view gathering the shards has no rowid : the greatest rowids
+        # of the shards are added up.
+        return sum(self.connection.execute('SELECT max(rowid) '
+                                           'FROM {0}.dbfiles'.format(schema)).fetchone()[0] or 0
+                   for schema in self.schemas)
 
-        PARAMETERS
-                o tag          : (str) new tag to be added
-                o dest         : (str) a regex string describing what files are
-                                 concerned
-    """
-    msg("  = let's add the tag string \"{0}\" to {1}".format(tag, dest))
-    modify_the_tag_of_some_files(tag=tag, dest=dest, mode="append")
+    #///////////////////////////////////////////////////////////////////////////
+    def _scan(self, column, values):
+        """
+                Fill the temporary table "scan" (see CST__SQL__CREATE_SCAN) with
+                <values> written in <column> : this table is only stored in
+                memory, even if the database has been opened read-only.
+        """
+        connection = self.connection
+        connection.execute(CST__SQL__CREATE_SCAN)
+        with connection:
+            connection.execute("DELETE FROM temp.scan")
+            connection.executemany("INSERT INTO temp.scan ({0}) VALUES (?)".format(column),
+                                   ((value,) for value in values))
 
-#///////////////////////////////////////////////////////////////////////////////
-def action__cleandbrm():
-    """
-        action__cleandbrm()
-        ________________________________________________________________________
+    #///////////////////////////////////////////////////////////////////////////
+    def _sharded_sqlorder(self, sqlorder, hashid_index):
+        """
+                Return the SQL order(s) to be given to db_executemany() to modify
+                the table dbfiles : sqlorder is a string where {0} stands for the
+                name of the shard, e.g. 'DELETE FROM {0}.dbfiles WHERE hashid=?'.
 
-        Remove from the database the missing files, i.e. the files that do not
-        exist in the target directory.
-        ________________________________________________________________________
+                If the database isn't sharded, the returned value is sqlorder
+                for the main database; otherwise, it's a function choosing
+                the shard according to the first byte of row[hashid_index].
+        """
+        if len(self.schemas) == 1:
+            return sqlorder.format("main")
 
-        no PARAMETER, no RETURNED VALUE
-    """
-    msg("  = clean the database : remove missing files from the target directory =")
+        sqlorders = [sqlorder.format(schema) for schema in self.schemas]
+        return lambda row: sqlorders[self._digest_raw(row[hashid_index])[0] % len(sqlorders)]
 
-    if not os.path.exists(normpath(get_database_fullname())):
-        msg("    ! no database found.",
-            consolecolor="red")
-        return
+    #///////////////////////////////////////////////////////////////////////////
+    def add_files(self, rows, batch_size=None, ignore_duplicates=False):
+        """
+                Insert some records, batch after batch (see db_executemany()).
 
-    db_connection = sqlite3.connect(get_database_fullname())
-    db_connection.row_factory = sqlite3.Row
-    db_cursor = db_connection.cursor()
+                rows              : an iterable of (hashid, partialhashid, size, name,
+                                    sourcename, sourcedate, tagsstr)
+                batch_size        : see db_executemany()
+                ignore_duplicates : if True, the records whose hashid or name
+                                    is already in the database are ignored.
+        """
+        connection = self.connection
+        bloomfilter = self.bloomfilter
+
+        #. . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+        def rows_to_be_inserted():
+            """
+                    Yield the rows to be inserted, adding them to the Bloom filter.
+            """
+            for hashid, partialhashid, size, *others in rows:
+                bloomfilter.add_file(size, b64decode(partialhashid), b64decode(hashid))
+                yield (self._digest_in(hashid), self._digest_in(partialhashid), size) + \
+                      tuple(others)
+
+        if ignore_duplicates:
+            sqlorder = 'INSERT OR IGNORE INTO {0}.dbfiles VALUES (?,?,?,?,?,?,?)'
+        else:
+            sqlorder = 'INSERT INTO {0}.dbfiles VALUES (?,?,?,?,?,?,?)'
+
+        res = db_executemany(connection,
+                             self._sharded_sqlorder(sqlorder, 0),
+                             rows_to_be_inserted(),
+                             batch_size)
+        bloomfilter.maxrowid = self._maxrowid()
+        if ignore_duplicates:
+            # the ignored records have been added to the filter, but not to the database :
+            bloomfilter.files_number = self.count()
+        return res
 
-    files_to_be_rmved_from_the_db = []  # hashid of the files
-    for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-        if not os.path.exists(os.path.join(normpath(ARGS.targetpath), db_record["name"])):
-            files_to_be_rmved_from_the_db.append(db_record["hashid"])
-            msg("    o about to remove \"{0}\" "
-                "from the database".format(os.path.join(normpath(ARGS.targetpath),
-                                                        db_record["name"])))
+    #///////////////////////////////////////////////////////////////////////////
+    def analyze(self, schema):
+        """
+                Update the statistics used by the query planner (ANALYZE, each
+                index being sampled : see CST__MAINTENANCE_ANALYSISLIMIT) and
+                merge the segments of the full-text index.
 
-    if len(files_to_be_rmved_from_the_db) == 0:
-        msg("    * no file to be removed : the database is ok.",
-            consolecolor="red")
-    else:
-        for hashid in files_to_be_rmved_from_the_db:
-            if not ARGS.off:
-                msg("    o removing \"{0}\" record "
-                    "from the database".format(hashid))
-                db_cursor.execute("DELETE FROM dbfiles WHERE hashid=?", (hashid,))
-                db_connection.commit()
+                schema : (str) the name of the shard, see the schemas property.
+        """
+        connection = self.connection
+        with connection:
+            connection.execute("PRAGMA analysis_limit={0}".format(CST__MAINTENANCE_ANALYSISLIMIT))
+            connection.execute("ANALYZE {0}".format(schema))
 
-    db_connection.close()
-    if not ARGS.off:
-        msg("    o ... done : removed {0} "
-            "file(s) from the database".format(len(files_to_be_rmved_from_the_db)))
+            if connection.execute("SELECT name FROM {0}.sqlite_master "
+                                  "WHERE type='table' AND name='dbfiles_fts'".format(schema)).fetchone():
+                connection.execute("INSERT INTO {0}.dbfiles_fts(dbfiles_fts) "
+                                   "VALUES ('optimize')".format(schema))
 
-#///////////////////////////////////////////////////////////////////////////////
-def action__downloadefaultcfg(targetname=CST__DEFAULT_CONFIGFILE_NAME, location="local"):
-    """
-        action__downloadefaultcfg()
-        ________________________________________________________________________
+    #///////////////////////////////////////////////////////////////////////////
+    def close(self):
+        """
+                Close the connection (if opened).
+        """
+        if self._bloomfilter and self._bloomfilter.modified and \
+           not ARGS.off and not self.readonly:
+            self._bloomfilter.write(self.bloomfilter_name)
+        self._bloomfilter = None
 
-        Download the default configuration file; save it in the current directory
-        (location='local') or in the user's HOME directory (location='home').
-        ________________________________________________________________________
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self._schemas = None
 
-        PARAMETERS :
-            o (str) targetname : the new name of the downloaded file
-            o (str) location : "local" or "home"
+    #///////////////////////////////////////////////////////////////////////////
+    def count(self):
+        """
+                Return the number of files stored in the database.
+        """
+        return self.connection.execute('SELECT count(*) FROM dbfiles').fetchone()[0]
 
-        RETURNED VALUE :
-            (bool) success
-    """
-    msg("  = downloading the default configuration file =")
-    msg("    ... trying to download {0} from {1}".format(targetname, CST__DEFAULTCFGFILE_URL))
+    #///////////////////////////////////////////////////////////////////////////
+    def create(self):
+        """
+                Create the database if it doesn't exist.
+        """
+        if not self.exists():
+            self.close()
+            create_empty_db(self.db_name)
 
-    try:
-        if not ARGS.off:
-            with urllib.request.urlopen(CST__DEFAULTCFGFILE_URL) as response, \
-                 open(targetname, 'wb') as out_file:
-                shutil.copyfileobj(response, out_file)
-        msg("  * download completed : \"{0}\" (path : \"{1}\")".format(targetname,
-                                                                       normpath(targetname)))
+    #///////////////////////////////////////////////////////////////////////////
+    def create_size_index(self):
+        """
+                Create the index on the size of the files if it doesn't exist.
 
-        if location == 'home':
-            newname = os.path.join(possible_paths_to_cfg()[-1],
-                                   os.path.basename(targetname))
-            msg("  * Since you wrote '--downloaddefaultcfg=home', "
-                "let's move the download file to the user's home directory...")
-            msg("    namely {0} -> {1}".format(targetname, newname))
-            shutil.move(targetname, newname)
+                Nothing is written if --off has been used or if the database
+                has been opened read-only.
+        """
+        if not ARGS.off and not self.readonly:
+            with self.connection:
+                for schema in self.schemas:
+                    self.connection.execute(CST__SQL__CREATE_SIZE_INDEX.format(schema))
 
-        return True
+    #///////////////////////////////////////////////////////////////////////////
+    def create_secondary_indexes(self):
+        """
+                Create the index on the size of the files and the full-text index
+                if they don't exist; see drop_secondary_indexes().
+        """
+        self.create_size_index()
+        for schema in self.schemas:
+            create_fts_index(self.connection, schema)
 
-    except urllib.error.URLError as exception:
-        msg("  ! An error occured : "+str(exception),
-            consolecolor="red")
-        msg("  ... if you can't download the default config file, what about simply",
-            consolecolor="red")
-        msg("  ... copy another config file to the target directory ?",
-            consolecolor="red")
-        msg("  ... In a target directory, the config file is "
-            "in the \"{0}\" directory.".format(os.path.join(CST__KATALSYS_SUBDIR)),
-            consolecolor="red")
-        return False
+    #///////////////////////////////////////////////////////////////////////////
+    def delete_files(self, rows, batch_size=None):
+        """
+                Remove some records, batch after batch (see db_executemany()).
+
+                rows       : an iterable of (hashid,)
+                batch_size : see db_executemany()
+        """
+        connection = self.connection
+        bloomfilter = self.bloomfilter
+
+        # only the records really deleted are counted as removed from the Bloom
+        # filter :
+        changes = []
+        sqlorder = self._sharded_sqlorder('DELETE FROM {0}.dbfiles WHERE hashid=?', 0)
+        try:
+            res = db_executemany(connection,
+                                 sqlorder,
+                                 ((self._digest_in(hashid),) for hashid, in rows),
+                                 batch_size,
+                                 changes=changes)
+        finally:
+            removed = sum(changes)
+            if removed:
+                bloomfilter.files_number -= removed
+                bloomfilter.removed += removed
+                bloomfilter.modified = True
+            bloomfilter.maxrowid = self._maxrowid()
+
+        return res
+
+    #///////////////////////////////////////////////////////////////////////////
+    def drop_secondary_indexes(self):
+        """
+                Drop the index on the size of the files and the full-text index
+                (and its triggers), e.g. before inserting many files : the
+                indexes are then rebuilt in one pass by create_secondary_indexes().
+
+                Nothing is written if --off has been used.
+        """
+        if not ARGS.off:
+            with self.connection:
+                for schema in self.schemas:
+                    for sqlorder in CST__SQL__DROP_SECONDARY_INDEXES:
+                        self.connection.execute(sqlorder.format(schema))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def exists(self):
+        """
+                Return True if the database exists on disk.
+        """
+        return os.path.exists(self.db_name)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files(self):
+        """
+                Yield (hashid, name) for every file.
+        """
+        for hashid, name in self.connection.execute('SELECT hashid, name FROM dbfiles'):
+            yield self._digest_out(hashid), name
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files_for_infos(self):
+        """
+                Yield (hashid, name, tagsstr, sourcename, sourcedate) for every
+                file.
+        """
+        for hashid, *others in self.connection.execute('SELECT hashid, name, tagsstr, '
+                                                       'sourcename, sourcedate '
+                                                       'FROM dbfiles'):
+            yield (self._digest_out(hashid),) + tuple(others)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files_for_targetdb(self):
+        """
+                Yield (size, hashid, partialhashid) for every file, sorted by
+                size; hashid and partialhashid are raw digests.
+        """
+        for size, hashid, partialhashid in self.connection.execute('SELECT size, hashid, '
+                                                                   'partialhashid '
+                                                                   'FROM dbfiles '
+                                                                   'ORDER BY size'):
+            yield size, self._digest_raw(hashid), self._digest_raw(partialhashid)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files_named(self, pattern):
+        """
+                Yield (hashid, name) for every file whose name is <pattern>, or
+                matches <pattern> if it's a GLOB pattern (*, ?, [...]) and if no
+                name is exactly <pattern> (a name created from %f may contain
+                "[") : both lookups use the index on the names, as long as the
+                pattern doesn't begin with a wildcard.
+        """
+        files = self.connection.execute('SELECT hashid, name FROM dbfiles WHERE name=?',
+                                        (pattern,)).fetchall()
+        if not files and any(char in pattern for char in "*?["):
+            files = self.connection.execute('SELECT hashid, name FROM dbfiles WHERE name GLOB ?',
+                                            (pattern,))
+
+        for hashid, name in files:
+            yield self._digest_out(hashid), name
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files_with_tag(self, tag):
+        """
+                Yield (name, tagsstr) for every file whose tags' string contains
+                the (str)tag .
+        """
+        return self.connection.execute('SELECT name, tagsstr FROM dbfiles '
+                                       'WHERE instr(tagsstr, ?) > 0', (tag,))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files_without_tags(self):
+        """
+                Yield (hashid, name) for every file without tags.
+        """
+        for hashid, name in self.connection.execute('SELECT hashid, name FROM dbfiles '
+                                                    'WHERE tagsstr = \'\''):
+            yield self._digest_out(hashid), name
+
+    #///////////////////////////////////////////////////////////////////////////
+    def integrity_errors(self, schema):
+        """
+                Return the list of the errors found by "PRAGMA quick_check" (an
+                empty list if the shard is sane).
+
+                schema : (str) the name of the shard, see the schemas property.
+        """
+        return [error for error, in self.connection.execute("PRAGMA {0}.quick_check".format(schema))
+                if error != "ok"]
+
+    #///////////////////////////////////////////////////////////////////////////
+    def known_hashids(self, hashids):
+        """
+                Return the set of the hashids (raw digests) of <hashids> which are
+                stored in the database : <hashids> are written in a temporary
+                table joined with every shard.
+        """
+        self._scan("hashid", (self._digest_in(b64encode(hashid).decode()) for hashid in hashids))
+        return set(self._digest_raw(hashid)
+                   for schema in self.schemas
+                   for hashid, in self.connection.execute('SELECT scan.hashid FROM temp.scan '
+                                                          'WHERE EXISTS (SELECT 1 FROM '
+                                                          '{0}.dbfiles AS files WHERE '
+                                                          'files.hashid = scan.hashid)'.format(schema)))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def known_sizes(self, sizes):
+        """
+                Return the set of the sizes of <sizes> which are the size of at
+                least one file stored in the database : <sizes> are written in a
+                temporary table joined with every shard (thanks to the
+                dbfiles__size index).
+        """
+        self._scan("size", sizes)
+        return set(size
+                   for schema in self.schemas
+                   for size, in self.connection.execute('SELECT scan.size FROM temp.scan '
+                                                        'WHERE EXISTS (SELECT 1 FROM '
+                                                        '{0}.dbfiles AS files WHERE '
+                                                        'files.size = scan.size)'.format(schema)))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def modify_tags(self, rows, mode):
+        """
+                Modify the tags' string of some files, batch after batch (see
+                db_executemany()).
+
+                rows : an iterable of (tagsstr, hashid)
+                mode : "set" to replace the tags' string by tagsstr,
+                       "append" to add tagsstr at the end of the tags' string.
+        """
+        if mode == "set":
+            sqlorder = 'UPDATE {0}.dbfiles SET tagsstr=? WHERE hashid=?'
+        elif mode == "append":
+            sqlorder = 'UPDATE {0}.dbfiles SET tagsstr = tagsstr || ? WHERE hashid=?'
+        else:
+            raise KatalError("mode argument \"{0}\" isn't known".format(mode))
+
+        connection = self.connection
+        return db_executemany(connection,
+                              self._sharded_sqlorder(sqlorder, 1),
+                              ((tagsstr, self._digest_in(hashid)) for tagsstr, hashid in rows))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def record(self, hashid):
+        """
+                Return the complete record (hashid, partialhashid, size, name,
+                sourcename, sourcedate, tagsstr) of the file whose hashid is
+                <hashid>, or None.
+        """
+        connection = self.connection
+        res = connection.execute('SELECT partialhashid, size, name, '
+                                 'sourcename, sourcedate, tagsstr '
+                                 'FROM dbfiles WHERE hashid=?',
+                                 (self._digest_in(hashid),)).fetchone()
+        if res is None:
+            return None
+        return (hashid, self._digest_out(res[0])) + res[1:]
+
+    #///////////////////////////////////////////////////////////////////////////
+    def records(self):
+        """
+                Yield the complete record (hashid, partialhashid, size, name,
+                sourcename, sourcedate, tagsstr) of every file.
+        """
+        for hashid, partialhashid, *others in self.connection.execute('SELECT hashid, '
+                                                                      'partialhashid, size, '
+                                                                      'name, sourcename, '
+                                                                      'sourcedate, tagsstr '
+                                                                      'FROM dbfiles'):
+            yield (self._digest_out(hashid), self._digest_out(partialhashid)) + tuple(others)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def rename_files(self, rows):
+        """
+                Modify the names of some files in one transaction; rows is a
+                list of (name, hashid).
+
+                The names are first set to NULL, then to their new value : this
+                way, two files may swap their names without breaking the UNIQUE
+                constraint of the column "name".
+        """
+        rows = [(name, self._digest_in(hashid)) for name, hashid in rows]
+        sqlorders = ((self._sharded_sqlorder('UPDATE {0}.dbfiles SET name=NULL WHERE hashid=?', 0),
+                      [(hashid,) for _, hashid in rows]),
+                     (self._sharded_sqlorder('UPDATE {0}.dbfiles SET name=? WHERE hashid=?', 1),
+                      rows))
+
+        connection = self.connection
+        with connection:
+            for sqlorder, sqlrows in sqlorders:
+                for row in sqlrows:
+                    connection.execute(sqlorder(row) if callable(sqlorder) else sqlorder, row)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def search(self, query):
+        """
+                Yield (name, sourcename, tagsstr) for every file matching the
+                full-text query; see action__search().
+
+                Return None if the full-text index can't be used.
+        """
+        connection = self.connection
+        for schema in self.schemas:
+            if not create_fts_index(connection, schema):
+                return None
+
+        # each shard has its own full-text index :
+        return connection.execute(
+            " UNION ALL ".join('SELECT files.name, files.sourcename, files.tagsstr '
+                               'FROM {0}.dbfiles_fts AS fts '
+                               'JOIN {0}.dbfiles AS files ON files.rowid = fts.rowid '
+                               'WHERE fts.dbfiles_fts MATCH ?'.format(schema)
+                               for schema in self.schemas),
+            (query,)*len(self.schemas))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def storage(self, schema):
+        """
+                Return (page size, number of pages, number of free pages, auto
+                vacuum mode), see the PRAGMAs having the same names.
+
+                schema : (str) the name of the shard, see the schemas property.
+        """
+        return tuple(self.connection.execute("PRAGMA {0}.{1}".format(schema, pragma)).fetchone()[0]
+                     for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def storage_by_name(self, schema):
+        """
+                Return a list of (name, size in bytes) for every table and index,
+                the biggest first, or None if sqlite has been compiled without
+                the "dbstat" virtual table.
+
+                schema : (str) the name of the shard, see the schemas property.
+        """
+        try:
+            return self.connection.execute("SELECT name, sum(pgsize) FROM dbstat(?) "
+                                           "GROUP BY name ORDER BY 2 DESC",
+                                           (schema,)).fetchall()
+        except sqlite3.OperationalError:
+            return None
+
+    #///////////////////////////////////////////////////////////////////////////
+    def stored_file(self, hashid):
+        """
+                Return the name of the file whose content is the content of
+                the file whose hashid is <hashid> : the target file, or its
+                source file if the target file doesn't exist (e.g. if the file
+                has been added with mode='nocopy'), or None if none of them
+                exists.
+
+                The target directory is the directory where the
+                CST__KATALSYS_SUBDIR directory of the database is stored.
+        """
+        record = self.record(hashid)
+        if record is None:
+            return None
+
+        targetpath = os.path.dirname(os.path.dirname(os.path.abspath(self.db_name)))
+        for filename in (os.path.join(targetpath, record[3]), record[4]):
+            if os.path.exists(filename):
+                return filename
+
+        return None
+
+    #///////////////////////////////////////////////////////////////////////////
+    def vacuum(self, schema, pages):
+        """
+                Give back to the file system some free pages :
+
+                o if the shard has been created with "PRAGMA auto_vacuum=INCREMENTAL"
+                  (see create_empty_db()), at most <pages> pages are freed;
+                o otherwise the shard is rebuilt by VACUUM, which frees all the
+                  free pages at once and sets the incremental mode, so that
+                  the next vacuums will be incremental.
+
+                schema : (str) the name of the shard, see the schemas property.
+        """
+        connection = self.connection
+        if connection.execute("PRAGMA {0}.auto_vacuum".format(schema)).fetchone()[0] == 2:
+            connection.execute("PRAGMA {0}.incremental_vacuum({1})".format(schema, pages)).fetchall()
+        else:
+            connection.execute("PRAGMA {0}.auto_vacuum=INCREMENTAL".format(schema))
+            connection.execute("VACUUM {0}".format(schema))
+
+################################################################################
+class IOThrottle(object):
+    """
+        IOThrottle class
+
+        Limit the I/O of Katal (see the io_throttle() function) : three token
+        buckets (see the TokenBucket class) limit the number of bytes read per
+        second, the number of bytes written per second and the number of I/O
+        operations per second (see CST__IO_LIMITS; 0 = no limit).
+
+        The limits may be modified while Katal is running by writing an [io]
+        section in the control file (see CST__IOCONTROL_NAME); the options
+        missing in the control file (or a missing control file) stand for the
+        values of the configuration file.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, controlfile_name):
+        """
+                PARAMETER :
+                    o controlfile_name : (str) the control file's name
+        """
+        self.controlfile_name = controlfile_name
+        self._controlfile_mtime = None  # None : no control file
+        self._controlfile_time = None   # when it has been checked (time.monotonic())
+
+        self.lock = threading.Lock()
+
+        # (str)option : TokenBucket object
+        self.buckets = OrderedDict((option, TokenBucket(get_io_integer(option, minimum=0)))
+                                   for option in CST__IO_LIMITS)
+
+        self._check_controlfile(time.monotonic())
+
+    #///////////////////////////////////////////////////////////////////////////
+    def _check_controlfile(self, now):
+        """
+                Read the control file again if it has been modified, at most once
+                every CST__IOCONTROL_DELAY seconds. self.lock has to be acquired.
+        """
+        if self._controlfile_time is not None and \
+           now - self._controlfile_time < CST__IOCONTROL_DELAY:
+            return
+        self._controlfile_time = now
+
+        try:
+            mtime = os.stat(self.controlfile_name).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._controlfile_mtime:
+            return
+        self._controlfile_mtime = mtime
+
+        parser = configparser.ConfigParser()
+        if mtime is not None:
+            try:
+                parser.read(self.controlfile_name)
+            except configparser.Error as exception:
+                msg("  ! the control file \"{0}\" can't be read : "
+                    "{1}".format(self.controlfile_name, exception),
+                    consolecolor="red")
+                return
+
+        for option, bucket in self.buckets.items():
+            value = parser.get("io", option, fallback=get_io_parameter(option))
+            if not value.isdigit():
+                msg("  ! the control file \"{0}\" : [io]{1} : \"{2}\" isn't an integer "
+                    "greater or equal to 0.".format(self.controlfile_name, option, value),
+                    consolecolor="red")
+            elif int(value) != bucket.rate:
+                bucket.set_rate(int(value))
+                msg("  * the control file \"{0}\" : [io]{1} = {2}".format(self.controlfile_name,
+                                                                       option, value))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def active(self):
+        """
+                Return True if the bytes read or written are limited.
+        """
+        with self.lock:
+            self._check_controlfile(time.monotonic())
+            return any(self.buckets[option].rate > 0 for option in CST__IO_LIMITS[:2])
+
+    #///////////////////////////////////////////////////////////////////////////
+    def wait(self, read, written, operations):
+        """
+                Wait until <read> bytes may be read, <written> bytes may be
+                written and <operations> I/O operations may be done.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._check_controlfile(now)
+            delay = max(bucket.take(amount, now)
+                        for bucket, amount in zip(self.buckets.values(),
+                                                  (read, written, operations)))
+        if delay > 0:
+            time.sleep(delay)
+
+################################################################################
+class Journal(object):
+    """
+        Journal class
+
+        A write-ahead journal stored in the CST__TASKS_SUBSUBDIR directory, so
+        that an interrupted task can be resumed (see action__add__resume()) :
+        one JSON object per line, the lines being flushed as soon as they are
+        written. An incomplete last line, written while the program was
+        interrupted, is ignored.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, filename):
+        """
+                PARAMETER :
+                    o filename : (str) the journal's name, see get_journal_fullname()
+        """
+        self.filename = filename
+        self._file = None  # opened by append()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def append(self, records):
+        """
+                Write some records (JSON-serializable objects) at the end of the
+                journal and flush them.
+        """
+        if self._file is None:
+            self._file = open(self.filename, "a", encoding="utf-8")
+
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def close(self):
+        """
+                Close the file of the journal, if it has been opened.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    #///////////////////////////////////////////////////////////////////////////
+    def exists(self):
+        """
+                Return True if the journal exists, i.e. if a task has been
+                interrupted.
+        """
+        return os.path.exists(self.filename)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def records(self):
+        """
+                Yield the records stored in the journal.
+        """
+        with open(self.filename, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # incomplete last line :
+                    return
+
+    #///////////////////////////////////////////////////////////////////////////
+    def remove(self):
+        """
+                Remove the journal : the task is over.
+        """
+        self.close()
+        if self.exists():
+            os.remove(self.filename)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def sync(self):
+        """
+                Write on disk the records already appended (see [io]durability).
+        """
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+
+################################################################################
+class KatalError(BaseException):
+    """
+        KatalError class
+
+        A very basic class called when an error is raised by the program.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, value):
+        BaseException.__init__(self)
+        self.value = value
+    #///////////////////////////////////////////////////////////////////////////
+    def __str__(self):
+        return repr(self.value)
+
+################################################################################
+class LazyTargetDB(object):
+    """
+        LazyTargetDB class
+
+        Query-backed replacement of the TargetDB class, used by read_target_db()
+        if the database is too large to be loaded in memory (see the
+        [database]target db.max files in memory option).
+
+        Same interface as the TargetDB class : the sizes and the hashids asked
+        by thefileshavetobeadded__db() are joined with the database (see
+        Catalogue.known_sizes() and Catalogue.known_hashids()), unless the Bloom
+        filter of the database says that they are unknown; without any filter
+        (see Catalogue.bloomfilter), the database is always queried.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, catalogue):
+        """
+                PARAMETER :
+                    o catalogue : the Catalogue object of the target directory
+        """
+        self.catalogue = catalogue
+        self.catalogue.create_size_index()
+
+        self._len = catalogue.count()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def __len__(self):
+        return self._len
+
+    #///////////////////////////////////////////////////////////////////////////
+    def known_hashids(self, files):
+        """
+                Return the set of the hashids (raw digests) of <files>, an iterable
+                of (size, hashid), which are stored in the database.
+        """
+        bloomfilter = self.catalogue.bloomfilter
+        return self.catalogue.known_hashids(hashid for _, hashid in files
+                                            if bloomfilter is None or
+                                            bloomfilter.may_contain_hashid(hashid))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def known_sizes(self, sizes):
+        """
+                Return the set of the sizes of <sizes>, an iterable of integers,
+                which are the size of at least one file of the database.
+        """
+        bloomfilter = self.catalogue.bloomfilter
+        return self.catalogue.known_sizes(size for size in sizes
+                                          if bloomfilter is None or
+                                          bloomfilter.may_contain_size(size))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def stored_file(self, hashid):
+        """
+                Return the name of the file stored in the target directory whose
+                hashid (raw digest) is <hashid>, see Catalogue.stored_file().
+        """
+        return self.catalogue.stored_file(b64encode(hashid).decode())
+
+################################################################################
+class MessageWriter(object):
+    """
+        MessageWriter class
+
+        Write the messages of msg() on console and in the log file with a
+        background thread, so that the caller doesn't wait for the terminal or
+        for the disk : the messages are appended to a deque (without any lock),
+        which is read by the thread every CST__MSGWRITER_DELAY seconds; the
+        messages are written (see msg__write()) and flushed by batches of at
+        most CST__MSGWRITER_BATCHSIZE messages.
+
+        flush() waits until the messages already given have been written,
+        close() writes the remaining messages and stops the thread.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self):
+        # items : (console text, logfile text), a threading.Event (see flush())
+        # or None (see close())
+        self.items = deque()
+        self.wakeup = threading.Event()  # set by flush() and close()
+        self.error = None                # exception raised by the thread, see flush()
+
+        self.thread = threading.Thread(target=self._run, name="messages", daemon=True)
+        self.thread.start()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def _raise_error(self):
+        """
+                Raise again the exception raised by the thread, if any.
+        """
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    #///////////////////////////////////////////////////////////////////////////
+    def _run(self):
+        """
+                Loop of the thread : write the messages batch after batch.
+        """
+        stop = False
+        while not stop:
+            self.wakeup.wait(CST__MSGWRITER_DELAY)
+            self.wakeup.clear()
+
+            while self.items and not stop:
+                events = []
+                console_texts = []
+                logfile_texts = []
+                while self.items and len(console_texts) < CST__MSGWRITER_BATCHSIZE:
+                    item = self.items.popleft()
+                    if item is None:
+                        stop = True
+                        break
+                    elif isinstance(item, threading.Event):
+                        events.append(item)
+                    else:
+                        console_text, logfile_text = item
+                        if console_text is not None:
+                            console_texts.append(console_text)
+                        if logfile_text is not None:
+                            logfile_texts.append(logfile_text)
+
+                try:
+                    msg__write("".join(console_texts), logfile_texts)
+                    sys.stdout.flush()
+                    if LOGFILE is not None and not LOGFILE.closed:
+                        LOGFILE.flush()
+                except BaseException as exception:  # pylint: disable=broad-except
+                    self.error = exception
+
+                for event in events:
+                    event.set()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def close(self):
+        """
+                Write the remaining messages and stop the thread; nothing is done
+                if the thread has already been stopped.
+        """
+        if self.thread.is_alive():
+            self.items.append(None)
+            self.wakeup.set()
+            self.thread.join()
+        self._raise_error()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def flush(self):
+        """
+                Wait until the messages already given have been written.
+        """
+        if self.thread.is_alive():
+            event = threading.Event()
+            self.items.append(event)
+            self.wakeup.set()
+            event.wait()
+        self._raise_error()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def write(self, console_text, logfile_text):
+        """
+                Give a message to the thread : (str)console_text is written on
+                console and (str)logfile_text in the log file, unless they are
+                None.
+        """
+        self.items.append((console_text, logfile_text))
+
+################################################################################
+class Progress(object):
+    """
+        Progress class
+
+        The progress line displayed on console by --select and --add instead of
+        one line per file (these lines being only written in the log file) :
+        number of files, files/s, MB/s hashed, MB/s copied, depth of the queues
+        and estimated time of arrival.
+
+        update() is called for each file (or each block) but the line is written
+        (see msg__write()) at most every CST__PROGRESS_DELAY seconds : it's
+        rewritten in place with a carriage return, without any escape sequence.
+        msg() erases the line (see clear()) before writing another message.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, title, total_files=None, total_bytes=None):
+        """
+                PARAMETERS :
+                    o title       : (str) e.g. "selection"
+                    o total_files : (None/int) number of files expected, if known
+                    o total_bytes : (None/int) number of bytes to be copied, if
+                                    known : the ETA is computed from the bytes
+                                    copied rather than from the files.
+        """
+        self.title = title
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+
+        self.files = 0             # number of files done
+        self.hashed = 0            # number of bytes hashed
+        self.copied = 0            # number of bytes copied
+        self.queues = OrderedDict()  # (str)name : (int)number of items waiting
+
+        self.start = time.monotonic()
+        self.next_refresh = self.start + CST__PROGRESS_DELAY
+
+        self.width = 0             # length of the line currently displayed
+        self.columns = shutil.get_terminal_size().columns - 1
+
+    #///////////////////////////////////////////////////////////////////////////
+    def _write(self, console_text):
+        """
+                Write <console_text> on console after the messages of msg().
+        """
+        if MSG_WRITER is None:
+            msg__write(console_text, ())
+            sys.stdout.flush()
+        else:
+            MSG_WRITER.write(console_text, None)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def clear(self):
+        """
+                Return the text erasing the line currently displayed ("" if
+                nothing is displayed).
+        """
+        if self.width == 0:
+            return ""
+
+        res = "\r" + " "*self.width + "\r"
+        self.width = 0
+        return res
+
+    #///////////////////////////////////////////////////////////////////////////
+    def close(self):
+        """
+                Erase the line currently displayed and return the last progress
+                line (see line()) followed by the duration.
+        """
+        self._write(self.clear())
+        self.queues.clear()
+        return "{0} ; duration {1}".format(self.line(),
+                                           timedelta(seconds=int(time.monotonic() - self.start)))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def line(self):
+        """
+                Return the progress line, e.g. :
+                "[selection] 3000/10000 files (30.0%) ; 150.2 files/s ; hashed :
+                 52.1 MB/s ; waiting : 233 to be compared ; ETA 0:00:46"
+        """
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+
+        if self.total_files:
+            res = ["[{0}] {1}/{2} files ({3:.1f}%)".format(self.title,
+                                                           self.files,
+                                                           self.total_files,
+                                                           self.files/self.total_files*100.0)]
+        else:
+            res = ["[{0}] {1} files".format(self.title, self.files)]
+
+        res.append("{0:.1f} files/s".format(self.files/elapsed))
+        if self.hashed:
+            res.append("hashed : {0:.1f} MB/s".format(self.hashed/1e6/elapsed))
+        if self.copied:
+            res.append("copied : {0:.1f} MB/s".format(self.copied/1e6/elapsed))
+        if self.queues:
+            res.append("waiting : " + ", ".join("{0} {1}".format(depth, name)
+                                                for name, depth in self.queues.items()))
+
+        eta = None
+        if self.total_bytes and self.copied:
+            eta = (self.total_bytes - self.copied) * elapsed / self.copied
+        elif self.total_files and self.files:
+            eta = (self.total_files - self.files) * elapsed / self.files
+        if eta:
+            res.append("ETA {0}".format(timedelta(seconds=int(max(eta, 0)))))
+
+        return " ; ".join(res)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def update(self, files=0, hashed=0, copied=0, queues=None):
+        """
+                Add <files> files, <hashed> bytes hashed and <copied> bytes
+                copied; <queues> is None or a dict (str)name : (int)depth.
+                The line is refreshed if CST__PROGRESS_DELAY seconds have
+                elapsed since the last refresh.
+        """
+        self.files += files
+        self.hashed += hashed
+        self.copied += copied
+        if queues is not None:
+            self.queues.update(queues)
+
+        now = time.monotonic()
+        if now >= self.next_refresh:
+            self.next_refresh = now + CST__PROGRESS_DELAY
+
+            line = self.line()[:self.columns]
+            console_text = "\r" + line.ljust(self.width)
+            self.width = len(line)
+            self._write(console_text)
+
+################################################################################
+class TargetDB(object):
+    """
+        TargetDB class
+
+        The files of the database, as required by thefileshavetobeadded__db() :
+        see TARGET_DB and documentation:database.
+
+        The files are sorted by size and stored in three arrays : an array of
+        integers and two bytearrays made of the raw digests (see hashfile())
+        of the files; the index of a file in the three arrays is the same.
+        The names of the files, only required by --strictcmp, are read from
+        the database when required.
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, catalogue=None):
+        """
+                PARAMETER :
+                    o catalogue : the Catalogue object of the target directory,
+                                  or None to create an empty object.
+        """
+        self.catalogue = catalogue
+
+        self.sizes = array('Q')
+        self.hashids = bytearray()
+        self.partialhashids = bytearray()
+
+        if catalogue is not None:
+            for size, hashid, partialhashid in catalogue.files_for_targetdb():
+                self.sizes.append(size)
+                self.hashids += hashid
+                self.partialhashids += partialhashid
+
+    #///////////////////////////////////////////////////////////////////////////
+    def __len__(self):
+        return len(self.sizes)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def files_of_size(self, size):
+        """
+                Return a list of (hashid, partialhashid) (raw digests) : the
+                files of the database whose size is <size>.
+        """
+        return [(bytes(self.hashids[index*CST__DIGEST_SIZE:(index+1)*CST__DIGEST_SIZE]),
+                 bytes(self.partialhashids[index*CST__DIGEST_SIZE:(index+1)*CST__DIGEST_SIZE]))
+                for index in range(bisect_left(self.sizes, size),
+                                   bisect_right(self.sizes, size))]
+
+    #///////////////////////////////////////////////////////////////////////////
+    def known_hashids(self, files):
+        """
+                Return the set of the hashids (raw digests) of <files>, an iterable
+                of (size, hashid), which are stored in the database.
+        """
+        return set(hashid for size, hashid in files
+                   if any(hashid == target_hashid
+                          for target_hashid, _ in self.files_of_size(size)))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def known_sizes(self, sizes):
+        """
+                Return the set of the sizes of <sizes>, an iterable of integers,
+                which are the size of at least one file of the database.
+        """
+        return set(size for size in sizes
+                   if bisect_left(self.sizes, size) != bisect_right(self.sizes, size))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def stored_file(self, hashid):
+        """
+                Return the name of the file stored in the target directory whose
+                hashid (raw digest) is <hashid>, see Catalogue.stored_file().
+        """
+        return self.catalogue.stored_file(b64encode(hashid).decode())
+
+################################################################################
+class TokenBucket(object):
+    """
+        TokenBucket class
+
+        A token bucket, see the IOThrottle class : <rate> tokens (bytes, I/O
+        operations) are added every second, the bucket holding at most <rate>
+        tokens. More tokens than available may be taken : the bucket is then
+        in debt and the caller has to wait until the debt is paid back, so
+        that the average rate never exceeds <rate>.
+
+        This class isn't thread-safe : see IOThrottle.wait().
+    """
+    #///////////////////////////////////////////////////////////////////////////
+    def __init__(self, rate):
+        """
+                PARAMETER :
+                    o rate : (int) number of tokens per second, 0 = no limit
+        """
+        self.rate = rate
+        self.tokens = rate
+        self.time = time.monotonic()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def set_rate(self, rate):
+        """
+                Modify the number of tokens per second (0 = no limit).
+        """
+        self.rate = rate
+        self.tokens = min(self.tokens, rate)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def take(self, amount, now):
+        """
+                Take <amount> tokens at <now> (see time.monotonic()) and return
+                the time (in seconds) to wait before using them.
+        """
+        if self.rate == 0:
+            return 0
+
+        self.tokens = min(self.rate, self.tokens + (now - self.time)*self.rate)
+        self.time = now
+
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0
+
+        return -self.tokens/self.rate
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__add(catalogue):
+    """
+        action__add()
+        ________________________________________________________________________
+
+        Add the source files described in SELECT/SELECT_SIZE_IN_BYTES to the
+        target path.
+
+        The files to be copied/moved and the files already copied/moved are
+        written in a journal (see CST__ADD_JOURNALNAME) removed once the
+        database has been updated : see action__add__resume().
+        ________________________________________________________________________
+
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        RETURNED VALUE
+                (int) 0 if success, -1 if an error occured.
+    """
+    msg("  = copying data =")
+
+    # hard links and reflinks don't require any space on disk :
+    if CFG_PARAMETERS["target"]["mode"] not in ("hardlink", "reflink") and \
+       get_disk_free_space(ARGS.targetpath) < SELECT_SIZE_IN_BYTES*CST__FREESPACE_MARGIN:
+        msg("    ! Not enough space on disk. Stopping the program.",
+            consolecolor="red")
+        # returned value : -1 = error
+        return -1
+
+    mode = None if ARGS.off else CFG_PARAMETERS["target"]["mode"]
+
+    # the transfers (record of the database, source name, target name, size,
+    # sourcedate, mode; see transfer_files()) :
+    transfers = []
+    for hashid in SELECT:
+
+        complete_source_filename = SELECT[hashid].fullname
+        target_name = os.path.join(normpath(ARGS.targetpath), SELECT[hashid].targetname)
+
+        sourcedate = datetime.utcfromtimestamp(os.path.getmtime(complete_source_filename))
+        sourcedate = sourcedate.replace(second=0, microsecond=0)
+
+        # converting the datetime object in epoch value (=the number of seconds from 1970-01-01 :
+        sourcedate -= datetime(1970, 1, 1)
+        sourcedate = sourcedate.total_seconds()
+
+        transfers.append(((hashid,
+                           SELECT[hashid].partialhashid,
+                           SELECT[hashid].size,
+                           SELECT[hashid].targetname,
+                           complete_source_filename,
+                           sourcedate,
+                           SELECT[hashid].targettags),
+                          complete_source_filename, target_name,
+                          SELECT[hashid].size, sourcedate, mode))
+
+    # the journal describes what has to be done before anything is done,
+    # see action__add__resume() :
+    journal = None
+    if not ARGS.off:
+        journal = Journal(get_journal_fullname(CST__ADD_JOURNALNAME))
+        journal.append(itertools.chain(({"mode" : mode},),
+                                       ({"planned" : transfer[0]} for transfer in transfers)))
+        if get_io_durability() != "none":
+            journal.sync()
+
+    action__add__transfer(catalogue, transfers, journal)
+
+    if journal is not None:
+        journal.remove()
+
+    msg("    = all files have been copied and written in the database =")
+
+    # returned value : 0 = success
+    return 0
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__add__resume(catalogue, ask=False):
+    """
+        action__add__resume()
+        ________________________________________________________________________
+
+        Resume the last --add (or --select) if it has been interrupted, i.e.
+        if its journal (see CST__ADD_JOURNALNAME and the Journal class) still
+        exists : the files planned but not copied/moved are copied/moved and
+        the database is updated. Neither the source directory nor the files
+        already copied/moved are read again, except the files which have been
+        moved without being written in the journal : their hashid is checked.
+
+        The files planned but not moved whose source file doesn't exist anymore
+        are ignored.
+
+        If <ask> is True (--select), the user is asked whether the interrupted
+        --add has to be resumed; if the question can't be asked (--verbosity
+        none) or if the answer is 'no', the journal is only reported.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o catalogue : the Catalogue object of the target directory
+                o ask       : (bool) True if the user has to be asked
+
+        RETURNED VALUE
+                (bool) True if there's an interrupted --add, resumed or not
+    """
+    journal = Journal(get_journal_fullname(CST__ADD_JOURNALNAME))
+    if not journal.exists():
+        return False
+
+    msg("  = an interrupted --add has to be resumed (see \"{0}\") =".format(journal.filename),
+        consolecolor="cyan")
+    if ARGS.off:
+        msg("    ... nothing is done since --off has been used.")
+        return True
+
+    if ask:
+        answer = None
+        if ARGS.verbosity != 'none':
+            msg__flush()
+            answer = input("\nDo you want to resume the interrupted --add into the target "
+                           "directory (\"{0}\") ? (y/N) ".format(ARGS.targetpath))
+        if answer not in ("y", "yes"):
+            msg("    ... the interrupted --add hasn't been resumed : use --add to resume it.",
+                consolecolor="red")
+            return True
+
+    mode = None
+    files_to_be_added = []
+    done = set()
+    for record in journal.records():
+        if "mode" in record:
+            mode = record["mode"]
+        elif "planned" in record:
+            files_to_be_added.append(tuple(record["planned"]))
+        elif "done" in record:
+            done.add(record["done"])
+
+    already_added = []  # records of the files already copied/moved
+    transfers = []      # see transfer_files()
+    missing = 0         # number of files which can't be copied anymore
+    for file_to_be_added in files_to_be_added:
+        hashid, _, size, targetname, sourcename, sourcedate, _ = file_to_be_added
+        if hashid in done:
+            already_added.append(file_to_be_added)
+            continue
+
+        target_name = os.path.join(normpath(ARGS.targetpath), targetname)
+        if mode == "move" and not os.path.exists(sourcename):
+            # the file has already been moved :
+            if not os.path.exists(target_name) or hashfile64(target_name) != hashid:
+                raise KatalError("Can't resume the interrupted --add : \"{0}\" has been "
+                                 "moved but \"{1}\" can't be found.".format(sourcename,
+                                                                             target_name))
+            already_added.append(file_to_be_added)
+            continue
+
+        if mode != "move" and not os.path.exists(sourcename):
+            msg("    ! \"{0}\" can't be found : this file is ignored.".format(sourcename),
+                consolecolor="red")
+            missing += 1
+            continue
+
+        if mode not in (None, "nocopy") and os.path.exists(target_name):
+            # incomplete copy :
+            os.remove(target_name)
+
+        transfers.append((file_to_be_added, sourcename, target_name, size, sourcedate, mode))
+
+    msg("    ... {0} file(s) already copied/moved, {1} file(s) to be "
+        "copied/moved, {2} file(s) ignored.".format(len(already_added), len(transfers), missing))
+
+    # the records may already have been written in the database :
+    catalogue.create()
+    catalogue.add_files(already_added, ignore_duplicates=True)
+    action__add__transfer(catalogue, transfers, journal, ignore_duplicates=True)
+
+    journal.remove()
+    msg("    = the interrupted --add is over =")
+
+    return True
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__add__transfer(catalogue, transfers, journal, ignore_duplicates=False,
+                          moved_from=None):
+    """
+        action__add__transfer()
+        ________________________________________________________________________
+
+        Copy/move some files (see transfer_files()), writing in the journal
+        the files which have been copied/moved. Used by --add and by --rebase.
+
+        The records of the files copied/moved are written in the database
+        batch after batch, each batch being written in one transaction once
+        [database]transaction batch size files or [database]transaction batch
+        bytes bytes have been copied/moved : only the records of the files
+        already copied/moved are written and the records don't have to be
+        stored in memory until the end.
+
+        According to [io]durability (see get_io_durability()), the files are
+        written on disk before being written in the journal and in the
+        database : one by one by transfer_file() ('file'), or by batches of
+        [io]durability batch files files or [io]durability batch bytes bytes
+        (see sync_filesystem(), 'batch'), a batch being always written on disk
+        before the database is modified.
+
+        If a transfer fails, the files already copied/moved (including the
+        transfers which were in flight, see transfer_files()) are written in
+        the journal and in the database before the exception is raised again.
+
+        If <moved_from> is given, the records of each batch are removed from
+        this database just after having been written in <catalogue>.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o catalogue         : the Catalogue object of the target directory
+                o transfers         : see transfer_files(), the first item of
+                                      each transfer being the record of the file
+                                      (see Catalogue.add_files()).
+                o journal           : a Journal object, or None if --off has
+                                      been used
+                o ignore_duplicates : see Catalogue.add_files()
+                o moved_from        : the Catalogue object of the directory the
+                                      files are moved from (--rebasemode=move),
+                                      or None
+
+        RETURNED VALUE
+                (int) the number of files
+    """
+    batch_size = max(1, int(get_database_parameter("transaction batch size")))
+    batch_bytes = get_database_parameter("transaction batch bytes")
+    if not batch_bytes.isdigit():
+        raise KatalError("[database]transaction batch bytes : "
+                         "\"{0}\" isn't a positive integer.".format(batch_bytes))
+    batch_bytes = int(batch_bytes)
+
+    durability = get_io_durability()
+    sync_files = get_io_integer("durability batch files")
+    sync_bytes = get_io_integer("durability batch bytes")
+
+    # files copied/moved but not written in the journal yet :
+    # ((tuple)record of the file, (str)target name)
+    unsynced = []
+    unsynced_bytes = 0
+
+    #...........................................................................
+    def synchronize():
+        """
+                Write on disk the files of <unsynced> if [io]durability is
+                'batch', then write them in the journal and add them to <batch>.
+        """
+        nonlocal unsynced_bytes
+
+        if durability == "batch" and unsynced and \
+           not sync_filesystem(os.path.dirname(os.path.abspath(unsynced[-1][1]))):
+            for _, name in unsynced:
+                sync_file(name)
+
+        if journal is not None and unsynced:
+            journal.append({"done" : record[0]} for record, _ in unsynced)
+            if durability != "none":
+                journal.sync()
+
+        batch.extend(record for record, _ in unsynced)
+        del unsynced[:]
+        unsynced_bytes = 0
+
+    #...........................................................................
+    def write_batch(batch):
+        """
+                Write the records of <batch> in the database, in one transaction.
+        """
+        try:
+            catalogue.add_files(batch, batch_size=0, ignore_duplicates=ignore_duplicates)
+
+        except sqlite3.IntegrityError as exception:
+            msg("!!! An error occured while writing the database : "+str(exception),
+                consolecolor="red")
+            msg("!!! files_to_be_added : ",
+                consolecolor="red")
+            for file_to_be_added in batch:
+                msg("     ! hashid={0}; partialhashid={1}; size={2}; name={3}; sourcename={4}; "
+                    "sourcedate={5}; tagsstr={6}".format(*file_to_be_added),
+                    consolecolor="red")
+            raise KatalError("An error occured while writing the database : "+str(exception))
+
+        if moved_from is not None:
+            moved_from.delete_files(((record[0],) for record in batch), batch_size=0)
+
+        msg("    ... {0} file(s) written in the database".format(len(batch)))
+
+    batch = []
+    batch_size_in_bytes = 0
+    len_transfers = len(transfers)
+
+    # the progress line (see progress_begin()) replaces the lines written for
+    # each file, which are only written in the log file :
+    progress_begin("copy",
+                   total_files=len_transfers,
+                   total_bytes=sum(transfer[3] for transfer in transfers
+                                   if transfer[5] not in (None, "nocopy")))
+    try:
+        for index, (file_to_be_added, complete_source_filename, target_name,
+                    size, _, mode) in enumerate(transfer_files(transfers)):
+
+            if mode == "nocopy":
+                msg("    ... ({0}/{1}) due to the mode=nocopy' option, "
+                    "\"{2}\" has been simply added "
+                    "in the target database.".format(index+1, len_transfers,
+                                                     complete_source_filename),
+                    for_console=PROGRESS is None)
+            elif mode is not None:
+                msg("    ... ({0}/{1}) \"{2}\" {3} to "
+                    "\"{4}\" .".format(index+1,
+                                        len_transfers,
+                                        complete_source_filename,
+                                        {"move" : "moved",
+                                         "copy" : "copied"}.get(mode, "copied ("+mode+")"),
+                                        target_name),
+                    for_console=PROGRESS is None)
+
+            unsynced.append((file_to_be_added, target_name))
+            unsynced_bytes += size
+            if durability != "batch" or \
+               len(unsynced) >= sync_files or unsynced_bytes >= sync_bytes:
+                synchronize()
+
+            batch_size_in_bytes += size
+            if len(batch) + len(unsynced) >= batch_size or batch_size_in_bytes >= batch_bytes:
+                synchronize()
+                full_batch, batch = batch, []
+                batch_size_in_bytes = 0
+                write_batch(full_batch)
+
+            progress_update(files=1,
+                            copied=0 if mode in (None, "nocopy") else size,
+                            queues={"to be written in the database" : len(batch) + len(unsynced)})
+    except BaseException:
+        # the files already copied/moved (see transfer_files()) are written in the
+        # journal and in the database before the exception is raised again :
+        synchronize()
+        if batch:
+            write_batch(batch)
+        progress_end()
+        raise
+
+    synchronize()
+    if batch:
+        write_batch(batch)
+    progress_end()
+
+    return len_transfers
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__addtag(catalogue, tag, dest):
+    """
+        action__addtag()
+        ________________________________________________________________________
+
+        Add a tag dest the files given by the "dest" parameter.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o catalogue    : the Catalogue object of the target directory
+                o tag          : (str) new tag to be added
+                o dest         : (str) a regex string describing what files are
+                                 concerned
+    """
+    msg("  = let's add the tag string \"{0}\" to {1}".format(tag, dest))
+    modify_the_tag_of_some_files(catalogue=catalogue, tag=tag, dest=dest, mode="append")
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__cleandbrm(catalogue):
+    """
+        action__cleandbrm()
+        ________________________________________________________________________
+
+        Remove from the database the missing files, i.e. the files that do not
+        exist in the target directory.
+        ________________________________________________________________________
+
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
+    """
+    msg("  = clean the database : remove missing files from the target directory =")
+
+    if not catalogue.exists():
+        msg("    ! no database found.",
+            consolecolor="red")
+        return
+
+    files_to_be_rmved_from_the_db = []  # hashid of the files
+    for hashid, name in catalogue.files():
+        if not os.path.exists(os.path.join(normpath(ARGS.targetpath), name)):
+            files_to_be_rmved_from_the_db.append(hashid)
+            msg("    o about to remove \"{0}\" "
+                "from the database".format(os.path.join(normpath(ARGS.targetpath),
+                                                        name)))
+
+    if len(files_to_be_rmved_from_the_db) == 0:
+        msg("    * no file to be removed : the database is ok.",
+            consolecolor="red")
+    elif not ARGS.off:
+        msg("    o removing {0} record(s) "
+            "from the database".format(len(files_to_be_rmved_from_the_db)))
+        catalogue.delete_files((hashid,) for hashid in files_to_be_rmved_from_the_db)
+
+    if not ARGS.off:
+        msg("    o ... done : removed {0} "
+            "file(s) from the database".format(len(files_to_be_rmved_from_the_db)))
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__downloadefaultcfg(targetname=CST__DEFAULT_CONFIGFILE_NAME, location="local"):
+    """
+        action__downloadefaultcfg()
+        ________________________________________________________________________
+
+        Download the default configuration file; save it in the current directory
+        (location='local') or in the user's HOME directory (location='home').
+        ________________________________________________________________________
+
+        PARAMETERS :
+            o (str) targetname : the new name of the downloaded file
+            o (str) location : "local" or "home"
+
+        RETURNED VALUE :
+            (bool) success
+    """
+    msg("  = downloading the default configuration file =")
+    msg("    ... trying to download {0} from {1}".format(targetname, CST__DEFAULTCFGFILE_URL))
+
+    try:
+        if not ARGS.off:
+            with urllib.request.urlopen(CST__DEFAULTCFGFILE_URL) as response, \
+                 open(targetname, 'wb') as out_file:
+                shutil.copyfileobj(response, out_file)
+        msg("  * download completed : \"{0}\" (path : \"{1}\")".format(targetname,
+                                                                       normpath(targetname)))
+
+        if location == 'home':
+            newname = os.path.join(possible_paths_to_cfg()[-1],
+                                   os.path.basename(targetname))
+            msg("  * Since you wrote '--downloaddefaultcfg=home', "
+                "let's move the download file to the user's home directory...")
+            msg("    namely {0} -> {1}".format(targetname, newname))
+            shutil.move(targetname, newname)
+
+        return True
+
+    except urllib.error.URLError as exception:
+        msg("  ! An error occured : "+str(exception),
+            consolecolor="red")
+        msg("  ... if you can't download the default config file, what about simply",
+            consolecolor="red")
+        msg("  ... copy another config file to the target directory ?",
+            consolecolor="red")
+        msg("  ... In a target directory, the config file is "
+            "in the \"{0}\" directory.".format(os.path.join(CST__KATALSYS_SUBDIR)),
+            consolecolor="red")
+        return False
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__exportdb(catalogue, filename):
+    """
+        action__exportdb()
+        ________________________________________________________________________
+
+        Write the records of the database in a JSONL or CSV file, according to
+        the extension of <filename> (see CST__IMPORTEXPORT_FORMATS) : one JSON
+        object or one CSV line per file, the hashids being encoded with the base
+        64. See action__importdb().
+
+        The records are read from the database and written one after another :
+        the database isn't loaded in memory.
+        ________________________________________________________________________
+
+        PARAMETERS
+            o catalogue : the Catalogue object of the target directory
+            o filename  : (str) the name of the file to be written
+
+        RETURNED VALUE
+            (int) the number of exported files, -1 if an error occured
+    """
+    msg("  = exporting the database into \"{0}\" =".format(filename))
+
+    fileformat = get_importexport_format(filename)
+    if fileformat is None:
+        return -1
+
+    if not catalogue.exists():
+        msg("    ! no database found.",
+            consolecolor="red")
+        return -1
+
+    res = 0
+    with open(filename, "w", encoding="utf-8", newline="") as exportfile:
+        if fileformat == "csv":
+            writer = csv.writer(exportfile)
+            writer.writerow(CST__IMPORTEXPORT_COLUMNS)
+            for record in catalogue.records():
+                writer.writerow(record)
+                res += 1
+        else:
+            for record in catalogue.records():
+                exportfile.write(json.dumps(dict(zip(CST__IMPORTEXPORT_COLUMNS, record)),
+                                            ensure_ascii=False))
+                exportfile.write("\n")
+                res += 1
+
+    msg("    ... {0} file(s) exported.".format(res))
+    return res
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__findtag(tag):
+def action__findtag(catalogue, tag):
     """
         action__findtag()
         ________________________________________________________________________
@@ -442,34 +2391,81 @@ def action__findtag(tag):
         regex. The function searches a substring "tag" in the tags' string.
 
         With --copyto, copy the selected files into the directory whose name
-        is given by ARGS.copyto .
+        is given by ARGS.copyto, according to --copytomode (see get_copyto_mode()) :
+        the files are copied by a pool of threads (see transfer_files()) while
+        being read from the database.
         ________________________________________________________________________
 
-        PARAMETER
-            o tag : (str)the searched tag
+        PARAMETERS
+            o catalogue : the Catalogue object of the target directory
+            o tag       : (str)the searched tag
 
         no RETURNED VALUE
     """
     msg("  = searching the files with the tag \"{0}\" =".format(tag))
 
-    if not os.path.exists(normpath(get_database_fullname())):
+    if not catalogue.exists():
         msg("    ! no database found.",
             consolecolor="red")
         return
 
-    db_connection = sqlite3.connect(get_database_fullname())
-    db_connection.row_factory = sqlite3.Row
-    db_cursor = db_connection.cursor()
+    mode = None
+    if ARGS.copyto:
+        mode = get_copyto_mode()
+        msg("    o copying the files into \"{0}\" (path: \"{1}\"), "
+            "mode : {2}".format(ARGS.copyto, normpath(ARGS.copyto), mode))
 
-    res = []
-    for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-        if tag in db_record["tagsstr"]:
+        if not os.path.exists(normpath(ARGS.copyto)):
+            msg("    * let's create \"{0}\" (path: \"{1}\"".format(ARGS.copyto,
+                                                                   normpath(ARGS.copyto)))
+            if not ARGS.off:
+                os.mkdir(normpath(ARGS.copyto))
+
+        if mode == "hardlink" and not ARGS.off and \
+           os.stat(normpath(ARGS.targetpath)).st_dev != os.stat(normpath(ARGS.copyto)).st_dev:
+            msg("    ! --copytomode=hardlink : the target directory and \"{0}\" have to be "
+                "stored on the same filesystem !".format(ARGS.copyto),
+                consolecolor="red")
+            return
 
-            res.append(db_record["name"])
-            msg("    o \"{0}\" : \"{1}\"".format(db_record["name"],
-                                                 tagsstr_repr(db_record["tagsstr"])))
+        if ARGS.off:
+            mode = None
+
+    # the files are read from the database while being copied, so that the list
+    # of the files doesn't have to be stored in memory :
+    len_res = 0
+    def transfers():
+        """
+                Yield the transfers (see transfer_files()) of the files tagged
+                with <tag>.
+        """
+        nonlocal len_res
+        for name, tagsstr in catalogue.files_with_tag(tag):
+            len_res += 1
+            msg("    o \"{0}\" : \"{1}\"".format(name, tagsstr_repr(tagsstr)))
+
+            if ARGS.copyto:
+                src = os.path.join(normpath(ARGS.targetpath), name)
+                dest = os.path.join(normpath(ARGS.copyto), name)
+                if mode is None:
+                    # --off : nothing is read.
+                    yield (len_res, src, dest, 0, 0, mode)
+                elif not os.path.exists(src):
+                    # e.g. a file added with [target]mode=nocopy :
+                    msg("    ! \"{0}\" can't be found : this file isn't "
+                        "copied.".format(src),
+                        consolecolor="red")
+                else:
+                    stat = os.stat(src)
+                    yield (len_res, src, dest, stat.st_size, stat.st_mtime, mode)
+
+    if ARGS.copyto:
+        for index, src, dest, _, _, _ in transfer_files(transfers()):
+            msg("    o ({0}) \"{1}\" copied as \"{2}\"".format(index, src, dest))
+    else:
+        for _ in transfers():
+            pass
 
-    len_res = len(res)
     if len_res == 0:
         msg("    o no file matches the tag \"{0}\" .".format(tag))
     elif len_res == 1:
@@ -477,29 +2473,86 @@ def action__findtag(tag):
     else:
         msg("    o {0} files match the tag \"{1}\" .".format(len_res, tag))
 
-    db_connection.commit()
-    db_connection.close()
+#///////////////////////////////////////////////////////////////////////////////
+def action__importdb(catalogue, filename):
+    """
+        action__importdb()
+        ________________________________________________________________________
 
-    # --copyto argument :
-    if ARGS.copyto:
-        msg("    o copying the files into \"{0}\" (path: \"{1}\")".format(ARGS.copyto,
-                                                                          normpath(ARGS.copyto)))
+        Add to the database the records stored in a JSONL or CSV file written
+        by action__exportdb(); the records whose hashid or name are already in
+        the database are ignored. Only the database is modified : no file is
+        copied.
 
-        if not os.path.exists(normpath(ARGS.copyto)):
-            msg("    * let's create \"{0}\" (path: \"{1}\"".format(ARGS.copyto,
-                                                                   normpath(ARGS.copyto)))
-            if not ARGS.off:
-                os.mkdir(normpath(ARGS.copyto))
+        The file is read line after line and the records are inserted by large
+        transactions (see CST__IMPORT_TRANSACTION_SIZE). The index on the size
+        of the files and the full-text index are dropped during the import and
+        rebuilt at the end.
+        ________________________________________________________________________
 
-        for i, filename in enumerate(res):
-            src = os.path.join(normpath(ARGS.targetpath), filename)
-            dest = os.path.join(normpath(ARGS.copyto), filename)
-            msg("    o ({0}/{1}) copying \"{2}\" as \"{3}\"...".format(i+1, len_res, src, dest))
-            if not ARGS.off:
-                shutil.copy(src, dest)
+        PARAMETERS
+            o catalogue : the Catalogue object of the target directory
+            o filename  : (str) the name of the file to be read
+
+        RETURNED VALUE
+            (int) the number of files read from <filename>, -1 if an error occured
+    """
+    #. . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+    def read_records(importfile):
+        """
+                Yield the records read from <importfile>, in the order of
+                CST__IMPORTEXPORT_COLUMNS.
+        """
+        if fileformat == "csv":
+            records = csv.DictReader(importfile)
+        else:
+            records = (json.loads(line) for line in importfile if line.strip() != "")
+
+        for line_index, record in enumerate(records):
+            try:
+                yield (record["hashid"],
+                       record["partialhashid"],
+                       int(record["size"]),
+                       record["name"],
+                       record["sourcename"],
+                       int(float(record["sourcedate"])),
+                       record["tagsstr"] or "")
+
+            except (KeyError, TypeError, ValueError) as exception:
+                raise KatalError("ill-formed record #{0} in \"{1}\" : {2}".format(line_index+1,
+                                                                                 filename,
+                                                                                 exception))
+
+    msg("  = importing \"{0}\" into the database =".format(filename))
+
+    fileformat = get_importexport_format(filename)
+    if fileformat is None:
+        return -1
+
+    if not os.path.exists(filename):
+        msg("    ! can't find \"{0}\" .".format(filename),
+            consolecolor="red")
+        return -1
+
+    catalogue.create()
+    files_number = catalogue.count()
+
+    catalogue.drop_secondary_indexes()
+    try:
+        with open(filename, encoding="utf-8", newline="") as importfile:
+            res = catalogue.add_files(read_records(importfile),
+                                      batch_size=CST__IMPORT_TRANSACTION_SIZE,
+                                      ignore_duplicates=True)
+    finally:
+        msg("    ... building the indexes...")
+        catalogue.create_secondary_indexes()
+
+    msg("    ... {0} file(s) read, {1} file(s) added to the database.".format(
+        res, catalogue.count()-files_number))
+    return res
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__infos():
+def action__infos(catalogue):
     """
         action__infos()
         ________________________________________________________________________
@@ -507,14 +2560,136 @@ def action__infos():
         Display informations about the source and the target directory
         ________________________________________________________________________
 
-        no PARAMETER
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
 
         RETURNED VALUE
                 (int) 0 if ok, -1 if an error occured
     """
     msg("  = informations =")
     show_infos_about_source_path()
-    return show_infos_about_target_path()
+    return show_infos_about_target_path(catalogue)
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__maintenance(catalogue, timebudget=None):
+    """
+        action__maintenance()
+        ________________________________________________________________________
+
+        Maintenance of the database, shard after shard (see the Catalogue
+        class) :
+
+            (1) display the size of the database and of its tables/indexes
+            (2) check the integrity of the database ("PRAGMA quick_check")
+            (3) update the statistics of the query planner (ANALYZE) and
+                merge the segments of the full-text index
+            (4) give back the free pages to the file system (incremental
+                vacuum, CST__MAINTENANCE_VACUUMPAGES pages at once)
+
+        If a time budget is given, no step is started once the budget is spent :
+        the next maintenance will go on. The vacuum also stops if a step
+        doesn't free any page (e.g. if the database is being read by another
+        process). The first vacuum of a database created
+        by an older version of Katal rebuilds the whole database and can't be
+        interrupted.
+
+        Only (1) and (2) are done if --off has been used.
+        ________________________________________________________________________
+
+        PARAMETERS
+            o catalogue  : the Catalogue object of the target directory
+            o timebudget : (None/int) maximal duration, in seconds
+
+        RETURNED VALUE
+            (int) 0 if ok, -1 if an error occured (e.g. the database is corrupted)
+    """
+    msg("  = maintenance of the database =")
+
+    if not catalogue.exists():
+        msg("    ! no database found.",
+            consolecolor="red")
+        return -1
+
+    if timebudget is not None:
+        deadline = time.monotonic() + timebudget
+    else:
+        deadline = None
+
+    #. . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+    def budget_is_spent():
+        """
+                Return True (and display a message) if the time budget is spent.
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            msg("    ! the time budget ({0} s) is spent : "
+                "the maintenance will go on next time.".format(timebudget),
+                consolecolor="red")
+            return True
+        return False
+
+    res = 0
+    for schema in catalogue.schemas:
+        if catalogue.shards > 1:
+            msg("    o shard \"{0}\" :".format(schema))
+
+        # (1) size of the database :
+        page_size, page_count, freelist_count, _ = catalogue.storage(schema)
+        msg("    o {0} page(s) of {1} bytes ({2} free page(s)) : {3}".format(
+            page_count, page_size, freelist_count, size_as_str(page_count*page_size)))
+
+        storage_by_name = catalogue.storage_by_name(schema)
+        if storage_by_name is None:
+            msg("      (the size of each table/index can't be computed : "
+                "sqlite has been compiled without the \"dbstat\" virtual table)")
+        else:
+            for name, size in storage_by_name:
+                msg("      - {0} : {1}".format(name, size_as_str(size)))
+
+        # (2) integrity check :
+        if budget_is_spent():
+            return res
+        errors = catalogue.integrity_errors(schema)
+        if errors:
+            res = -1
+            msg("    ! the database is corrupted :",
+                consolecolor="red")
+            for error in errors:
+                msg("      ! {0}".format(error),
+                    consolecolor="red")
+            # let's not write anything in a corrupted database :
+            continue
+        msg("    o integrity check : ok")
+
+        if ARGS.off:
+            continue
+
+        # (3) statistics and full-text index :
+        if budget_is_spent():
+            return res
+        catalogue.analyze(schema)
+        msg("    o statistics of the query planner updated")
+
+        # (4) vacuum :
+        while freelist_count > 0:
+            if budget_is_spent():
+                return res
+            previous_freelist_count = freelist_count
+            catalogue.vacuum(schema, CST__MAINTENANCE_VACUUMPAGES)
+            page_size, page_count, freelist_count, _ = catalogue.storage(schema)
+
+            # e.g. if another process reads the database (WAL mode) :
+            if freelist_count >= previous_freelist_count:
+                msg("    ! {0} free page(s) can't be given back to the file system : "
+                    "the maintenance will go on next time.".format(freelist_count),
+                    consolecolor="red")
+                break
+
+        if freelist_count == 0:
+            msg("    o no free page : {0} page(s), {1}".format(page_count,
+                                                              size_as_str(page_count*page_size)))
+
+    msg("    ... done")
+    return res
 
 #///////////////////////////////////////////////////////////////////////////////
 def action__new(targetname):
@@ -548,6 +2723,7 @@ def action__new(targetname):
                                      CST__DATABASE_NAME))
 
     if ARGS.verbosity != 'none':
+        msg__flush()
         answer = \
             input(("\nDo you want to download the default config file "
                    "into the expected directory ? (y/N) "))
@@ -565,24 +2741,30 @@ def action__new(targetname):
     msg("  ... done with the creation of \"{0}\" as a new target directory.".format(targetname))
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__rebase(newtargetpath):
+def action__rebase(catalogue, newtargetpath):
     """
         action__rebase()
         ________________________________________________________________________
 
         Copy the current target directory into a new one, modifying the filenames.
+
+        The files are copied according to --rebasemode (see get_rebase_mode()) :
+        with 'hardlink', 'reflink' or 'move', no data is written if both target
+        directories are stored on the same filesystem. With 'move', the files
+        moved are removed from the current database.
         ________________________________________________________________________
 
-        PARAMETER :
+        PARAMETERS :
+                o catalogue            : the Catalogue object of the target directory
                 o newtargetpath        : (str) path to the new target directory.
 
         no RETURNED VALUE
     """
-    source_path = CFG_PARAMETERS["source"]["path"]
+    mode = get_rebase_mode()
 
     msg("  = copying the current target directory into a new one =")
-    msg("    o from {0} (path : \"{1}\")".format(source_path,
-                                                 normpath(source_path)))
+    msg("    o from {0} (path : \"{1}\")".format(ARGS.targetpath,
+                                                 normpath(ARGS.targetpath)))
 
     msg("    o to   {0} (path : \"{1}\")".format(newtargetpath,
                                                  normpath(newtargetpath)))
@@ -605,23 +2787,33 @@ def action__rebase(newtargetpath):
         "{0}".format(dest_params["target"]["name of the target files"]))
     msg("    o tags to be added : "
         "{0}".format(dest_params["target"]["tags"]))
+    msg("    o mode : {0}".format(mode))
+
+    if mode in ("hardlink", "move") and \
+       os.stat(normpath(ARGS.targetpath)).st_dev != os.stat(normpath(newtargetpath)).st_dev:
+        msg("    ! --rebasemode={0} : both target directories have to be stored on the "
+            "same filesystem !".format(mode),
+            consolecolor="red")
+        return
 
     new_db = os.path.join(normpath(newtargetpath), CST__KATALSYS_SUBDIR, CST__DATABASE_NAME)
     if not ARGS.off:
-        if os.path.exists(new_db):
-            # let's delete the previous new database :
-            os.remove(new_db)
+        # let's delete the previous new database (and its shards) :
+        for index in range(CST__DATABASE_SHARDS_MAX):
+            if index == 0:
+                shard_name = new_db
+            else:
+                shard_name = get_database_shardname(new_db, index)
+            if os.path.exists(shard_name):
+                os.remove(shard_name)
 
     # let's compute the new names :
-    olddb_connection = sqlite3.connect(get_database_fullname())
-    olddb_connection.row_factory = sqlite3.Row
-    olddb_cursor = olddb_connection.cursor()
-
-    files, anomalies_nbr = action__rebase__files(olddb_cursor, dest_params, newtargetpath)
+    files, anomalies_nbr = action__rebase__files(catalogue, dest_params, newtargetpath)
 
     go_on = True
     if anomalies_nbr != 0:
         go_on = False
+        msg__flush()
         answer = \
             input(("\nAt least one anomaly detected (see details above) "
                    "Are you sure you want to go on ? (y/N) "))
@@ -629,15 +2821,11 @@ def action__rebase(newtargetpath):
         if answer in ("y", "yes"):
             go_on = True
 
-    if not go_on:
-        olddb_connection.close()
-        return
-    else:
-        action__rebase__write(new_db, files)
-        olddb_connection.close()
+    if go_on:
+        action__rebase__write(catalogue, new_db, files, mode)
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__rebase__files(olddb_cursor, dest_params, newtargetpath):
+def action__rebase__files(catalogue, dest_params, newtargetpath):
     """
         action__rebase__files()
         ________________________________________________________________________
@@ -649,7 +2837,7 @@ def action__rebase__files(olddb_cursor, dest_params, newtargetpath):
         ________________________________________________________________________
 
         PARAMETER :
-                o olddb_cursor         : cursor to the source database
+                o catalogue            : the Catalogue object of the target directory
                 o dest_params          : an object returned by read_parameters_from_cfgfile(),
                                          like CFG_PARAMETERS
                 o newtargetpath        : (str) path to the new target directory.
@@ -657,39 +2845,37 @@ def action__rebase__files(olddb_cursor, dest_params, newtargetpath):
         RETURNED VALUE :
                 (files, (int)number of anomalies)
 
-                files : a dict hashid::( (0)source name,
-                                         (1)new name,
+                files : a dict hashid::( (0)current name (full path),
+                                         (1)new name (full path),
                                          (2)source date,
                                          (3)source tagsstr,
                                          (4)size,
-                                         (5)partialhashid)
+                                         (5)partialhashid,
+                                         (6)new name (in the new target directory),
+                                         (7)source name)
     """
-    source_path = CFG_PARAMETERS["source"]["path"]
-
     files = dict()      # dict to be returned.
     filenames = set()   # to be used to avoid duplicates.
 
     anomalies_nbr = 0
-    for index, olddb_record in enumerate(olddb_cursor.execute('SELECT * FROM dbfiles')):
-        fullname = normpath(os.path.join(source_path, olddb_record["name"]))
+    for index, (hashid, partialhashid, size,
+                name, sourcename, date, tagsstr) in enumerate(catalogue.records()):
+        fullname = normpath(os.path.join(ARGS.targetpath, name))
         filename_no_extens, extension = get_filename_and_extension(fullname)
 
-        size = olddb_record["size"]
-        date = olddb_record["sourcedate"]
-        new_name = \
+        new_targetname = \
             create_target_name(parameters=dest_params,
-                               hashid=olddb_record["hashid"],
+                               hashid=hashid,
                                filename_no_extens=filename_no_extens,
-                               path=olddb_record["sourcename"],
+                               path=sourcename,
                                extension=extension,
                                _size=size,
                                date=datetime.utcfromtimestamp(date).strftime(CST__DTIME_FORMAT),
                                database_index=index)
-        new_name = normpath(os.path.join(newtargetpath, new_name))
-        tagsstr = olddb_record["tagsstr"]
+        new_name = normpath(os.path.join(newtargetpath, new_targetname))
 
-        msg("      o {0} : {1} would be copied as {2}".format(olddb_record["hashid"],
-                                                              olddb_record["name"],
+        msg("      o {0} : {1} would be copied as {2}".format(hashid,
+                                                              name,
                                                               new_name))
 
         if new_name in filenames:
@@ -708,23 +2894,31 @@ def action__rebase__files(olddb_cursor, dest_params, newtargetpath):
                 consolecolor="red")
             anomalies_nbr += 1
         else:
-            files[olddb_record["hashid"]] = (fullname, new_name, date, tagsstr)
+            files[hashid] = (fullname, new_name, date, tagsstr, size, partialhashid,
+                             new_targetname, sourcename)
             filenames.add(new_name)
 
     return files, anomalies_nbr
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__rebase__write(new_db, _files):
+def action__rebase__write(catalogue, new_db, _files, mode):
     """
         action__rebase__write()
         ________________________________________________________________________
 
         Write the files described by "_files" in the new target directory.
+
+        The files are copied by a pool of threads and written in the new
+        database batch after batch (see action__add__transfer()). With the
+        'move' mode, the records of the files moved are removed from the
+        current database in the same batches.
         ________________________________________________________________________
 
         PARAMETER :
+                o catalogue             : the Catalogue object of the target directory
                 o new_db                : (str) new database's name
                 o _files                : (dict) see action__rebase__files()
+                o mode                  : (str) see get_rebase_mode()
 
         About the underscore before "_files" :
         confer https://www.python.org/dev/peps/pep-0008/#function-and-method-arguments
@@ -734,58 +2928,332 @@ def action__rebase__write(new_db, _files):
 
         no RETURNED VALUE
     """
-    # let's write the new database :
-    newdb_connection = sqlite3.connect(new_db)
-    newdb_connection.row_factory = sqlite3.Row
-    newdb_cursor = newdb_connection.cursor()
+    if ARGS.off:
+        mode = None
 
-    try:
-        if not ARGS.off:
-            newdb_cursor.execute(CST__SQL__CREATE_DB)
-
-        for index, futurefile_hashid in enumerate(_files):
-            futurefile = _files[futurefile_hashid]
-            file_to_be_added = (futurefile_hashid,      # hashid
-                                futurefile[5],          # partial hashid
-                                futurefile[4],          # size
-                                futurefile[1],          # new name
-                                futurefile[0],          # sourcename
-                                futurefile[2],          # sourcedate
-                                futurefile[3])          # tags
-
-            strdate = datetime.utcfromtimestamp(futurefile[2]).strftime(CST__DTIME_FORMAT)
-            msg("    o ({0}/{1}) adding a file in the new database".format(index+1, len(_files)))
-            msg("      o hashid      : {0}".format(futurefile_hashid))
-            msg("      o source name : \"{0}\"".format(futurefile[0]))
-            msg("      o desti. name : \"{0}\"".format(futurefile[1]))
-            msg("      o source date : {0}".format(strdate))
-            msg("      o size        : {0}".format(futurefile[4]))
-            msg("      o tags        : \"{0}\"".format(futurefile[3]))
+    # the transfers (record of the new database, current name, new name, size,
+    # sourcedate, mode; see transfer_files()) :
+    transfers = []
+    for index, futurefile_hashid in enumerate(_files):
+        futurefile = _files[futurefile_hashid]
 
-            if not ARGS.off:
-                newdb_cursor.execute('INSERT INTO dbfiles VALUES (?,?,?,?,?,?,?)', file_to_be_added)
-                newdb_connection.commit()
+        strdate = datetime.utcfromtimestamp(futurefile[2]).strftime(CST__DTIME_FORMAT)
+        msg("    o ({0}/{1}) adding a file in the new database".format(index+1, len(_files)))
+        msg("      o hashid      : {0}".format(futurefile_hashid))
+        msg("      o source name : \"{0}\"".format(futurefile[0]))
+        msg("      o desti. name : \"{0}\"".format(futurefile[1]))
+        msg("      o source date : {0}".format(strdate))
+        msg("      o size        : {0}".format(futurefile[4]))
+        msg("      o tags        : \"{0}\"".format(futurefile[3]))
+
+        transfers.append(((futurefile_hashid,      # hashid
+                           futurefile[5],          # partial hashid
+                           futurefile[4],          # size
+                           futurefile[6],          # new name
+                           futurefile[7],          # sourcename
+                           futurefile[2],          # sourcedate
+                           futurefile[3]),         # tags
+                          futurefile[0], futurefile[1], futurefile[4], futurefile[2], mode))
+
+    # let's copy the files and write the new database :
+    newcatalogue = Catalogue(new_db)
+    newcatalogue.create()
+    action__add__transfer(newcatalogue, transfers, journal=None,
+                          moved_from=catalogue if mode == "move" else None)
+    newcatalogue.close()
+
+    msg("    ... done")
 
-    except sqlite3.IntegrityError as exception:
-        msg("!!! An error occured while writing the new database : "+str(exception))
-        raise KatalError("An error occured while writing the new database : "+str(exception))
+#///////////////////////////////////////////////////////////////////////////////
+def action__rebaseinplace(catalogue):
+    """
+        action__rebaseinplace()
+        ________________________________________________________________________
 
-    newdb_connection.close()
+        Rename the files of the target directory according to the current
+        [target]name of the target files, without copying them : the files are
+        renamed (see action__rebaseinplace__renames()) and the database is
+        updated in one transaction.
 
-    # let's copy the files :
-    for index, futurefile_hashid in enumerate(_files):
-        futurefile = _files[futurefile_hashid]
-        old_name, new_name = futurefile[0], futurefile[1]
+        Nothing is renamed if at least one anomaly is detected (two files
+        bearing the same new name, a new name already used by a file which
+        isn't renamed, a missing file).
 
-        msg("    o ({0}/{1}) copying \"{2}\" as \"{3}\"".format(index+1, len(_files),
-                                                                old_name, new_name))
-        if not ARGS.off:
-            shutil.copyfile(old_name, new_name)
+        The renamings are written in a journal (see CST__REBASEINPLACE_JOURNALNAME)
+        before being applied, so that an interrupted --rebaseinplace can be
+        completed (see action__rebaseinplace__resume()).
+        ________________________________________________________________________
+
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
+    """
+    msg("  = renaming the files of the target directory =")
+    msg("    o new filenames' format : "
+        "{0}".format(CFG_PARAMETERS["target"]["name of the target files"]))
+
+    moves = dict()      # (str)current name : (str)new name
+    newnames = dict()   # (str)new name : hashid
+    names = set()       # (str)current names
+    anomalies_nbr = 0
+    for index, (hashid, _, size,
+                name, sourcename, date, _) in enumerate(catalogue.records()):
+        names.add(name)
+
+        fullname = normpath(os.path.join(ARGS.targetpath, name))
+        filename_no_extens, extension = get_filename_and_extension(fullname)
+
+        new_targetname = \
+            create_target_name(parameters=CFG_PARAMETERS,
+                               hashid=hashid,
+                               filename_no_extens=filename_no_extens,
+                               path=sourcename,
+                               extension=extension,
+                               _size=size,
+                               date=datetime.utcfromtimestamp(date).strftime(CST__DTIME_FORMAT),
+                               database_index=index)
+
+        if new_targetname == name:
+            continue
+
+        msg("      o {0} : {1} would be renamed as {2}".format(hashid,
+                                                              name,
+                                                              new_targetname))
+
+        if not os.path.exists(fullname):
+            msg("      ! anomaly : file {0} is missing !".format(fullname),
+                consolecolor="red")
+            anomalies_nbr += 1
+        elif new_targetname in newnames:
+            msg("      ! anomaly : file {1} should be renamed as {0} "
+                "but this name would have been already given to another file !".format(
+                    new_targetname, name),
+                consolecolor="red")
+            anomalies_nbr += 1
+        else:
+            moves[name] = new_targetname
+            newnames[new_targetname] = hashid
+
+    # the new names already used by a file which isn't renamed :
+    for new_targetname in newnames:
+        if new_targetname not in moves and \
+           (new_targetname in names or
+            os.path.exists(os.path.join(normpath(ARGS.targetpath), new_targetname))):
+            msg("      ! anomaly : the name {0} is already used "
+                "in the target directory !".format(new_targetname),
+                consolecolor="red")
+            anomalies_nbr += 1
+
+    if anomalies_nbr != 0:
+        msg("    ! {0} anomaly/anomalies detected (see details above) : "
+            "no file has been renamed.".format(anomalies_nbr),
+            consolecolor="red")
+        return
+
+    def tempname(number):
+        """
+                Temporary name used to break a cycle of renamings.
+        """
+        return os.path.join(CST__KATALSYS_SUBDIR, CST__TASKS_SUBSUBDIR,
+                            "rebaseinplace.{0}.tmp".format(number))
+    renames = action__rebaseinplace__renames(moves, tempname)
+
+    msg("    o {0} file(s) to be renamed, "
+        "{1} renaming(s) to be done.".format(len(moves), len(renames)))
+    if ARGS.off or not renames:
+        msg("    ... done")
+        return
+
+    # the journal describes what has to be done before anything is done,
+    # see action__rebaseinplace__resume() :
+    journal = Journal(get_journal_fullname(CST__REBASEINPLACE_JOURNALNAME))
+    journal.append(itertools.chain(({"rename" : rename} for rename in renames),
+                                   ({"name" : (new_targetname, hashid)}
+                                    for new_targetname, hashid in newnames.items())))
+    if get_io_durability() != "none":
+        journal.sync()
+
+    action__rebaseinplace__apply(catalogue, journal)
+
+    msg("    ... done")
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__rebaseinplace__apply(catalogue, journal):
+    """
+        action__rebaseinplace__apply()
+        ________________________________________________________________________
+
+        Apply the renamings written in the journal of --rebaseinplace and not
+        marked as done, then write the new names in the database and remove
+        the journal.
+
+        The journal contains :
+            {"rename" : (old name, new name)}   (in the order of the renamings)
+            {"name" : (new name, hashid)}       (the new names of the database)
+            {"done" : (int)number of the renaming}
+            {"missing" : new name}              (see below)
+
+        The last renaming marked as undone may have been applied before the
+        program was interrupted : in this case, its old name doesn't exist
+        anymore and its new name does.
+
+        If neither the old name nor the new name exists, the file has been
+        removed : the renaming is marked as "missing" without doing anything,
+        as the next renamings of this file, and its name isn't modified in the
+        database (its record is removed if another file takes its name).
+        ________________________________________________________________________
+
+        PARAMETERS
+                o catalogue : the Catalogue object of the target directory
+                o journal   : the Journal object, see CST__REBASEINPLACE_JOURNALNAME
+
+        no RETURNED VALUE
+    """
+    renames = []
+    rows = []
+    done = set()
+    missing = set()     # (str)new names of the files removed
+    for record in journal.records():
+        if "rename" in record:
+            renames.append(record["rename"])
+        elif "name" in record:
+            rows.append(tuple(record["name"]))
+        elif "done" in record:
+            done.add(record["done"])
+        elif "missing" in record:
+            missing.add(record["missing"])
+
+    targetpath = normpath(ARGS.targetpath)
+    for index, (oldname, newname) in enumerate(renames):
+        if index in done or newname in missing:
+            continue
+
+        fulloldname = os.path.join(targetpath, oldname)
+        fullnewname = os.path.join(targetpath, newname)
+        if oldname in missing or \
+           (not os.path.exists(fulloldname) and not os.path.exists(fullnewname)):
+            if oldname not in missing:
+                msg("    ! anomaly : neither {0} nor {1} can be found : this file "
+                    "isn't renamed.".format(fulloldname, fullnewname),
+                    consolecolor="red")
+            missing.add(newname)
+            journal.append(({"missing" : newname},))
+            continue
+
+        if os.path.exists(fulloldname) or not os.path.exists(fullnewname):
+            if not os.path.isdir(os.path.dirname(fullnewname)):
+                os.makedirs(os.path.dirname(fullnewname))
+            io_throttle()
+            os.rename(fulloldname, fullnewname)
+
+        journal.append(({"done" : index},))
+
+    # the renamings are written on disk before the database (see [io]durability) :
+    if get_io_durability() != "none" and \
+       not sync_filesystem(targetpath):
+        sync_file(targetpath)
+
+    if missing:
+        # (str)new name : (str)name before the renamings
+        oldnames = dict()
+        for oldname, newname in renames:
+            oldnames[newname] = oldnames.pop(oldname, oldname)
+
+        newnames = set(newname for newname, _ in rows if newname not in missing)
+        removed = [(hashid,) for newname, hashid in rows
+                   if newname in missing and oldnames[newname] in newnames]
+        if removed:
+            msg("    ! {0} missing file(s) removed from the database since their "
+                "name is given to another file.".format(len(removed)),
+                consolecolor="red")
+            catalogue.delete_files(removed)
+        rows = [row for row in rows if row[0] not in missing]
+
+    catalogue.rename_files(rows)
+    journal.remove()
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__rebaseinplace__renames(moves, tempname):
+    """
+        action__rebaseinplace__renames()
+        ________________________________________________________________________
+
+        Return the ordered list of the renamings required to give their new
+        name to some files : a file is renamed once its new name has been freed
+        by the file bearing it. The cycles (e.g. a->b, b->a) are broken by
+        renaming one of their files with a temporary name :
+                a->temp, b->a, temp->b
+        ________________________________________________________________________
+
+        PARAMETERS
+                o moves    : a dict (str)current name : (str)new name; the new
+                             names are all different and can only be current
+                             names of <moves> or free names.
+                o tempname : a function returning a (str)temporary name from
+                             an integer
+
+        RETURNED VALUE
+                a list of [(str)old name, (str)new name]
+    """
+    res = []
+    pending = dict(moves)
+    # (str)name : the current name of the file waiting for <name> to be freed
+    waiting = {new : old for old, new in moves.items() if new in moves}
+    ready = deque(old for old, new in moves.items() if new not in moves)
+
+    temp_number = 0
+    while pending:
+        if ready:
+            old = ready.popleft()
+            new = pending.pop(old)
+        else:
+            # only cycles remain :
+            old = next(iter(pending))
+            new = tempname(temp_number)
+            temp_number += 1
+            pending[new] = pending.pop(old)
+            waiting[pending[new]] = new
+
+        res.append([old, new])
+        if old in waiting:
+            ready.append(waiting.pop(old))
+
+    return res
 
+#///////////////////////////////////////////////////////////////////////////////
+def action__rebaseinplace__resume(catalogue):
+    """
+        action__rebaseinplace__resume()
+        ________________________________________________________________________
+
+        Complete the last --rebaseinplace if it has been interrupted, i.e. if
+        its journal (see CST__REBASEINPLACE_JOURNALNAME) still exists : the
+        names of the files and the names stored in the database have to be
+        the same before anything else is done.
+        ________________________________________________________________________
+
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
+    """
+    journal = Journal(get_journal_fullname(CST__REBASEINPLACE_JOURNALNAME))
+    if not journal.exists():
+        return
+
+    msg("  = an interrupted --rebaseinplace has to be completed "
+        "(see \"{0}\") =".format(journal.filename),
+        consolecolor="cyan")
+    if ARGS.off:
+        msg("    ... nothing is done since --off has been used.")
+        return
+
+    action__rebaseinplace__apply(catalogue, journal)
     msg("    ... done")
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__reset():
+def action__reset(catalogue):
     """
         action__reset()
         ________________________________________________________________________
@@ -793,48 +3261,36 @@ def action__reset():
         Delete the files in the target directory and the database.
         ________________________________________________________________________
 
-        no PARAMETER, no RETURNED VALUE
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
     """
     msg("    = about to delete (=move in the trash) the target files and the database.")
 
-    if not os.path.exists(normpath(get_database_fullname())):
+    if not catalogue.exists():
         msg("    ! no database found, nothing to do .",
             consolecolor="red")
         return
 
     if ARGS.verbosity != 'none':
+        msg__flush()
         answer = \
             input(("\nDo you really want to delete (=move to the katal trash directory)"
                    "the files in the target directory and the database (y/N) "))
         if answer not in ("y", "yes"):
             return
 
-    db_connection = sqlite3.connect(get_database_fullname())
-    db_connection.row_factory = sqlite3.Row
-    db_cursor = db_connection.cursor()
-
-    files_to_be_removed = []  # a list of (hashid, fullname)
-    for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-        files_to_be_removed.append((db_record["hashid"], db_record["name"]))
-
-    for hashid, name in files_to_be_removed:
-        msg("   o removing {0} from the database and from the target path".format(name))
-        if not ARGS.off:
-            # let's remove the file from the target directory :
-            shutil.move(os.path.join(normpath(ARGS.targetpath), name),
-                        os.path.join(normpath(ARGS.targetpath),
-                                     CST__KATALSYS_SUBDIR, CST__TRASH_SUBSUBDIR, name))
-            # let's remove the file from the database :
-            db_cursor.execute("DELETE FROM dbfiles WHERE hashid=?", (hashid,))
-
-            db_connection.commit()
+    files_to_be_removed = list(catalogue.files())  # a list of (hashid, name)
 
-    db_connection.close()
+    # the files are moved to the trash while the records are read by db_executemany(),
+    # the database being modified batch after batch :
+    catalogue.delete_files(move_to_the_trash(files_to_be_removed))
 
     msg("    = ... done : the database should be empty, the target files should no longer exist.")
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__rmnotags():
+def action__rmnotags(catalogue):
     """
         action__rmnotags
         ________________________________________________________________________
@@ -843,42 +3299,27 @@ def action__rmnotags():
         they have no tags.
         ________________________________________________________________________
 
-        no PARAMETER, no RETURNED VALUE
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
     """
     msg("  = removing all files with no tags (=moving them to the trash) =")
 
-    if not os.path.exists(normpath(get_database_fullname())):
+    if not catalogue.exists():
         msg("    ! no database found.",
             consolecolor="red")
     else:
-        db_connection = sqlite3.connect(get_database_fullname())
-        db_connection.row_factory = sqlite3.Row
-        db_cursor = db_connection.cursor()
-
-        files_to_be_removed = []    # list of (hashid, name)
-        for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-            if db_record["tagsstr"] == "":
-                files_to_be_removed.append((db_record["hashid"], db_record["name"]))
+        files_to_be_removed = list(catalogue.files_without_tags())    # list of (hashid, name)
 
         if len(files_to_be_removed) == 0:
             msg("   ! no files to be removed.",
                 consolecolor="red")
         else:
-            for hashid, name in files_to_be_removed:
-                msg("   o removing {0} from the database and from the target path".format(name))
-                if not ARGS.off:
-                    # let's remove the file from the target directory :
-                    shutil.move(os.path.join(normpath(ARGS.targetpath), name),
-                                os.path.join(normpath(ARGS.targetpath),
-                                             CST__KATALSYS_SUBDIR, CST__TRASH_SUBSUBDIR, name))
-                    # let's remove the file from the database :
-                    db_cursor.execute("DELETE FROM dbfiles WHERE hashid=?", (hashid,))
-
-        db_connection.commit()
-        db_connection.close()
+            catalogue.delete_files(move_to_the_trash(files_to_be_removed))
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__rmtags(dest):
+def action__rmtags(catalogue, dest):
     """
         action__rmtags()
         ________________________________________________________________________
@@ -888,11 +3329,74 @@ def action__rmtags(dest):
         ________________________________________________________________________
 
         PARAMETERS
+                o catalogue      : the Catalogue object of the target directory
                 o dest           : (str) a regex string describing what files are
                                    concerned
     """
     msg("  = let's remove the tags' string(s) in {0}".format(dest))
-    action__settagsstr(tagsstr="", dest=dest)
+    action__settagsstr(catalogue=catalogue, tagsstr="", dest=dest)
+
+#///////////////////////////////////////////////////////////////////////////////
+def action__search(catalogue, query):
+    """
+        action__search()
+        ________________________________________________________________________
+
+        Display the files whose name, source name or tags' string match the
+        query, using the full-text index (see create_fts_index()).
+
+        The query uses the FTS5 syntax, e.g. :
+                wedding
+                sourcename:wedding AND tagsstr:2019
+                "wedding" OR "birthday"
+
+        The matches are displayed as they are read from the database : the
+        function doesn't store the results in memory.
+        ________________________________________________________________________
+
+        PARAMETERS
+            o catalogue : the Catalogue object of the target directory
+            o query     : (str)the searched string
+
+        RETURNED VALUE
+            (int) the number of files matching the query, -1 if an error occured
+    """
+    msg("  = searching the files matching the query \"{0}\" =".format(query))
+
+    if not catalogue.exists():
+        msg("    ! no database found.",
+            consolecolor="red")
+        return -1
+
+    res = 0
+    try:
+        matches = catalogue.search(query)
+        if matches is None:
+            msg("    ! the full-text index can't be used : "
+                "your sqlite library doesn't support the FTS5 module "
+                "or the index can't be created (--off).",
+                consolecolor="red")
+            return -1
+
+        for name, sourcename, tagsstr in matches:
+            res += 1
+            msg("    o \"{0}\" : \"{1}\" (source name : \"{2}\")".format(name,
+                                                                     tagsstr_repr(tagsstr),
+                                                                     sourcename))
+
+    except sqlite3.OperationalError as exception:
+        msg("    ! can't understand the query \"{0}\" : {1}".format(query, exception),
+            consolecolor="red")
+        return -1
+
+    if res == 0:
+        msg("    o no file matches the query \"{0}\" .".format(query))
+    elif res == 1:
+        msg("    o one file matches the query \"{0}\" .".format(query))
+    else:
+        msg("    o {0} files match the query \"{1}\" .".format(res, query))
+
+    return res
 
 #///////////////////////////////////////////////////////////////////////////////
 def action__select():
@@ -973,7 +3477,7 @@ def action__select():
                 break
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__settagsstr(tagsstr, dest):
+def action__settagsstr(catalogue, tagsstr, dest):
     """
         action__settagsstr()
         ________________________________________________________________________
@@ -982,87 +3486,101 @@ def action__settagsstr(tagsstr, dest):
         ________________________________________________________________________
 
         PARAMETERS
+                o catalogue    : the Catalogue object of the target directory
                 o tagsstr      : (str) the new tags' strings
                 o dest         : (str) a regex string describing what files are
                                  concerned
     """
     msg("  = let's apply the tag string\"{0}\" to {1}".format(tagsstr, dest))
-    modify_the_tag_of_some_files(tag=tagsstr, dest=dest, mode="set")
+    modify_the_tag_of_some_files(catalogue=catalogue, tag=tagsstr, dest=dest, mode="set")
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__target_kill(filename):
+def action__target_kill(catalogue, filenames):
     """
         action__target_kill()
         ________________________________________________________________________
 
-        Delete "filename" from the target directory and from the database.
+        Delete some files from the target directory and from the database.
+
+        Each item of "filenames" is either a file's name, either a GLOB pattern
+        (e.g. "file*.jpg"), either "@" followed by the name of a text file
+        containing one name/GLOB pattern per line. The names are looked up in
+        the database by its index and all the files are removed in one
+        transaction; if a file can't be moved to the trash, the files already
+        moved are removed from the database before the exception is raised
+        again (see db_executemany()).
         ________________________________________________________________________
 
-        PARAMETER
-                o  filename    : (str) file's name to be deleted.
+        PARAMETERS
+                o  catalogue   : the Catalogue object of the target directory
+                o  filenames   : (list of str) files' names to be deleted.
                                   DO NOT GIVE A PATH, just the file's name,
                                   without the path to the target directory
 
         RETURNED VALUE
-                (int) : 0 if success, -1 if the file doesn't exist in the target
-                        directory, -2 if the file doesn't exist in the database,
-                        -3 if there's no database.
-    """
-    msg("  = about to remove \"{0}\" from the target directory (=file moved to the trash) "
-        "and from its database =".format(filename))
-    if not os.path.exists(os.path.join(normpath(ARGS.targetpath), filename)):
-        msg("    ! can't find \"{0}\" file on disk.".format(filename),
-            consolecolor="red")
-        return -1
+                (int) : 0 if success, -1 if a file doesn't exist in the target
+                        directory, -2 if a name doesn't match any file in the
+                        database, -3 if there's no database.
+    """
+    # the names/patterns given on the command line or read from the list files :
+    patterns = []
+    for filename in filenames:
+        if filename.startswith("@"):
+            with open(filename[1:], encoding="utf-8") as listfile:
+                patterns.extend(line.strip() for line in listfile if line.strip() != "")
+        else:
+            patterns.append(filename)
+
+    msg("  = about to remove {0} from the target directory (=file moved to the trash) "
+        "and from its database =".format(", ".join("\"{0}\"".format(pattern)
+                                                  for pattern in patterns)))
 
-    if not os.path.exists(normpath(get_database_fullname())):
+    if not catalogue.exists():
         msg("    ! no database found.",
             consolecolor="red")
         return -3
-    else:
-        db_connection = sqlite3.connect(get_database_fullname())
-        db_connection.row_factory = sqlite3.Row
-        db_cursor = db_connection.cursor()
 
-        filename_hashid = None
-        for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-            if db_record["name"] == os.path.join(normpath(ARGS.targetpath), filename):
-                filename_hashid = db_record["hashid"]
+    res = 0  # success.
 
-        if filename_hashid is None:
-            msg("    ! can't find \"{0}\" file in the database.".format(filename),
+    files_to_be_removed = OrderedDict()     # hashid : name
+    for pattern in patterns:
+        files = list(catalogue.files_named(pattern))
+        if len(files) == 0:
+            msg("    ! can't find \"{0}\" file in the database.".format(pattern),
                 consolecolor="red")
             res = -2
-        else:
-            if not ARGS.off:
-                # let's remove filename from the target directory :
-                shutil.move(os.path.join(normpath(ARGS.targetpath), filename),
-                            os.path.join(normpath(ARGS.targetpath),
-                                         CST__KATALSYS_SUBDIR, CST__TRASH_SUBSUBDIR, filename))
-
-                # let's remove filename from the database :
-                db_cursor.execute("DELETE FROM dbfiles WHERE hashid=?", (filename_hashid,))
 
-            res = 0  # success.
+        for hashid, name in files:
+            if not os.path.exists(os.path.join(normpath(ARGS.targetpath), name)):
+                msg("    ! can't find \"{0}\" file on disk.".format(name),
+                    consolecolor="red")
+                res = -1
+            else:
+                files_to_be_removed[hashid] = name
 
-        db_connection.commit()
-        db_connection.close()
+    # let's remove the files from the target directory and from the database :
+    catalogue.delete_files(move_to_the_trash(files_to_be_removed.items()),
+                           batch_size=0)
 
-        msg("    ... done")
-        return res
+    msg("    ... done")
+    return res
 
 #///////////////////////////////////////////////////////////////////////////////
-def action__whatabout(src):
+def action__whatabout(catalogue, src):
     """
         action__whatabout()
         ________________________________________________________________________
 
         Take a look at the "src" file/directory and answer the following question :
         is this file/(are these files) already in the target directory ?
+
+        The databases listed in the [database]other catalogues option are
+        consulted too (see read_other_catalogues()).
         ________________________________________________________________________
 
-        PARAMETER
-            o src : (str) the source file's name
+        PARAMETERS
+            o catalogue : the Catalogue object of the target directory
+            o src       : (str) the source file's name
 
         RETURNED VALUE : (bool)is everything ok (=no error) ?
     """
@@ -1082,19 +3600,39 @@ def action__whatabout(src):
         sourcedate2 = sourcedate2.total_seconds()
         msg("    = mtime : {0} (epoch value : {1})".format(sourcedate, sourcedate2))
 
-        srchash = hashfile64(srcfile_name)
-        msg("    = hash : {0}".format(srchash))
-
-        # is the hash in the database ?
-        already_present_in_db = False
-        for hashid in TARGET_DB:
-            if hashid == srchash:
-                already_present_in_db = True
-                break
-        if already_present_in_db:
-            msg("    = the file's content is equal to a file ALREADY present in the database.")
-        else:
+        # the Bloom filters may tell that the file isn't in the databases before
+        # the whole file is read :
+        candidates = [candidate for candidate in [catalogue] + other_catalogues
+                      if candidate.bloomfilter is None or
+                      candidate.bloomfilter.may_contain_size(size)]
+        if candidates:
+            partialhashid = hashfile(srcfile_name, stop_after=CST__PARTIALHASHID_BYTESNBR)
+            candidates = [candidate for candidate in candidates
+                          if candidate.bloomfilter is None or
+                          candidate.bloomfilter.may_contain_partialhashid(partialhashid)]
+        if not candidates:
             msg("    = the file isn't present in the database.")
+            return
+
+        srchash = hashfile(srcfile_name)
+        msg("    = hash : {0}".format(b64encode(srchash).decode()))
+
+        # is the hash in the database(s) ?
+        for candidate in candidates:
+            if (candidate.bloomfilter is None or
+                    candidate.bloomfilter.may_contain_hashid(srchash)) and \
+               candidate.record(b64encode(srchash).decode()) is not None:
+                if candidate is catalogue:
+                    msg("    = the file's content is equal to a file ALREADY present "
+                        "in the database.")
+                else:
+                    msg("    = the file's content is equal to a file ALREADY present "
+                        "in the database \"{0}\".".format(candidate.db_name))
+                return
+
+        msg("    = the file isn't present in the database.")
+
+    other_catalogues = []  # initialized below by read_other_catalogues()
 
     # (1) does src exist ?
     normsrc = normpath(src)
@@ -1111,6 +3649,7 @@ def action__whatabout(src):
                 consolecolor="red")
             return False
 
+        other_catalogues = read_other_catalogues()
         for dirpath, _, filenames in os.walk(normpath(src)):
             for filename in filenames:
                 fullname = os.path.join(normpath(dirpath), filename)
@@ -1126,22 +3665,24 @@ def action__whatabout(src):
             msg("    = hash : {0}".format(srchash))
             msg("    Informations extracted from the database :")
             # informations from the database :
-            db_connection = sqlite3.connect(get_database_fullname())
-            db_connection.row_factory = sqlite3.Row
-            db_cursor = db_connection.cursor()
-            for db_record in db_cursor.execute("SELECT * FROM dbfiles WHERE hashid=?", (srchash,)):
-                msg("    = partial hashid : {0}".format(db_record["partialhashid"]))
-                msg("    = name : {0}".format(db_record["name"]))
-                msg("    = size : {0}".format(db_record["size"]))
-                msg("    = source name : {0}".format(db_record["sourcename"]))
-                msg("    = source date : {0}".format(db_record["sourcedate"]))
-                msg("    = tags' string : {0}".format(db_record["tagsstr"]))
-            db_connection.close()
+            db_record = catalogue.record(srchash)
+            if db_record is not None:
+                _, partialhashid, size, name, sourcename, sourcedate, tagsstr = db_record
+                msg("    = partial hashid : {0}".format(partialhashid))
+                msg("    = name : {0}".format(name))
+                msg("    = size : {0}".format(size))
+                msg("    = source name : {0}".format(sourcename))
+                msg("    = source date : {0}".format(sourcedate))
+                msg("    = tags' string : {0}".format(tagsstr))
 
         else:
             # normal case : the file is outside the target directory :
+            other_catalogues = read_other_catalogues()
             show_infos_about_a_srcfile(normpath(src))
 
+    for other_catalogue in other_catalogues:
+        other_catalogue.close()
+
     return True
 
 #///////////////////////////////////////////////////////////////////////////////
@@ -1225,20 +3766,147 @@ def backup_logfile(_logfile_fullname):
         backup_logfile()
         ________________________________________________________________________
 
-        copy a logfile named _logfile_fullname into a backuped file.
+        rename a logfile named _logfile_fullname into a backuped file : the file
+        isn't copied, the renaming being atomic.
 
           o  The backuped file is stored in the CST__LOG_SUBSUBDIR directory.
           o  The name of the backuped file is automatically created from a call to
              datetime.now() . See the CST__LOGFILE_DTIMEFORMATSTR constant.
+          o  The backuped files are then compressed and the oldest ones removed
+             by the thread of LOGFILE_BACKUPS, see backup_logfile__clean().
         ________________________________________________________________________
 
-        NO PARAMETER, no RETURNED VALUE
+        PARAMETER
+                o _logfile_fullname : (str) the name of the log file, which has
+                                      to be closed.
+
+        no RETURNED VALUE
     """
+    global LOGFILE_BACKUPS
+
     logfile_backup = os.path.join(CST__KATALSYS_SUBDIR, CST__LOG_SUBSUBDIR,
                                   CFG_PARAMETERS["log file"]["name"] + \
                                   datetime.strftime(datetime.now(),
                                                     CST__LOGFILE_DTIMEFORMATSTR))
-    shutil.copyfile(_logfile_fullname, logfile_backup)
+    os.replace(_logfile_fullname, logfile_backup)
+
+    if LOGFILE_BACKUPS is None:
+        LOGFILE_BACKUPS = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    LOGFILE_BACKUPS.submit(backup_logfile__clean)
+
+#///////////////////////////////////////////////////////////////////////////////
+def backup_logfile__clean():
+    """
+        backup_logfile__clean()
+        ________________________________________________________________________
+
+        Compress the backuped log files (see backup_logfile__compress() and
+        [log file]compression), then remove the oldest ones so that there are
+        at most [log file]maximal number of backups files whose total size is
+        at most [log file]maximal size of the backups bytes (0 : no limit).
+
+        The temporary files left by an interrupted compression are removed
+        first : the backuped log file they come from hasn't been removed.
+
+        This function is called by the thread of LOGFILE_BACKUPS, so that the
+        thread writing the messages doesn't wait : see backup_logfile().
+        ________________________________________________________________________
+
+        no PARAMETER, no RETURNED VALUE
+    """
+    logs_path = os.path.join(CST__KATALSYS_SUBDIR, CST__LOG_SUBSUBDIR)
+    logfile_name = CFG_PARAMETERS["log file"]["name"]
+    compression = get_logfile_compression()
+    max_number, max_size = get_logfile_retention()
+
+    try:
+        # (str)date of the backup, (str)file name :
+        backups = []
+        # (str)file name, (str)extension of the files to be compressed :
+        uncompressed = []
+        for filename in os.listdir(logs_path):
+            if not filename.startswith(logfile_name):
+                continue
+            date = filename[len(logfile_name):]
+            stale = date.endswith(".tmp")
+            if stale:
+                date = date[:-len(".tmp")]
+            extension = ""
+            for extension in sorted(CST__LOGFILE_COMPRESSIONS.values(), reverse=True):
+                if date.endswith(extension):
+                    date = date[:len(date)-len(extension)]
+                    break
+            try:
+                datetime.strptime(date, CST__LOGFILE_DTIMEFORMATSTR)
+            except ValueError:
+                # not a backuped log file :
+                continue
+
+            fullname = os.path.join(logs_path, filename)
+            if stale:
+                # see backup_logfile__compress() :
+                os.remove(fullname)
+            elif extension == "" and compression != "none":
+                uncompressed.append((date, fullname))
+            else:
+                backups.append((date, fullname))
+
+        for date, fullname in uncompressed:
+            backups.append((date, backup_logfile__compress(fullname, compression)))
+
+        # the oldest backups are removed first :
+        backups.sort(reverse=True)
+        total_size = 0
+        for index, (_, fullname) in enumerate(backups):
+            total_size += os.stat(fullname).st_size
+            if (max_number and index >= max_number) or (max_size and total_size > max_size):
+                os.remove(fullname)
+
+    except OSError as exception:
+        msg("  ! an error occured while compressing or removing "
+            "the backuped log files : {0}".format(exception),
+            consolecolor="red")
+
+#///////////////////////////////////////////////////////////////////////////////
+def backup_logfile__compress(filename, compression):
+    """
+        backup_logfile__compress()
+        ________________________________________________________________________
+
+        Compress a backuped log file (the compressed file replacing it), see
+        backup_logfile__clean(). The compressed file is written under a
+        temporary name, then renamed : an interrupted compression doesn't
+        remove anything.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o filename    : (str) the backuped log file's name
+                o compression : (str) "gzip" or "lzma", see [log file]compression
+
+        RETURNED VALUE
+                (str) the name of the compressed file
+    """
+    compressed_name = filename + CST__LOGFILE_COMPRESSIONS[compression]
+
+    with open(filename, "rb") as srcfile, open(compressed_name + ".tmp", "wb") as rawfile:
+        if compression == "gzip":
+            compressedfile = gzip.GzipFile(filename=os.path.basename(filename),
+                                           mode="wb", fileobj=rawfile)
+        else:
+            compressedfile = lzma.LZMAFile(rawfile, "wb")
+        with compressedfile:
+            shutil.copyfileobj(srcfile, compressedfile, CST__THROTTLEDCOPY_BLOCKSIZE)
+
+        # let's force writing on disk (see [io]durability) before removing
+        # the backuped file :
+        if get_io_durability() != "none":
+            rawfile.flush()
+            os.fsync(rawfile.fileno())
+
+    os.replace(compressed_name + ".tmp", compressed_name)
+    os.remove(filename)
+
+    return compressed_name
 
 #///////////////////////////////////////////////////////////////////////////////
 def check_args():
@@ -1276,35 +3944,289 @@ def check_args():
     if ARGS.copyto and not ARGS.findtag:
         raise KatalError("--copyto can only be used in combination with --findtag .")
 
+    # --copytomode can only be used with --copyto :
+    if ARGS.copytomode is not None and not ARGS.copyto:
+        raise KatalError("--copytomode can only be used in combination with --copyto .")
+
+    # --rebasemode can only be used with --rebase :
+    if ARGS.rebasemode is not None and not ARGS.rebase:
+        raise KatalError("--rebasemode can only be used in combination with --rebase .")
+
+    # --timebudget can only be used with --maintenance :
+    if ARGS.timebudget is not None and not ARGS.maintenance:
+        raise KatalError("--timebudget can only be used in combination with --maintenance .")
+
+#///////////////////////////////////////////////////////////////////////////////
+def copy_file(source_name, target_name, method):
+    """
+        copy_file()
+        ________________________________________________________________________
+
+        Copy a file, according to <method> :
+
+        o 'copy'     : the content of the file is copied;
+        o 'reflink'  : the target file shares the data of the source file, which
+                       will be copied only when modified (see copy_file__reflink());
+                       the filesystem has to support it;
+        o 'hardlink' : the target file is a hard link to the source file; both
+                       files have to be stored on the same filesystem;
+        o 'fastest'  : 'reflink' if possible, otherwise a copy made by the
+                       kernel (see copy_file__range()), otherwise 'copy';
+        o 'symlink'  : the target file is a symbolic link to the source file
+                       (see CST__COPYTO_MODES).
+
+        If the bytes read or written are limited (see the IOThrottle class),
+        'copy' copies the file block after block (see copy_file__throttled()).
+        ________________________________________________________________________
+
+        PARAMETERS
+                o source_name : (str) the source file's name
+                o target_name : (str) the target file's name
+                o method      : (str) a value of CST__COPYTO_MODES
+
+        no RETURNED VALUE
+    """
+    if method == "hardlink":
+        io_throttle()
+        os.link(source_name, target_name)
+        return
+
+    if method == "symlink":
+        io_throttle()
+        os.symlink(os.path.abspath(source_name), target_name)
+        return
+
+    if method in ("reflink", "fastest"):
+        try:
+            io_throttle()
+            copy_file__reflink(source_name, target_name)
+            return
+        except OSError:
+            if method == "reflink":
+                raise
+
+        try:
+            copy_file__range(source_name, target_name)
+            return
+        except OSError:
+            pass
+
+    if IO_THROTTLE is not None and IO_THROTTLE.active():
+        copy_file__throttled(source_name, target_name)
+    else:
+        shutil.copyfile(source_name, target_name)
+
+#///////////////////////////////////////////////////////////////////////////////
+def copy_file__range(source_name, target_name):
+    """
+        copy_file__range()
+        ________________________________________________________________________
+
+        Copy a file with os.copy_file_range() : the data are copied by the
+        kernel (or by the file server), without being read by Katal. An OSError
+        is raised if it's not possible (or if the number of bytes copied isn't
+        the size of the source file); in this case, the target file doesn't
+        exist.
+
+        If the bytes read or written are limited (see the IOThrottle class),
+        the file is copied by blocks of CST__THROTTLEDCOPY_BLOCKSIZE bytes.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o source_name : (str) the source file's name
+                o target_name : (str) the target file's name
+
+        no RETURNED VALUE
+    """
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOTSUP, "os.copy_file_range() isn't available", target_name)
+
+    blocksize = 2**30
+    if IO_THROTTLE is not None and IO_THROTTLE.active():
+        blocksize = CST__THROTTLEDCOPY_BLOCKSIZE
+
+    with open(source_name, "rb") as source, open(target_name, "xb") as target:
+        try:
+            size = os.fstat(source.fileno()).st_size
+            copied = 0
+            length = os.copy_file_range(source.fileno(), target.fileno(), blocksize)
+            while length > 0:
+                copied += length
+                io_throttle(read=length, written=length, operations=2)
+                length = os.copy_file_range(source.fileno(), target.fileno(), blocksize)
+
+            # some filesystems return 0 instead of raising an error :
+            if copied != size:
+                raise OSError(errno.EIO, "os.copy_file_range() copied {0} byte(s) "
+                              "instead of {1}".format(copied, size), target_name)
+        except OSError:
+            target.close()
+            os.remove(target_name)
+            raise
+
+#///////////////////////////////////////////////////////////////////////////////
+def copy_file__reflink(source_name, target_name):
+    """
+        copy_file__reflink()
+        ________________________________________________________________________
+
+        Clone a file (FICLONE ioctl, see CST__FICLONE) : the target file shares
+        the data of the source file. An OSError is raised if the filesystem
+        (or the platform) doesn't support it; in this case, the target file
+        doesn't exist.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o source_name : (str) the source file's name
+                o target_name : (str) the target file's name
+
+        no RETURNED VALUE
+    """
+    if fcntl is None or CST__PLATFORM != 'Linux':
+        raise OSError(errno.ENOTSUP, "reflinks aren't supported on this platform", target_name)
+
+    with open(source_name, "rb") as source, open(target_name, "xb") as target:
+        try:
+            fcntl.ioctl(target.fileno(), CST__FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(target_name)
+            raise
+
+#///////////////////////////////////////////////////////////////////////////////
+def copy_file__throttled(source_name, target_name):
+    """
+        copy_file__throttled()
+        ________________________________________________________________________
+
+        Copy the content of a file (like shutil.copyfile()) by blocks of
+        CST__THROTTLEDCOPY_BLOCKSIZE bytes, respecting the I/O limits (see the
+        io_throttle() function).
+        ________________________________________________________________________
+
+        PARAMETERS
+                o source_name : (str) the source file's name
+                o target_name : (str) the target file's name
+
+        no RETURNED VALUE
+    """
+    with open(source_name, "rb") as source, open(target_name, "wb") as target:
+        block = source.read(CST__THROTTLEDCOPY_BLOCKSIZE)
+        while block:
+            io_throttle(read=len(block), written=len(block), operations=2)
+            target.write(block)
+            block = source.read(CST__THROTTLEDCOPY_BLOCKSIZE)
+
 #///////////////////////////////////////////////////////////////////////////////
-def create_empty_db(db_name):
+def create_empty_db(db_name, shards=None):
     """
         create_empty_db()
         ________________________________________________________________________
 
         Create an empty database named db_name .
+
+        If the database is made of several shards, the files are split between
+        the main database (db_name) and the other shards (see
+        get_database_shardname()) according to the first byte of their hashid;
+        the number of shards is stored in the table dbshards of the main
+        database. See db_connect() and the Catalogue class.
         ________________________________________________________________________
 
-        PARAMETER :
+        PARAMETERS :
             o db_name : name of the file to be created .
                          Please use a normpath'd parameter : the normpath function
                          will not be called by create_empty_db() !
+            o shards  : (None/int) number of shards; if None, [database]shards
+                        is used.
 
         no RETURNED VALUE
     """
+    if shards is None:
+        try:
+            shards = int(get_database_parameter("shards"))
+        except ValueError:
+            raise KatalError("Error in configuration file : [database]shards "
+                             "must be an integer")
+
+    if not 1 <= shards <= CST__DATABASE_SHARDS_MAX:
+        raise KatalError("Error in configuration file : [database]shards "
+                         "must be an integer between 1 and {0}".format(CST__DATABASE_SHARDS_MAX))
+
     msg("  ... creating an empty database named \"{0}\"...".format(db_name))
 
     if not ARGS.off:
 
-        db_connection = sqlite3.connect(db_name)
-        db_cursor = db_connection.cursor()
+        for index in range(shards):
+            if index == 0:
+                db_connection = db_connect(db_name)
+            else:
+                db_connection = db_connect(get_database_shardname(db_name, index))
+            db_cursor = db_connection.cursor()
+
+            db_cursor.execute(CST__SQL__CREATE_DB)
+            db_cursor.execute(CST__SQL__CREATE_SIZE_INDEX.format("main"))
+            db_cursor.execute("PRAGMA user_version={0}".format(
+                CST__DATABASE_USERVERSION_BINARYDIGESTS))
+            if index == 0 and shards > 1:
+                db_cursor.execute(CST__SQL__CREATE_DBSHARDS)
+                db_cursor.execute("INSERT INTO dbshards VALUES (?)", (shards,))
+            create_fts_index(db_connection)
+
+            db_connection.commit()
+            db_connection.close()
+
+    if shards > 1:
+        msg("   ... database created ({0} shards)".format(shards))
+    else:
+        msg("   ... database created")
+
+#///////////////////////////////////////////////////////////////////////////////
+def create_fts_index(db_connection, schema="main"):
+    """
+        create_fts_index()
+        ________________________________________________________________________
+
+        Create (if it doesn't exist) the full-text index over the names, the
+        source names and the tags' strings of the files stored in the database.
+        See CST__SQL__CREATE_FTS.
+
+        If the index is created in a database already filled with some files,
+        the index is built from the existing records.
+
+        The index is optional : if the sqlite library has been compiled without
+        the FTS5 module (or if --off has been used), nothing is done and False
+        is returned.
+        ________________________________________________________________________
 
-        db_cursor.execute(CST__SQL__CREATE_DB)
+        PARAMETERS :
+            o db_connection : a sqlite3.Connection object
+            o schema        : (str) the name of the database, e.g. "shard1" for
+                              a shard attached to db_connection (see db_connect())
+
+        RETURNED VALUE :
+            (bool) True if the index exists or has been created.
+    """
+    if db_connection.execute("SELECT name FROM {0}.sqlite_master "
+                             "WHERE type='table' AND name='dbfiles_fts'".format(schema)).fetchone():
+        return True
+
+    if ARGS.off:
+        return False
 
-        db_connection.commit()
-        db_connection.close()
+    for tokenizer in CST__SQL__FTS_TOKENIZERS:
+        try:
+            with db_connection:
+                for sqlorder in CST__SQL__CREATE_FTS:
+                    db_connection.execute(sqlorder.format(schema=schema, tokenizer=tokenizer))
+                db_connection.execute("INSERT INTO {0}.dbfiles_fts(dbfiles_fts) "
+                                      "VALUES ('rebuild')".format(schema))
+            return True
 
-    msg("   ... database created")
+        except sqlite3.OperationalError:
+            # this tokenizer (or FTS5 itself) isn't available, let's try the next one :
+            continue
+
+    return False
 
 #///////////////////////////////////////////////////////////////////////////////
 def create_subdirs_in_target_path():
@@ -1515,6 +4437,193 @@ def create_target_tags(parameters,
                                      date=date,
                                      database_index=database_index))
 
+#///////////////////////////////////////////////////////////////////////////////
+def db_connect(db_name, readonly=False):
+    """
+        db_connect()
+        ________________________________________________________________________
+
+        Open the database named db_name and return the connection, set up
+        according to the [database] section of the configuration file :
+
+            o journal mode : "WAL" by default, so that a write doesn't require
+                             to rewrite the journal of the whole transaction
+                             and so that readers don't block the writer.
+                             This setting is stored in the database and is
+                             therefore not modified if --off has been used.
+            o synchronous  : "NORMAL" by default; with WAL, the database stays
+                             consistent after a crash but the last transactions
+                             may be lost.
+            o cache size   : in KiB.
+
+        A new database is created with "PRAGMA auto_vacuum=INCREMENTAL".
+
+        If the database is sharded (see create_empty_db()), its shards are
+        attached to the connection as "shard1", "shard2", ... and a temporary
+        view named "dbfiles" gathers the files of all the shards : the queries
+        reading the table dbfiles don't have to know that the database is
+        sharded (sqlite pushes the WHERE clauses down to every shard, whose
+        indexes are used). The queries modifying the database have to choose
+        the right shard : see the Catalogue class.
+
+        Every function reading or writing a database should open it with this
+        function.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o db_name  : (str) the database's name
+                o readonly : (bool) True to open the database (and its shards)
+                             read-only; the journal mode isn't modified.
+
+        RETURNED VALUE
+                a sqlite3.Connection object
+    """
+    journal_mode = get_database_parameter("journal mode").upper()
+    if journal_mode not in CST__DATABASE_JOURNALMODES:
+        raise KatalError("Error in configuration file : [database]journal mode "
+                         "can't be \"{0}\"; accepted values are {1}".format(journal_mode,
+                                                                         CST__DATABASE_JOURNALMODES))
+
+    synchronous = get_database_parameter("synchronous").upper()
+    if synchronous not in CST__DATABASE_SYNCHRONOUSMODES:
+        raise KatalError("Error in configuration file : [database]synchronous "
+                         "can't be \"{0}\"; "
+                         "accepted values are {1}".format(synchronous,
+                                                          CST__DATABASE_SYNCHRONOUSMODES))
+
+    try:
+        cache_size = int(get_database_parameter("cache size"))
+    except ValueError:
+        raise KatalError("Error in configuration file : [database]cache size "
+                         "must be an integer (KiB)")
+
+    if readonly:
+        db_connection = sqlite3.connect(get_database_readonlyuri(db_name), uri=True)
+    else:
+        new_database = not os.path.exists(db_name)
+        db_connection = sqlite3.connect(db_name)
+        if new_database and not ARGS.off:
+            # a new database can give back its free pages without being rebuilt
+            # (see Catalogue.vacuum()); this setting has to be written before
+            # anything else, even before the journal mode :
+            db_connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    schemas = ["main"]
+
+    if db_connection.execute("SELECT name FROM sqlite_master "
+                             "WHERE type='table' AND name='dbshards'").fetchone():
+        shards = db_connection.execute("SELECT number FROM dbshards").fetchone()[0]
+        for index in range(1, shards):
+            shard_name = get_database_shardname(db_name, index)
+            if not os.path.exists(shard_name):
+                db_connection.close()
+                raise KatalError("The database \"{0}\" is made of {1} shards "
+                                 "but the shard \"{2}\" is missing.".format(db_name,
+                                                                           shards,
+                                                                           shard_name))
+            if readonly:
+                shard_name = get_database_readonlyuri(shard_name)
+            db_connection.execute("ATTACH DATABASE ? AS shard{0}".format(index), (shard_name,))
+            schemas.append("shard{0}".format(index))
+
+    for schema in schemas:
+        if not ARGS.off and not readonly:
+            db_connection.execute("PRAGMA {0}.journal_mode={1}".format(schema, journal_mode))
+        db_connection.execute("PRAGMA {0}.synchronous={1}".format(schema, synchronous))
+        # a negative value means "KiB", not "number of pages" :
+        db_connection.execute("PRAGMA {0}.cache_size=-{1}".format(schema, abs(cache_size)))
+    db_connection.execute("PRAGMA temp_store=MEMORY")
+
+    if len(schemas) > 1:
+        db_connection.execute(CST__SQL__CREATE_SHARDS_VIEW.format(
+            " UNION ALL ".join(CST__SQL__CREATE_SHARDS_VIEW_SELECT.format(schema)
+                               for schema in schemas)))
+
+    return db_connection
+
+#///////////////////////////////////////////////////////////////////////////////
+def db_executemany(db_connection, sqlorder, rows, batch_size=None, changes=None):
+    """
+        db_executemany()
+        ________________________________________________________________________
+
+        Execute the parameterized sqlorder for each row in rows, committing
+        the modifications every [database]transaction batch size rows; instead
+        of one transaction (and one disk synchronization) per row, there's one
+        transaction per batch.
+
+        rows may be a generator : the rows are read batch after batch, so that
+        the caller can do some work (e.g. moving a file) for each row and so
+        that the rows don't have to be stored in memory.
+
+        If reading the rows raises an exception (e.g. a file can't be moved),
+        the rows already read are written before the exception is raised again :
+        the database describes what has been done.
+
+        Nothing is written if --off has been used but the rows are read anyway.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o db_connection : a sqlite3.Connection object
+                o sqlorder      : (str) an SQL order with some '?', or a function
+                                  returning the SQL order to be executed for
+                                  a given row (e.g. to write each row in the
+                                  right shard, see the Catalogue class)
+                o rows          : an iterable of tuples
+                o batch_size    : None to use [database]transaction batch size,
+                                  0 to write all the rows in one transaction,
+                                  or an integer
+                o changes       : None or a list : the number of records really
+                                  modified by each batch (see sqlite3.Cursor.rowcount)
+                                  is appended to it, even if an exception is raised.
+
+        RETURNED VALUE
+                (int) the number of rows
+    """
+    if batch_size is None:
+        batch_size = max(1, int(get_database_parameter("transaction batch size")))
+
+    #...........................................................................
+    def write_batch(batch):
+        """
+                Write the rows of <batch> in one transaction.
+        """
+        if not batch or ARGS.off:
+            return
+
+        if callable(sqlorder):
+            # (str)sqlorder : [rows]
+            sqlorders = OrderedDict()
+            for batch_row in batch:
+                sqlorders.setdefault(sqlorder(batch_row), []).append(batch_row)
+        else:
+            sqlorders = {sqlorder : batch}
+
+        with db_connection:
+            for batch_sqlorder, batch_rows in sqlorders.items():
+                rowcount = db_connection.executemany(batch_sqlorder, batch_rows).rowcount
+                if changes is not None:
+                    changes.append(rowcount)
+
+    res = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            res += 1
+
+            if batch_size and len(batch) >= batch_size:
+                full_batch, batch = batch, []
+                write_batch(full_batch)
+
+    except BaseException:
+        # the rows already read (e.g. the files already moved) are written anyway :
+        write_batch(batch)
+        raise
+
+    write_batch(batch)
+
+    return res
+
 #///////////////////////////////////////////////////////////////////////////////
 def draw_table(rows, data):
     """
@@ -1641,8 +4750,18 @@ def fill_select(debug_datatime=None):
     prefix = ""
     fullname = ""
 
+    # the files compatible with the filters are compared with the database(s)
+    # CST__DEDUPE_BATCH_SIZE files at once, see fill_select__add() :
+    # (str)fullname, (str)dirpath, (str)filename, (int)size, (datetime)time, (str)prefix
+    files_to_be_compared = []
+
     file_index = 0  # number of the current file in the source directory.
+
+    # the progress line (see progress_begin()) replaces the lines written for
+    # each file, which are only written in the log file :
+    progress_begin("selection", total_files=INFOS_ABOUT_SRC_PATH[1])
     for dirpath, _, filenames in os.walk(normpath(source_path)):
+
         for filename in filenames:
 
             # ..................................................................
@@ -1664,8 +4783,6 @@ def fill_select(debug_datatime=None):
                 else:
                     time = datetime.strptime(debug_datatime[fullname], CST__DTIME_FORMAT)
 
-                fname_no_extens, extension = get_filename_and_extension(normpath(filename))
-
                 # if we know the total amount of files to be selected (see the --infos option),
                 # we can add the percentage done :
                 prefix = ""
@@ -1685,67 +4802,11 @@ def fill_select(debug_datatime=None):
                 else:
                     # 'filename' being compatible with the filters, let's try
                     # to add it in the datase :
-                    tobeadded, partialhashid, hashid = thefilehastobeadded__db(fullname, size)
-
-                    if tobeadded and hashid in SELECT:
-                        # . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
-                        # tobeadded is True but hashid is already in SELECT; let's discard
-                        # <filename> :
-                        number_of_discarded_files += 1
-
-                        if ARGS.verbosity == 'high':
-                            msg("    - {0} (similar hashid among the files to be copied, "
-                                "in the source directory) "
-                                " discarded \"{1}\"".format(prefix, fullname))
-
-                    elif tobeadded:
-                        # . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
-                        # ok, let's add <filename> to SELECT...
-                        SELECT[hashid] = \
-                         SELECTELEMENT(fullname=fullname,
-                                       partialhashid=partialhashid,
-                                       path=dirpath,
-                                       filename_no_extens=fname_no_extens,
-                                       extension=extension,
-                                       size=size,
-                                       date=time.strftime(CST__DTIME_FORMAT),
-                                       targetname= \
-                                          create_target_name(parameters=CFG_PARAMETERS,
-                                                             hashid=hashid,
-                                                             filename_no_extens=fname_no_extens,
-                                                             path=dirpath,
-                                                             extension=extension,
-                                                             _size=size,
-                                                             date=time.strftime(CST__DTIME_FORMAT),
-                                                             database_index=len(TARGET_DB) + \
-                                                                             len(SELECT)),
-                                       targettags= \
-                                          create_target_tags(parameters=CFG_PARAMETERS,
-                                                             hashid=hashid,
-                                                             filename_no_extens=fname_no_extens,
-                                                             path=dirpath,
-                                                             extension=extension,
-                                                             _size=size,
-                                                             date=time.strftime(CST__DTIME_FORMAT),
-                                                             database_index=len(TARGET_DB) + \
-                                                                             len(SELECT)))
-
-                        msg("    + {0} selected \"{1}\" (file selected #{2})".format(prefix,
-                                                                                     fullname,
-                                                                                     len(SELECT)))
-                        msg("       size={0}; date={1}".format(size,
-                                                               time.strftime(CST__DTIME_FORMAT)))
-
-                        SELECT_SIZE_IN_BYTES += size
-
-                    else:
-                        # . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
-                        # tobeadded is False : let's discard <filename> :
-                        number_of_discarded_files += 1
+                    files_to_be_compared.append((fullname, dirpath, filename, size, time, prefix))
 
-                        if ARGS.verbosity == 'high':
-                            msg("    - {0} (similar hashid in the database) "
-                                " discarded \"{1}\"".format(prefix, fullname))
+                    if len(files_to_be_compared) >= CST__DEDUPE_BATCH_SIZE:
+                        number_of_discarded_files += fill_select__add(files_to_be_compared)
+                        files_to_be_compared = []
 
             else:
                 msg("    ! browsing {0}, an error occured : "
@@ -1754,10 +4815,111 @@ def fill_select(debug_datatime=None):
                 msg("    \"{0}\"".format(fullname),
                     consolecolor='red')
 
+            progress_update(files=1, queues={"to be hashed" : len(files_to_be_compared)})
+
+    number_of_discarded_files += fill_select__add(files_to_be_compared)
+    progress_end()
+
     return fill_select__checks(number_of_discarded_files=number_of_discarded_files,
                                prefix=prefix,
                                fullname=fullname)
 
+#///////////////////////////////////////////////////////////////////////////////
+def fill_select__add(files):
+    """
+        fill_select__add()
+        ________________________________________________________________________
+
+        Compare some files compatible with the filters with the database(s)
+        (see thefileshavetobeadded__db()) and add to SELECT the files which
+        aren't already known. This function is used by fill_select() .
+        ________________________________________________________________________
+
+        PARAMETER
+                o files : a list of ((str)fullname, (str)dirpath, (str)filename,
+                          (int)size, (datetime)time, (str)prefix), in the order
+                          of the source directory.
+
+        RETURNED VALUE
+                (int) the number of discarded files
+    """
+    global SELECT_SIZE_IN_BYTES
+
+    number_of_discarded_files = 0
+
+    results = thefileshavetobeadded__db([(fullname, size)
+                                         for fullname, _, _, size, _, _ in files])
+
+    for (fullname, dirpath, filename, size, time, prefix), \
+        (tobeadded, partialhashid, hashid) in zip(files, results):
+
+        fname_no_extens, extension = get_filename_and_extension(normpath(filename))
+
+        if tobeadded and hashid in SELECT:
+            # . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+            # tobeadded is True but hashid is already in SELECT; let's discard
+            # <filename> :
+            number_of_discarded_files += 1
+
+            if ARGS.verbosity == 'high':
+                msg("    - {0} (similar hashid among the files to be copied, "
+                    "in the source directory) "
+                    " discarded \"{1}\"".format(prefix, fullname))
+
+        elif tobeadded:
+            # . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+            # ok, let's add <filename> to SELECT...
+            SELECT[hashid] = \
+             SELECTELEMENT(fullname=fullname,
+                           partialhashid=partialhashid,
+                           path=dirpath,
+                           filename_no_extens=fname_no_extens,
+                           extension=extension,
+                           size=size,
+                           date=time.strftime(CST__DTIME_FORMAT),
+                           targetname= \
+                              create_target_name(parameters=CFG_PARAMETERS,
+                                                 hashid=hashid,
+                                                 filename_no_extens=fname_no_extens,
+                                                 path=dirpath,
+                                                 extension=extension,
+                                                 _size=size,
+                                                 date=time.strftime(CST__DTIME_FORMAT),
+                                                 database_index=len(TARGET_DB) + \
+                                                                 len(SELECT)),
+                           targettags= \
+                              create_target_tags(parameters=CFG_PARAMETERS,
+                                                 hashid=hashid,
+                                                 filename_no_extens=fname_no_extens,
+                                                 path=dirpath,
+                                                 extension=extension,
+                                                 _size=size,
+                                                 date=time.strftime(CST__DTIME_FORMAT),
+                                                 database_index=len(TARGET_DB) + \
+                                                                 len(SELECT)))
+
+            # only in the log file if the progress line is displayed :
+            msg("    + {0} selected \"{1}\" (file selected #{2})".format(prefix,
+                                                                         fullname,
+                                                                         len(SELECT)),
+                for_console=PROGRESS is None)
+            msg("       size={0}; date={1}".format(size,
+                                                   time.strftime(CST__DTIME_FORMAT)),
+                for_console=PROGRESS is None)
+
+            SELECT_SIZE_IN_BYTES += size
+
+        else:
+            # . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+            # tobeadded is False : let's discard <filename> :
+            number_of_discarded_files += 1
+
+            if ARGS.verbosity == 'high':
+                msg("    - {0} (similar hashid in the database) "
+                    " discarded \"{1}\"".format(prefix, fullname))
+
+    return number_of_discarded_files
+
 #///////////////////////////////////////////////////////////////////////////////
 def fill_select__checks(number_of_discarded_files, prefix, fullname):
     """
@@ -1833,7 +4995,50 @@ def fill_select__checks(number_of_discarded_files, prefix, fullname):
                 del SELECT[_hash]
                 number_of_discarded_files += 1
 
-    return number_of_discarded_files
+    return number_of_discarded_files
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_copy_method():
+    """
+        get_copy_method()
+        ________________________________________________________________________
+
+          Return the way the files are copied by --rebase and by --findtag
+        --copyto (see get_rebase_mode() and get_copyto_mode()) : [target]mode
+        if it's 'reflink', 'hardlink' or 'fastest', 'copy' otherwise. See
+        copy_file().
+        ________________________________________________________________________
+
+        NO PARAMETER
+
+        RETURNED VALUE
+                (str) a value of CST__COPY_METHODS
+    """
+    mode = CFG_PARAMETERS["target"]["mode"]
+    if mode in CST__COPY_METHODS:
+        return mode
+
+    return "copy"
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_copyto_mode():
+    """
+        get_copyto_mode()
+        ________________________________________________________________________
+
+          Return the way the files are copied by --findtag --copyto : --copytomode
+        if it has been used, the value returned by get_copy_method() otherwise.
+        ________________________________________________________________________
+
+        NO PARAMETER
+
+        RETURNED VALUE
+                (str) a value of CST__COPYTO_MODES
+    """
+    if ARGS.copytomode is not None:
+        return ARGS.copytomode
+
+    return get_copy_method()
 
 #///////////////////////////////////////////////////////////////////////////////
 def get_database_fullname():
@@ -1852,6 +5057,69 @@ def get_database_fullname():
     """
     return os.path.join(normpath(ARGS.targetpath), CST__KATALSYS_SUBDIR, CST__DATABASE_NAME)
 
+#///////////////////////////////////////////////////////////////////////////////
+def get_database_parameter(option):
+    """
+        get_database_parameter()
+        ________________________________________________________________________
+
+          Return the value of an option stored in the [database] section of the
+        configuration file. Since this section is optional, the default value
+        stored in CST__DATABASE_DEFAULTPARAMETERS is returned if the option
+        can't be found (or if the configuration file hasn't been read yet).
+        ________________________________________________________________________
+
+        PARAMETER
+                o option : (str) a key of CST__DATABASE_DEFAULTPARAMETERS
+
+        RETURNED VALUE
+                the expected string
+    """
+    if CFG_PARAMETERS is None:
+        return CST__DATABASE_DEFAULTPARAMETERS[option]
+
+    return CFG_PARAMETERS.get("database", option,
+                              fallback=CST__DATABASE_DEFAULTPARAMETERS[option])
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_database_readonlyuri(db_name):
+    """
+        get_database_readonlyuri()
+        ________________________________________________________________________
+
+          Return the URI used by sqlite to open read-only the database named
+        db_name; see db_connect().
+        ________________________________________________________________________
+
+        PARAMETER
+                o db_name : (str) the database's name
+
+        RETURNED VALUE
+                the expected string
+    """
+    return "file:{0}?mode=ro".format(urllib.request.pathname2url(db_name))
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_database_shardname(db_name, index):
+    """
+        get_database_shardname()
+        ________________________________________________________________________
+
+          Return the name of the shard #index of the database named db_name,
+        e.g. "katal.1.db" for the shard #1 of "katal.db". The shard #0 is the
+        main database, namely db_name itself.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o db_name : (str) the name of the main database
+                o index   : (int) the index of the shard, > 0
+
+        RETURNED VALUE
+                the expected string
+    """
+    name, extension = os.path.splitext(db_name)
+    return "{0}.{1}{2}".format(name, index, extension)
+
 #///////////////////////////////////////////////////////////////////////////////
 def get_disk_free_space(path):
     """
@@ -1902,6 +5170,155 @@ def get_filename_and_extension(path):
 
     return fname_no_extens, extension
 
+#///////////////////////////////////////////////////////////////////////////////
+def get_importexport_format(filename):
+    """
+        get_importexport_format()
+        ________________________________________________________________________
+
+        Return the format ("csv"/"jsonl") of the file used by --exportdb or by
+        --importdb, according to its extension (see CST__IMPORTEXPORT_FORMATS).
+        ________________________________________________________________________
+
+        PARAMETER
+            o filename : (str) the name of the file
+
+        RETURNED VALUE
+            (str) the format or None if the extension isn't known.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in CST__IMPORTEXPORT_FORMATS:
+        msg("    ! unknown extension \"{0}\" : please use one of {1} .".format(
+            extension, ", ".join(sorted(CST__IMPORTEXPORT_FORMATS))),
+            consolecolor="red")
+        return None
+
+    return CST__IMPORTEXPORT_FORMATS[extension]
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_io_durability():
+    """
+        get_io_durability()
+        ________________________________________________________________________
+
+          Return [io]durability, i.e. when the files written by Katal are
+        written on disk (fsync), which is a tradeoff between speed and safety
+        if the computer stops unexpectedly :
+
+        o 'none'  : never, the operating system writes them when it wants;
+        o 'batch' : by batches of files, see action__add__transfer() and
+                    sync_filesystem(); the journals are written on disk
+                    after each batch;
+        o 'file'  : after each file, see transfer_file(); the journals are
+                    written on disk after each file.
+        ________________________________________________________________________
+
+        NO PARAMETER
+
+        RETURNED VALUE
+                (str) a value of CST__IO_DURABILITIES
+    """
+    durability = get_io_parameter("durability")
+    if durability not in CST__IO_DURABILITIES:
+        raise KatalError("[io]durability : \"{0}\" isn't a valid value; accepted "
+                         "values : {1}".format(durability, ", ".join(CST__IO_DURABILITIES)))
+
+    return durability
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_io_integer(option, minimum=1):
+    """
+        get_io_integer()
+        ________________________________________________________________________
+
+          Return the value of an option stored in the [io] section of the
+        configuration file as an integer greater or equal to <minimum>, e.g.
+        the number of threads reading/writing files at the same time
+        ([io]workers).
+        ________________________________________________________________________
+
+        PARAMETERS
+                o option  : (str) a key of CST__IO_DEFAULTPARAMETERS
+                o minimum : (int) 1, or 0 for the limits (see CST__IO_LIMITS)
+
+        RETURNED VALUE
+                (int) the expected number, greater or equal to <minimum>.
+    """
+    value = get_io_parameter(option)
+    if not value.isdigit() or int(value) < minimum:
+        raise KatalError("[io]{0} : \"{1}\" isn't an integer greater or equal "
+                         "to {2}.".format(option, value, minimum))
+
+    return int(value)
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_io_parameter(option):
+    """
+        get_io_parameter()
+        ________________________________________________________________________
+
+          Return the value of an option stored in the [io] section of the
+        configuration file. Since this section is optional, the default value
+        stored in CST__IO_DEFAULTPARAMETERS is returned if the option can't be
+        found (or if the configuration file hasn't been read yet).
+        ________________________________________________________________________
+
+        PARAMETER
+                o option : (str) a key of CST__IO_DEFAULTPARAMETERS
+
+        RETURNED VALUE
+                the expected string
+    """
+    if CFG_PARAMETERS is None:
+        return CST__IO_DEFAULTPARAMETERS[option]
+
+    return CFG_PARAMETERS.get("io", option,
+                              fallback=CST__IO_DEFAULTPARAMETERS[option])
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_journal_fullname(name):
+    """
+        get_journal_fullname()
+        ________________________________________________________________________
+
+          Return the full name of a journal (see the Journal class) stored in
+        the CST__TASKS_SUBSUBDIR directory of ARGS.targetpath .
+        ________________________________________________________________________
+
+        PARAMETER
+                o name : (str) the journal's name, e.g. CST__ADD_JOURNALNAME
+
+        RETURNED VALUE
+                the expected string
+    """
+    return os.path.join(normpath(ARGS.targetpath),
+                        CST__KATALSYS_SUBDIR, CST__TASKS_SUBSUBDIR, name)
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_logfile_compression():
+    """
+        get_logfile_compression()
+        ________________________________________________________________________
+
+          Return [log file]compression, i.e. how the backuped log files are
+        compressed (see backup_logfile__compress()) : 'none', 'gzip' or 'lzma'.
+        ________________________________________________________________________
+
+        NO PARAMETER
+
+        RETURNED VALUE
+                (str) a key of CST__LOGFILE_COMPRESSIONS
+    """
+    compression = get_logfile_parameter("compression")
+    if compression not in CST__LOGFILE_COMPRESSIONS:
+        raise KatalError("[log file]compression : \"{0}\" isn't a valid value; accepted "
+                         "values : {1}".format(compression, ", ".join(CST__LOGFILE_COMPRESSIONS)))
+    if compression == "lzma" and lzma is None:
+        raise KatalError("[log file]compression : \"lzma\" can't be used, the lzma module "
+                         "being unavailable.")
+
+    return compression
+
 #///////////////////////////////////////////////////////////////////////////////
 def get_logfile_fullname():
     """
@@ -1919,6 +5336,74 @@ def get_logfile_fullname():
                         CST__LOG_SUBSUBDIR,
                         CFG_PARAMETERS["log file"]["name"])
 
+#///////////////////////////////////////////////////////////////////////////////
+def get_logfile_parameter(option):
+    """
+        get_logfile_parameter()
+        ________________________________________________________________________
+
+          Return the value of an optional option of the [log file] section of
+        the configuration file : the default value stored in
+        CST__LOGFILE_DEFAULTPARAMETERS is returned if the option can't be
+        found.
+        ________________________________________________________________________
+
+        PARAMETER
+                o option : (str) a key of CST__LOGFILE_DEFAULTPARAMETERS
+
+        RETURNED VALUE
+                the expected string
+    """
+    return CFG_PARAMETERS.get("log file", option,
+                              fallback=CST__LOGFILE_DEFAULTPARAMETERS[option])
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_logfile_retention():
+    """
+        get_logfile_retention()
+        ________________________________________________________________________
+
+          Return [log file]maximal number of backups and [log file]maximal size
+        of the backups, see backup_logfile__clean().
+        ________________________________________________________________________
+
+        NO PARAMETER
+
+        RETURNED VALUE
+                ((int)maximal number of backuped log files,
+                 (int)maximal size in bytes of the backuped log files), 0 meaning
+                 "no limit".
+    """
+    res = []
+    for option in ("maximal number of backups", "maximal size of the backups"):
+        value = get_logfile_parameter(option)
+        if not value.isdigit():
+            raise KatalError("[log file]{0} : \"{1}\" isn't a positive "
+                             "integer.".format(option, value))
+        res.append(int(value))
+
+    return tuple(res)
+
+#///////////////////////////////////////////////////////////////////////////////
+def get_rebase_mode():
+    """
+        get_rebase_mode()
+        ________________________________________________________________________
+
+          Return the way the files are copied by --rebase : --rebasemode if
+        it has been used, the value returned by get_copy_method() otherwise.
+        ________________________________________________________________________
+
+        NO PARAMETER
+
+        RETURNED VALUE
+                (str) "move" or a value of CST__COPY_METHODS
+    """
+    if ARGS.rebasemode is not None:
+        return ARGS.rebasemode
+
+    return get_copy_method()
+
 #///////////////////////////////////////////////////////////////////////////////
 def goodbye(timestamp_start):
     """
@@ -1938,14 +5423,14 @@ def goodbye(timestamp_start):
                                                 datetime.now() - timestamp_start))
 
 #///////////////////////////////////////////////////////////////////////////////
-def hashfile64(filename, stop_after=None):
+def hashfile(filename, stop_after=None):
     """
-        hashfile64()
+        hashfile()
         ________________________________________________________________________
 
-        return the footprint of a file, encoded with the base 64. If stop_after
-        is set to an integer, only the beginning of the file will be used to
-        compute the hash (see CST__PARTIALHASHID_BYTESNBR constant).
+        return the footprint of a file, as a raw digest. If stop_after is set
+        to an integer, only the beginning of the file will be used to compute
+        the hash (see CST__PARTIALHASHID_BYTESNBR constant).
         ________________________________________________________________________
 
         PARAMETER
@@ -1954,11 +5439,9 @@ def hashfile64(filename, stop_after=None):
                               otherwise, only the first stop_after bytes will
                               be read.
         RETURNED VALUE
-                the expected string. If you use sha256 as a hasher, the
-                resulting string will be 44 bytes long. E.g. :
-                        "YLkkC5KqwYvb3F54kU7eEeX1i1Tj8TY1JNvqXy1A91A"
+                the expected bytes object, CST__DIGEST_SIZE bytes long.
     """
-    # hasher used by the hashfile64() function.
+    # hasher used by the hashfile() function.
     hasher = hashlib.sha256()
 
     nbr_of_bytes_read = 0
@@ -1966,6 +5449,7 @@ def hashfile64(filename, stop_after=None):
         # a buffer of 65536 bytes is an optimized buffer.
         buf = afile.read(65536)
         while len(buf) > 0:
+            io_throttle(read=len(buf))
             nbr_of_bytes_read += 65536
             if stop_after is not None and nbr_of_bytes_read >= stop_after:
                 break
@@ -1973,7 +5457,91 @@ def hashfile64(filename, stop_after=None):
             hasher.update(buf)
             buf = afile.read(65536)
 
-    return b64encode(hasher.digest()).decode()
+    return hasher.digest()
+
+#///////////////////////////////////////////////////////////////////////////////
+def hashfile__partialandfull(filename):
+    """
+        hashfile__partialandfull()
+        ________________________________________________________________________
+
+        return the partial footprint (see CST__PARTIALHASHID_BYTESNBR) and the
+        footprint of a file, as raw digests : the file is read only once.
+        The results are equal to hashfile(filename, CST__PARTIALHASHID_BYTESNBR)
+        and hashfile(filename).
+        ________________________________________________________________________
+
+        PARAMETER
+                o filename : (str) file's name
+
+        RETURNED VALUE
+                ((bytes)partial hashid, (bytes)hashid)
+    """
+    partialhasher = hashlib.sha256()
+    hasher = hashlib.sha256()
+
+    nbr_of_bytes_read = 0
+    with open(filename, "rb") as afile:
+        # a buffer of 65536 bytes is an optimized buffer.
+        buf = afile.read(65536)
+        while len(buf) > 0:
+            io_throttle(read=len(buf))
+            progress_update(hashed=len(buf))
+            nbr_of_bytes_read += 65536
+            # same test as in hashfile() :
+            if nbr_of_bytes_read < CST__PARTIALHASHID_BYTESNBR:
+                partialhasher.update(buf)
+
+            hasher.update(buf)
+            buf = afile.read(65536)
+
+    return partialhasher.digest(), hasher.digest()
+
+#///////////////////////////////////////////////////////////////////////////////
+def hashfile64(filename, stop_after=None):
+    """
+        hashfile64()
+        ________________________________________________________________________
+
+        return the footprint of a file, encoded with the base 64 : see the
+        hashfile() function.
+        ________________________________________________________________________
+
+        PARAMETER
+                o filename : (str) file's name
+                o stop_after:(None/int) if None, the file will be entirely read,
+                              otherwise, only the first stop_after bytes will
+                              be read.
+        RETURNED VALUE
+                the expected string. If you use sha256 as a hasher, the
+                resulting string will be 44 bytes long. E.g. :
+                        "YLkkC5KqwYvb3F54kU7eEeX1i1Tj8TY1JNvqXy1A91A"
+    """
+    return b64encode(hashfile(filename=filename, stop_after=stop_after)).decode()
+
+#///////////////////////////////////////////////////////////////////////////////
+def io_throttle(read=0, written=0, operations=1):
+    """
+        io_throttle()
+        ________________________________________________________________________
+
+        Wait (if required) before reading <read> bytes, writing <written> bytes
+        and doing <operations> I/O operations, so that the limits of the [io]
+        section are respected (see the IOThrottle class). This function may be
+        called by many threads at the same time.
+
+        Nothing is done until IO_THROTTLE has been initialized by main_warmup().
+        ________________________________________________________________________
+
+        PARAMETERS
+                o read       : (int) number of bytes read
+                o written    : (int) number of bytes written
+                o operations : (int) number of I/O operations
+
+        no RETURNED VALUE
+    """
+    if IO_THROTTLE is not None:
+        IO_THROTTLE.wait(read, written, operations)
 
 #///////////////////////////////////////////////////////////////////////////////
 def is_ntfs_prefix_mandatory(path):
@@ -2053,7 +5621,7 @@ def main():
         o  sys.exit(-2) is called if a KatalError exception is raised
         o  sys.exit(-3) is called if another exception is raised
     """
-    global ARGS
+    global ARGS, MSG_WRITER
 
     timestamp_start = datetime.now()
 
@@ -2061,17 +5629,33 @@ def main():
         ARGS = read_command_line_arguments()
         check_args()
 
+        # the messages are written by a background thread, see msg() :
+        MSG_WRITER = MessageWriter()
+        atexit.register(MSG_WRITER.close)
+
+        # one Catalogue object (and one connection) for the whole run :
+        catalogue = Catalogue(get_database_fullname())
+
         welcome(timestamp_start)
-        main_warmup(timestamp_start)
-        main_actions_tags()
-        main_actions()
+        main_warmup(timestamp_start, catalogue)
+        main_actions_tags(catalogue)
+        main_actions(catalogue)
+        catalogue.close()
+        for target_db in OTHER_TARGET_DBS:
+            target_db.catalogue.close()
 
         goodbye(timestamp_start)
 
+        MSG_WRITER.close()
         if USE_LOGFILE:
             LOGFILE.close()
+        if LOGFILE_BACKUPS is not None:
+            LOGFILE_BACKUPS.shutdown()
 
     except KatalError as exception:
+        progress_end()
+        if MSG_WRITER is not None:
+            MSG_WRITER.close()
         print("({0}) ! a critical error occured.\nError message : {1}".format(__projectname__,
                                                                               exception))
         sys.exit(-2)
@@ -2081,7 +5665,7 @@ def main():
     sys.exit(0)
 
 #///////////////////////////////////////////////////////////////////////////////
-def main_actions():
+def main_actions(catalogue):
     """
         main_actions()
         ________________________________________________________________________
@@ -2089,27 +5673,41 @@ def main_actions():
         Call the different actions required by the arguments of the command line.
         ________________________________________________________________________
 
-        no PARAMETER, no RETURNED VALUE
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
     """
+    # an interrupted --rebaseinplace is completed before anything else :
+    action__rebaseinplace__resume(catalogue)
+
     if ARGS.cleandbrm:
-        action__cleandbrm()
+        action__cleandbrm(catalogue)
 
     if ARGS.reset:
-        action__reset()
+        action__reset(catalogue)
 
     if ARGS.targetkill:
-        action__target_kill(ARGS.targetkill)
+        action__target_kill(catalogue, ARGS.targetkill)
 
     if ARGS.whatabout:
-        read_target_db()
-        action__whatabout(ARGS.whatabout)
-
-    if ARGS.select:
-        read_target_db()
+        catalogue.create()
+        action__whatabout(catalogue, ARGS.whatabout)
+
+    # an interrupted --add is resumed instead of selecting new files; --select
+    # asks whether it has to be resumed :
+    resumed = (ARGS.add or ARGS.select) and action__add__resume(catalogue,
+                                                                ask=not ARGS.add)
+    if resumed:
+        show_infos_about_target_path(catalogue)
+
+    if ARGS.select and not resumed:
+        read_target_db(catalogue)
         read_filters()
         action__select()
 
         if ARGS.verbosity != 'none' and len(SELECT) > 0:
+            msg__flush()
             answer = \
                 input("\nDo you want to update the target database and to {0} the selected "
                       "files into the target directory "
@@ -2117,31 +5715,46 @@ def main_actions():
                                                   ARGS.targetpath))
 
             if answer in ("y", "yes"):
-                action__add()
-                show_infos_about_target_path()
+                action__add(catalogue)
+                show_infos_about_target_path(catalogue)
 
-    if ARGS.add:
-        read_target_db()
+    if ARGS.add and not resumed:
+        read_target_db(catalogue)
         read_filters()
         action__select()
-        action__add()
-        show_infos_about_target_path()
+        action__add(catalogue)
+        show_infos_about_target_path(catalogue)
 
     if ARGS.new:
         action__new(ARGS.new)
 
     if ARGS.rebase:
-        action__rebase(ARGS.rebase)
+        action__rebase(catalogue, ARGS.rebase)
+
+    if ARGS.rebaseinplace:
+        action__rebaseinplace(catalogue)
 
     if ARGS.findtag:
-        action__findtag(ARGS.findtag)
+        action__findtag(catalogue, ARGS.findtag)
+
+    if ARGS.search:
+        action__search(catalogue, ARGS.search)
+
+    if ARGS.exportdb:
+        action__exportdb(catalogue, ARGS.exportdb)
+
+    if ARGS.importdb:
+        action__importdb(catalogue, ARGS.importdb)
+
+    if ARGS.maintenance:
+        action__maintenance(catalogue, ARGS.timebudget)
 
     if ARGS.downloaddefaultcfg is not None:
         action__downloadefaultcfg(targetname=CST__DEFAULT_CONFIGFILE_NAME,
                                   location=ARGS.downloaddefaultcfg)
 
 #///////////////////////////////////////////////////////////////////////////////
-def main_actions_tags():
+def main_actions_tags(catalogue):
     """
         main_actions_tags()
         ________________________________________________________________________
@@ -2150,22 +5763,25 @@ def main_actions_tags():
         Function dedicated to the operations on tags.
         ________________________________________________________________________
 
-        no PARAMETER, no RETURNED VALUE
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
     """
     if ARGS.rmnotags:
-        action__rmnotags()
+        action__rmnotags(catalogue)
 
     if ARGS.settagsstr:
-        action__settagsstr(ARGS.settagsstr, ARGS.to)
+        action__settagsstr(catalogue, ARGS.settagsstr, ARGS.to)
 
     if ARGS.addtag:
-        action__addtag(ARGS.addtag, ARGS.to)
+        action__addtag(catalogue, ARGS.addtag, ARGS.to)
 
     if ARGS.rmtags:
-        action__rmtags(ARGS.to)
+        action__rmtags(catalogue, ARGS.to)
 
 #///////////////////////////////////////////////////////////////////////////////
-def main_warmup(timestamp_start):
+def main_warmup(timestamp_start, catalogue):
     """
         main_warmup()
         ________________________________________________________________________
@@ -2179,20 +5795,23 @@ def main_warmup(timestamp_start):
             o list of the expected directories : if one directory is missing, let's create it.
               create_subdirs_in_target_path()
             o welcome_in_logfile()
+            o I/O limits (IO_THROTTLE), priority (set_io_priority()) and
+              durability (get_io_durability())
             o warning if source path == target path
             o --infos
             o -si / --sourceinfos
             o -ti / --targetinfos
         ________________________________________________________________________
 
-        PARAMETER :
+        PARAMETERS :
                 o timestamp_start : a datetime.datetime object
+                o catalogue       : the Catalogue object of the target directory
 
         no RETURNED VALUE
 
         o  sys.exit(-1) is called if the expected config file is ill-formed or missing.
     """
-    global CFG_PARAMETERS, LOGFILE
+    global CFG_PARAMETERS, IO_THROTTLE, LOGFILE
 
     #...........................................................................
     # a special case : if the options --new//--downloaddefaultcfg have been used, let's quit :
@@ -2240,9 +5859,24 @@ def main_warmup(timestamp_start):
 
     #...........................................................................
     if USE_LOGFILE:
+        # the backuped log files are compressed and removed by another thread,
+        # see backup_logfile__clean() : let's check these options first.
+        get_logfile_compression()
+        get_logfile_retention()
+
         LOGFILE = logfile_opening()
         welcome_in_logfile(timestamp_start)
 
+    #...........................................................................
+    # I/O limits and priority :
+    IO_THROTTLE = IOThrottle(os.path.join(normpath(ARGS.targetpath),
+                                          CST__KATALSYS_SUBDIR, CST__IOCONTROL_NAME))
+    set_io_priority(get_io_parameter("priority"))
+
+    durability = get_io_durability()
+    if durability != "none":
+        msg("  = durability : {0}".format(durability))
+
     #...........................................................................
     if ARGS.targetpath == source_path:
         msg("  ! warning : "
@@ -2266,7 +5900,7 @@ def main_warmup(timestamp_start):
 
     #...........................................................................
     if ARGS.infos:
-        action__infos()
+        action__infos(catalogue)
 
     #...........................................................................
     if ARGS.sourceinfos:
@@ -2274,10 +5908,10 @@ def main_warmup(timestamp_start):
 
     #...........................................................................
     if ARGS.targetinfos:
-        show_infos_about_target_path()
+        show_infos_about_target_path(catalogue)
 
 #///////////////////////////////////////////////////////////////////////////////
-def modify_the_tag_of_some_files(tag, dest, mode):
+def modify_the_tag_of_some_files(catalogue, tag, dest, mode):
     """
         modify_the_tag_of_some_files()
         ________________________________________________________________________
@@ -2286,51 +5920,65 @@ def modify_the_tag_of_some_files(tag, dest, mode):
         ________________________________________________________________________
 
         PARAMETERS
+                o catalogue    : the Catalogue object of the target directory
                 o tag          : (str) new tag(s)
                 o dest         : (str) a string (wildcards accepted) describing
                                   what files are concerned
                 o mode         : (str) "append" to add "tag" to the other tags
                                        "set" to replace old tag(s) by a new one
     """
-    if not os.path.exists(normpath(get_database_fullname())):
+    if not catalogue.exists():
         msg("    ! no database found.",
             consolecolor="red")
     else:
-        db_connection = sqlite3.connect(get_database_fullname())
-        db_connection.row_factory = sqlite3.Row
-        db_cursor = db_connection.cursor()
+        if mode == "append":
+            tag = CST__TAG_SEPARATOR + tag
+        elif mode != "set":
+            raise KatalError("mode argument \"{0}\" isn't known".format(mode))
 
         files_to_be_modified = []       # a list of (hashids, name)
-        for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-            if fnmatch.fnmatch(db_record["name"], dest):
-                files_to_be_modified.append((db_record["hashid"], db_record["name"]))
+        for hashid, name in catalogue.files():
+            if fnmatch.fnmatch(name, dest):
+                files_to_be_modified.append((hashid, name))
 
         if len(files_to_be_modified) == 0:
             msg("    * no files match the given name(s) given as a parameter.")
         else:
             # let's apply the tag(s) to the <files_to_be_modified> :
-            for hashid, filename in files_to_be_modified:
-
+            for _, filename in files_to_be_modified:
                 msg("    o applying the tag string \"{0}\" to {1}.".format(tag, filename))
 
-                if ARGS.off:
-                    pass
+            catalogue.modify_tags(((tag, hashid) for hashid, _ in files_to_be_modified),
+                                  mode)
 
-                elif mode == "set":
-                    sqlorder = 'UPDATE dbfiles SET tagsstr=? WHERE hashid=?'
-                    db_connection.execute(sqlorder, (tag, hashid))
+#///////////////////////////////////////////////////////////////////////////////
+def move_to_the_trash(files):
+    """
+        move_to_the_trash()
+        ________________________________________________________________________
 
-                elif mode == "append":
-                    sqlorder = ('UPDATE dbfiles SET tagsstr = tagsstr || \"{0}{1}\" '
-                                'WHERE hashid=\"{2}\"').format(CST__TAG_SEPARATOR, tag, hashid)
-                    db_connection.executescript(sqlorder)
+        Move some target files to the trash directory and yield their hashid
+        once moved : this generator is to be given to db_executemany() in order
+        to remove the files from the database batch after batch.
 
-                else:
-                    raise KatalError("mode argument \"{0}\" isn't known".format(mode))
+        Nothing is moved if --off has been used.
+        ________________________________________________________________________
 
-            db_connection.commit()
+        PARAMETER
+                o files : an iterable of (hashid, name)
 
-        db_connection.close()
+        YIELDED VALUES
+                (hashid,)
+    """
+    for hashid, name in files:
+        msg("   o removing {0} from the database and from the target path".format(name))
+        if not ARGS.off:
+            dest = os.path.join(normpath(ARGS.targetpath),
+                                CST__KATALSYS_SUBDIR, CST__TRASH_SUBSUBDIR, name)
+            # the name of a target file may contain a directory :
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.move(os.path.join(normpath(ARGS.targetpath), name), dest)
+        yield (hashid,)
 
 #///////////////////////////////////////////////////////////////////////////////
 def msg(_msg, for_console=True, for_logfile=True, consolecolor=None):
@@ -2341,6 +5989,11 @@ def msg(_msg, for_console=True, for_logfile=True, consolecolor=None):
         Display a message on console, write the same message in the log file.
         The message isn't displayed on console if ARGS.verbosity has been set to
         'none' (see the --verbosity argument) .
+
+        Once main() has initialized MSG_WRITER, the message is written by a
+        background thread (see the MessageWriter class) : msg() doesn't wait,
+        except for the error messages (consolecolor="red") which are written
+        at once with the previous messages (see msg__flush()).
         ________________________________________________________________________
 
         PARAMETERS
@@ -2353,32 +6006,85 @@ def msg(_msg, for_console=True, for_logfile=True, consolecolor=None):
 
         no RETURNED VALUE
     """
-    global LOGFILE, LOGFILE_SIZE
-
     final_msg = _msg + "\n"
 
-    # first to the console : otherwise, if an error occurs by writing to the log
-    # file, it would'nt possible to read the message.
+    console_text = None
     if ARGS.verbosity != 'none' and for_console:
         if consolecolor is None or CST__PLATFORM == 'Windows':
-            sys.stdout.write(_msg+"\n")
+            console_text = final_msg
         else:
-            sys.stdout.write(CST__LINUXCONSOLECOLORS[consolecolor])
-            sys.stdout.write(_msg+"\n")
-            sys.stdout.write(CST__LINUXCONSOLECOLORS["default"])
+            console_text = CST__LINUXCONSOLECOLORS[consolecolor] + final_msg + \
+                           CST__LINUXCONSOLECOLORS["default"]
 
-    # secondly, to the logfile :
+    logfile_text = None
     if USE_LOGFILE and for_logfile and LOGFILE is not None:
+        logfile_text = final_msg
+
+    # the progress line has to be erased, see the Progress class :
+    if console_text is not None and PROGRESS is not None:
+        console_text = PROGRESS.clear() + console_text
+
+    if MSG_WRITER is None:
+        msg__write(console_text, () if logfile_text is None else (logfile_text,))
+    else:
+        MSG_WRITER.write(console_text, logfile_text)
+        if consolecolor == "red":
+            msg__flush()
+
+#///////////////////////////////////////////////////////////////////////////////
+def msg__flush():
+    """
+        msg__flush()
+        ________________________________________________________________________
+
+        Wait until the messages given to msg() have been written on console and
+        in the log file (see MSG_WRITER) : e.g. before asking a question to the
+        user.
+        ________________________________________________________________________
+
+        no PARAMETER, no RETURNED VALUE
+    """
+    if MSG_WRITER is not None:
+        MSG_WRITER.flush()
+
+#///////////////////////////////////////////////////////////////////////////////
+def msg__write(console_text, logfile_texts):
+    """
+        msg__write()
+        ________________________________________________________________________
+
+        Write some messages on console and in the log file : called by msg(),
+        or by the thread of MSG_WRITER (see the MessageWriter class). The log
+        file is renamed and a new one is opened once it's bigger than
+        [log file]maximal size : see backup_logfile().
+        ________________________________________________________________________
+
+        PARAMETERS
+                o console_text  : (str) the text to be written on console, or
+                                  None
+                o logfile_texts : a list of (str)messages to be written in the
+                                  log file
+
+        no RETURNED VALUE
+    """
+    global LOGFILE, LOGFILE_SIZE
+
+    # first to the console : otherwise, if an error occurs by writing to the log
+    # file, it would'nt possible to read the message.
+    if console_text:
+        sys.stdout.write(console_text)
+
+    # secondly, to the logfile :
+    for final_msg in logfile_texts:
         if LOGFILE_SIZE + len(final_msg) > int(CFG_PARAMETERS["log file"]["maximal size"]):
-            # let's force writing on disk...
+            # let's force writing on disk (see [io]durability)...
             LOGFILE.flush()
-            os.fsync(LOGFILE)
+            if get_io_durability() != "none":
+                os.fsync(LOGFILE)
             # ... before closing :
             LOGFILE.close()
-            # let's backup the current log file :
+            # let's rename the current log file :
             backup_logfile(get_logfile_fullname())
-            # let's remove the current log file's content :
-            os.remove(get_logfile_fullname())
             # let's open a new log file :
             LOGFILE = logfile_opening()
 
@@ -2472,6 +6178,14 @@ def read_command_line_arguments():
                         help="# To be used with the --findtag parameter. Copy the found files "
                              "into an export directory.")
 
+    parser.add_argument('--copytomode',
+                        choices=CST__COPYTO_MODES,
+                        help="# To be used with the --copyto parameter. How the files are "
+                             "copied into the export directory : 'hardlink' and 'reflink' "
+                             "don't write any data if both directories are stored on the "
+                             "same filesystem, 'symlink' never does. Default : [target]mode if it's "
+                             "'reflink', 'hardlink' or 'fastest', 'copy' otherwise.")
+
     parser.add_argument('-dlcfg', '--downloaddefaultcfg',
                         choices=("local", "home",),
                         help="# Download the default config file and overwrite the file having "
@@ -2479,11 +6193,21 @@ def read_command_line_arguments():
                              "in the config file. Use 'local' to download in the current "
                              "directory, 'home' to download in the user's HOME directory.")
 
+    parser.add_argument('--exportdb',
+                        type=str,
+                        help="# Write the records of the database into a JSONL (.jsonl) "
+                             "or CSV (.csv) file, e.g. --exportdb=catalogue.jsonl")
+
     parser.add_argument('--findtag',
                         type=str,
                         help="# Find the files in the target directory with the given tag. "
                              "The tag is a simple string, not a regex.")
 
+    parser.add_argument('--importdb',
+                        type=str,
+                        help="# Add to the database the records stored in a JSONL (.jsonl) "
+                             "or CSV (.csv) file written by --exportdb. No file is copied.")
+
     parser.add_argument('--infos',
                         action="store_true",
                         help="# Display informations about the source directory "
@@ -2491,6 +6215,12 @@ def read_command_line_arguments():
                              "options to display more informations about the process : in "
                              "this case, the --infos will be executed before --select/--add")
 
+    parser.add_argument('--maintenance',
+                        action="store_true",
+                        help="# Check the integrity of the database, update its statistics "
+                             "and give back its free pages to the file system; see "
+                             "--timebudget.")
+
     parser.add_argument('-n', '--new',
                         type=str,
                         help="# Create a new target directory")
@@ -2502,6 +6232,14 @@ def read_command_line_arguments():
                              "Use this option to simulate an operation : you get the messages "
                              "but no file is modified on disk, no directory is created.")
 
+    parser.add_argument('--progress',
+                        choices=("auto", "on", "off"),
+                        default="auto",
+                        help="# Display a progress line (files/s, MB/s, ETA...) during "
+                             "--select and --add instead of one line per file, these lines "
+                             "being only written in the log file. 'auto'=only if the "
+                             "console is a terminal and if --verbosity is 'normal'.")
+
     parser.add_argument('--rebase',
                         type=str,
                         help="# Copy the current target directory into a new one : you "
@@ -2511,6 +6249,23 @@ def read_command_line_arguments():
                              "(modify [target]name of the target files), "
                              "then use --rebase with the name of the new target directory")
 
+    parser.add_argument('--rebaseinplace',
+                        action="store_true",
+                        help="# Rename the files of the target directory according to "
+                             "[target]name of the target files (modify it first) : the "
+                             "files are renamed, not copied, and the database is updated. "
+                             "An interrupted --rebaseinplace is completed the next time "
+                             "Katal is launched.")
+
+    parser.add_argument('--rebasemode',
+                        choices=CST__COPY_METHODS + ("move",),
+                        help="# To be used with the --rebase parameter. How the files are "
+                             "copied into the new target directory : 'hardlink', 'reflink' "
+                             "and 'move' (the files being removed from the current target "
+                             "directory and from its database) don't write any data if both "
+                             "directories are stored on the same filesystem. Default : [target]mode if it's "
+                             "'reflink', 'hardlink' or 'fastest', 'copy' otherwise.")
+
     parser.add_argument('--reset',
                         action="store_true",
                         help="# Delete the database and the files in the target directory")
@@ -2524,6 +6279,13 @@ def read_command_line_arguments():
                         help="# Remove all the tags of some file(s) in combination "
                              "with the --to option. ")
 
+    parser.add_argument('--search',
+                        type=str,
+                        help="# Find the files in the target directory whose name, source "
+                             "name or tags match the query, using a full-text index. "
+                             "E.g. --search=\"sourcename:wedding AND tagsstr:2019\" ; "
+                             "any substring of three characters or more may be searched.")
+
     parser.add_argument('-s', '--select',
                         action="store_true",
                         help="# Select files according to what is described "
@@ -2558,16 +6320,26 @@ def read_command_line_arguments():
                              ", it means that the source path is the current directory"
                              " (=the directory where the script katal.py has been launched)")
 
+    parser.add_argument('--timebudget',
+                        type=int,
+                        help="# To be used with the --maintenance parameter. Maximal duration "
+                             "of the maintenance, in seconds : the next maintenance will "
+                             "go on.")
+
     parser.add_argument('-ti', '--targetinfos',
                         action="store_true",
                         help="# Display informations about the target directory")
 
     parser.add_argument('-tk', '--targetkill',
                         type=str,
-                        help="# Kill (=move to the trash directory) one file from "
-                             "the target directory."
-                             "DO NOT GIVE A PATH, just the file's name, "
-                             "without the path to the target directory")
+                        nargs='+',
+                        help="# Kill (=move to the trash directory) some files from "
+                             "the target directory. "
+                             "DO NOT GIVE A PATH, just the files' names or some GLOB "
+                             "patterns (e.g. 'file*.jpg'), "
+                             "without the path to the target directory. "
+                             "'@listfile' reads the names/patterns from a file "
+                             "(one per line).")
 
     parser.add_argument('--to',
                         type=str,
@@ -2638,6 +6410,72 @@ def possible_paths_to_cfg():
 
     return res
 
+#///////////////////////////////////////////////////////////////////////////////
+def progress_begin(title, total_files=None, total_bytes=None):
+    """
+        progress_begin()
+        ________________________________________________________________________
+
+        Initialize PROGRESS, i.e. start displaying the progress line (see the
+        Progress class), if required by the --progress and the --verbosity
+        arguments. Call progress_end() to stop displaying it.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o title       : (str) see the Progress class
+                o total_files : (None/int) see the Progress class
+                o total_bytes : (None/int) see the Progress class
+
+        no RETURNED VALUE
+    """
+    global PROGRESS
+
+    if ARGS.verbosity == 'none' or ARGS.progress == "off":
+        return
+
+    if ARGS.progress == "on" or (ARGS.verbosity == 'normal' and sys.stdout.isatty()):
+        PROGRESS = Progress(title, total_files, total_bytes)
+
+#///////////////////////////////////////////////////////////////////////////////
+def progress_end():
+    """
+        progress_end()
+        ________________________________________________________________________
+
+        Stop displaying the progress line (see progress_begin()) : the line is
+        replaced by a message giving the last figures.
+        ________________________________________________________________________
+
+        no PARAMETER, no RETURNED VALUE
+    """
+    global PROGRESS
+
+    if PROGRESS is not None:
+        progress, PROGRESS = PROGRESS, None
+        msg("    " + progress.close())
+
+#///////////////////////////////////////////////////////////////////////////////
+def progress_update(files=0, hashed=0, copied=0, queues=None):
+    """
+        progress_update()
+        ________________________________________________________________________
+
+        Update the progress line (see Progress.update()); nothing is done if
+        it isn't displayed (see progress_begin()).
+        ________________________________________________________________________
+
+        PARAMETERS
+                o files  : (int) number of files done
+                o hashed : (int) number of bytes hashed
+                o copied : (int) number of bytes copied
+                o queues : None or a dict (str)name : (int)number of items
+                           waiting in this queue
+
+        no RETURNED VALUE
+    """
+    if PROGRESS is not None:
+        PROGRESS.update(files, hashed, copied, queues)
+
 #///////////////////////////////////////////////////////////////////////////////
 def read_parameters_from_cfgfile(configfile_name):
     """
@@ -2693,6 +6531,16 @@ def read_parameters_from_cfgfile(configfile_name):
             consolecolor="red")
         return None
 
+    if parser["target"]["mode"] not in CST__TARGET_MODES:
+        msg("  ! An error occured while reading "
+            "the config file \"{0}\".".format(configfile_name),
+            consolecolor="red")
+        msg("  ! [target]mode : \"{0}\" isn't a valid mode; "
+            "accepted values : {1}".format(parser["target"]["mode"],
+                                           ", ".join(CST__TARGET_MODES)),
+            consolecolor="red")
+        return None
+
     if parser["target"]["mode"] == 'nocopy':
         #   configparser.ConfigParser objects have to be initialized with strings
         # exactly equal to the strings read in an .ini file : so instead of the
@@ -2748,30 +6596,83 @@ def read_filters():
         filter_index += 1
 
 #///////////////////////////////////////////////////////////////////////////////
-def read_target_db():
+def read_other_catalogues():
+    """
+        read_other_catalogues()
+        ________________________________________________________________________
+
+        Open read-only the databases of the target directories listed in the
+        [database]other catalogues option (one directory per line) : the files
+        stored in these databases won't be added to the target directory.
+        See OTHER_TARGET_DBS and action__whatabout().
+        ________________________________________________________________________
+
+        no PARAMETER
+
+        RETURNED VALUE
+                a list of Catalogue objects
+    """
+    res = []
+    for path in get_database_parameter("other catalogues").splitlines():
+        if path.strip() == "":
+            continue
+
+        db_name = os.path.join(normpath(path.strip()), CST__KATALSYS_SUBDIR, CST__DATABASE_NAME)
+        if db_name == get_database_fullname():
+            # the database of the target directory isn't an "other" catalogue :
+            continue
+
+        if not os.path.exists(db_name):
+            raise KatalError("[database]other catalogues : "
+                             "can't find the database \"{0}\".".format(db_name))
+
+        msg("    ... the files stored in \"{0}\" will be considered as "
+            "already added.".format(db_name))
+        res.append(Catalogue(db_name, readonly=True))
+
+    return res
+
+#///////////////////////////////////////////////////////////////////////////////
+def read_target_db(catalogue):
     """
         read_target_db()
         ________________________________________________________________________
 
         Read the database stored in the target directory and initialize
         TARGET_DB.
+
+        If the database contains more files than the [database]target db.max
+        files in memory option, TARGET_DB is a LazyTargetDB object : nothing is
+        read now, the files will be looked up in the database when required.
+
+        Initialize OTHER_TARGET_DBS too (see read_other_catalogues()).
         ________________________________________________________________________
 
-        no PARAMETER, no RETURNED VALUE
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
+
+        no RETURNED VALUE
     """
-    if not os.path.exists(normpath(get_database_fullname())):
-        create_empty_db(normpath(get_database_fullname()))
+    global TARGET_DB, OTHER_TARGET_DBS
 
-    db_connection = sqlite3.connect(get_database_fullname())
-    db_connection.row_factory = sqlite3.Row
-    db_cursor = db_connection.cursor()
+    catalogue.create()
 
-    for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
-        TARGET_DB[db_record["hashid"]] = (db_record["partialhashid"],
-                                          db_record["size"],
-                                          db_record["sourcename"])
+    max_files_in_memory = get_database_parameter("target db.max files in memory")
+    if not max_files_in_memory.isdigit():
+        raise KatalError("[database]target db.max files in memory : "
+                         "\"{0}\" isn't a positive integer.".format(max_files_in_memory))
+
+    files_number = catalogue.count()
+    if files_number > int(max_files_in_memory):
+        msg("    ... {0} files in the database : they will be looked up in the database "
+            "when required.".format(files_number))
+        TARGET_DB = LazyTargetDB(catalogue)
+    else:
+        TARGET_DB = TargetDB(catalogue)
 
-    db_connection.close()
+    # the other databases are never loaded in memory :
+    OTHER_TARGET_DBS = [LazyTargetDB(other_catalogue)
+                        for other_catalogue in read_other_catalogues()]
 
 #/////////////////////////////////////////////////////////////////////////////////////////
 def remove_illegal_characters(src):
@@ -2794,6 +6695,59 @@ def remove_illegal_characters(src):
         res = res.replace(char, "_")
     return res
 
+#///////////////////////////////////////////////////////////////////////////////
+def set_io_priority(priority):
+    """
+        set_io_priority()
+        ________________________________________________________________________
+
+        Lower the I/O priority of the program ([io]priority), so that the other
+        programs reading/writing the same disks aren't slowed down :
+
+        o 'normal' : nothing is done;
+        o 'low'    : the lowest CPU priority (nice value 19), and the lowest
+                     I/O priority of the "best-effort" class on Linux, which
+                     derives from the nice value;
+        o 'idle'   : on Linux, the "idle" I/O class (ioprio_set(), see
+                     CST__IOPRIO_SET_SYSCALLS) : the disks are only used when
+                     no other program needs them; 'low' elsewhere.
+
+        The threads created afterwards inherit the priority : this function
+        has to be called before any pool of threads is created.
+        ________________________________________________________________________
+
+        PARAMETER
+                o priority : (str) a value of CST__IO_PRIORITIES
+
+        no RETURNED VALUE
+    """
+    if priority not in CST__IO_PRIORITIES:
+        raise KatalError("[io]priority : \"{0}\" isn't a valid priority; accepted "
+                         "values : {1}".format(priority, ", ".join(CST__IO_PRIORITIES)))
+
+    if priority == "normal":
+        return
+
+    if priority == "idle":
+        syscall_number = CST__IOPRIO_SET_SYSCALLS.get(platform.machine())
+        if CST__PLATFORM == 'Linux' and syscall_number is not None:
+            # ioprio_set(IOPRIO_WHO_PROCESS=1, current thread=0, IOPRIO_CLASS_IDLE=3 << 13) :
+            libc = ctypes.CDLL(None, use_errno=True)
+            if libc.syscall(syscall_number, 1, 0, 3 << 13) == 0:
+                msg("  = I/O priority : idle")
+                return
+
+        msg("  ! the \"idle\" I/O priority isn't available : let's use the \"low\" one.",
+            consolecolor="red")
+
+    if not hasattr(os, "setpriority"):
+        msg("  ! the priority can't be lowered on this platform.",
+            consolecolor="red")
+        return
+
+    os.setpriority(os.PRIO_PROCESS, 0, 19)
+    msg("  = I/O priority : low")
+
 #///////////////////////////////////////////////////////////////////////////////
 def shortstr(string, max_length):
     """
@@ -2905,7 +6859,7 @@ def show_infos_about_source_path():
     INFOS_ABOUT_SRC_PATH = (total_size, files_number, extensions)
 
 #///////////////////////////////////////////////////////////////////////////////
-def show_infos_about_target_path():
+def show_infos_about_target_path(catalogue):
     """
         show_infos_about_target_path()
         ________________________________________________________________________
@@ -2913,7 +6867,8 @@ def show_infos_about_target_path():
         Display informations about the the target directory
         ________________________________________________________________________
 
-        no PARAMETER
+        PARAMETER
+                o catalogue : the Catalogue object of the target directory
 
         RETURNED VALUE
                 (int) 0 if ok, -1 if an error occured
@@ -2946,35 +6901,30 @@ def show_infos_about_target_path():
         msg("target path \"{0}\" isn't a directory.".format(ARGS.targetpath))
         return -1
 
-    if not os.path.exists(os.path.join(normpath(ARGS.targetpath),
-                                       CST__KATALSYS_SUBDIR, CST__DATABASE_NAME)):
+    if not catalogue.exists():
         msg("    o no database in the target directory.")
         return 0
 
     #...........................................................................
-    db_connection = sqlite3.connect(get_database_fullname())
-    db_connection.row_factory = sqlite3.Row
-    db_cursor = db_connection.cursor()
-
     # there's no easy way to know the size of a table in a database,
     # so we can't display the "empty database" warning before the following
     # code which reads the table.
     rows_data = []
     row_index = 0
-    for db_record in db_cursor.execute('SELECT * FROM dbfiles'):
+    for hashid, name, tagsstr, sourcename, sourcedate in catalogue.files_for_infos():
         sourcedate = \
-            datetime.utcfromtimestamp(db_record["sourcedate"]).strftime(CST__DTIME_FORMAT)
+            datetime.utcfromtimestamp(sourcedate).strftime(CST__DTIME_FORMAT)
 
         if CFG_PARAMETERS["target"]["mode"] != 'nocopy':
-            rows_data.append((db_record["hashid"],
-                              db_record["name"],
-                              tagsstr_repr(db_record["tagsstr"]),
-                              db_record["sourcename"],
+            rows_data.append((hashid,
+                              name,
+                              tagsstr_repr(tagsstr),
+                              sourcename,
                               sourcedate))
         else:
-            rows_data.append((db_record["hashid"],
-                              tagsstr_repr(db_record["tagsstr"]),
-                              db_record["sourcename"],
+            rows_data.append((hashid,
+                              tagsstr_repr(tagsstr),
+                              sourcename,
                               sourcedate))
         row_index += 1
 
@@ -2983,7 +6933,11 @@ def show_infos_about_target_path():
             consolecolor="red")
         return 0
 
-    msg("    o {0} file(s) in the database :".format(row_index))
+    if catalogue.shards > 1:
+        msg("    o {0} file(s) in the database ({1} shards) :".format(row_index,
+                                                                   catalogue.shards))
+    else:
+        msg("    o {0} file(s) in the database :".format(row_index))
 
     targetname_maxlength = \
             int(CFG_PARAMETERS["display"]["target filename.max length on console"])
@@ -3010,8 +6964,6 @@ def show_infos_about_target_path():
                          ("source date", CST__DTIME_FORMAT_LENGTH, "|")),
                    data=rows_data)
 
-    db_connection.close()
-
     return 0
 
 #///////////////////////////////////////////////////////////////////////////////
@@ -3058,6 +7010,132 @@ def size_as_str(_size):
 
     return res
 
+#///////////////////////////////////////////////////////////////////////////////
+def strictcmp(filename1, filename2):
+    """
+        strictcmp()
+        ________________________________________________________________________
+
+        Bit-to-bit comparision of two files, used by --strictcmp : the files
+        are read by blocks of CST__STRICTCMP_BLOCKSIZE bytes (without any
+        intermediate buffer) and the comparision stops at the first different
+        block.
+        ________________________________________________________________________
+
+        PARAMETERS
+                o filename1, filename2 : (str) the names of the files
+
+        RETURNED VALUE
+                (bool) True if the files have the same content
+    """
+    if os.stat(filename1).st_size != os.stat(filename2).st_size:
+        return False
+
+    buf1 = bytearray(CST__STRICTCMP_BLOCKSIZE)
+    buf2 = bytearray(CST__STRICTCMP_BLOCKSIZE)
+    view1 = memoryview(buf1)
+    view2 = memoryview(buf2)
+
+    with open(filename1, "rb", buffering=0) as file1, \
+         open(filename2, "rb", buffering=0) as file2:
+        while True:
+            length1 = file1.readinto(buf1)
+            length2 = file2.readinto(buf2)
+            io_throttle(read=length1+length2, operations=2)
+
+            if length1 != length2 or view1[:length1] != view2[:length2]:
+                return False
+
+            if length1 == 0:
+                return True
+
+#///////////////////////////////////////////////////////////////////////////////
+def strictcmp__pool(pairs):
+    """
+        strictcmp__pool()
+        ________________________________________________________________________
+
+        Compare bit-to-bit (see strictcmp()) many pairs of files, the pairs
+        being compared at the same time by [io]workers threads.
+        ________________________________________________________________________
+
+        PARAMETER
+                o pairs : a list of ((str)filename1, (str)filename2)
+
+        RETURNED VALUE
+                a list of booleans (True if the files have the same content), in
+                the order of <pairs>.
+    """
+    if len(pairs) <= 1:
+        return [strictcmp(filename1, filename2) for filename1, filename2 in pairs]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=get_io_integer("workers")) as executor:
+        return list(executor.map(strictcmp,
+                                 [filename1 for filename1, _ in pairs],
+                                 [filename2 for _, filename2 in pairs]))
+
+#///////////////////////////////////////////////////////////////////////////////
+def sync_file(filename):
+    """
+        sync_file()
+        ________________________________________________________________________
+
+        Write on disk (fsync) a file or a directory, see [io]durability. A
+        directory can't be written on disk on Windows : nothing is done.
+        ________________________________________________________________________
+
+        PARAMETER
+                o filename : (str) the name of the file or of the directory
+
+        no RETURNED VALUE
+    """
+    if CST__PLATFORM == 'Windows':
+        if os.path.isdir(filename):
+            return
+        flags = os.O_RDWR
+    else:
+        flags = os.O_RDONLY
+
+    file_descriptor = os.open(filename, flags)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+#///////////////////////////////////////////////////////////////////////////////
+def sync_filesystem(path):
+    """
+        sync_filesystem()
+        ________________________________________________________________________
+
+        Write on disk all the files of the filesystem storing <path>, see
+        [io]durability : one system call instead of one fsync per file.
+        syncfs() is used on Linux (only this filesystem is written on disk),
+        sync() on the other Unix-like platforms (all the filesystems).
+        ________________________________________________________________________
+
+        PARAMETER
+                o path : (str) a directory of the filesystem
+
+        RETURNED VALUE
+                (bool) False if it's not possible (e.g. on Windows) : the files
+                have to be written on disk one by one (see sync_file()).
+    """
+    if CST__PLATFORM == 'Linux':
+        libc = ctypes.CDLL(None, use_errno=True)
+        file_descriptor = os.open(path, os.O_RDONLY)
+        try:
+            if libc.syncfs(file_descriptor) == 0:
+                return True
+        finally:
+            os.close(file_descriptor)
+
+    if hasattr(os, "sync"):
+        os.sync()
+        return True
+
+    return False
+
 #//////////////////////////////////////////////////////////////////////////////
 def tagsstr_repr(tagsstr):
     """
@@ -3085,7 +7163,10 @@ def thefilehastobeadded__db(filename, _size):
         thefilehastobeadded__db()
         ________________________________________________________________________
 
-        Return True if the file isn't already known in the database.
+        Return True if the file isn't already known in the database, nor in
+        the databases of the other target directories (see OTHER_TARGET_DBS).
+
+        See thefileshavetobeadded__db(), which compares many files at once.
         ________________________________________________________________________
 
         PARAMETERS
@@ -3102,63 +7183,7 @@ def thefilehastobeadded__db(filename, _size):
                 either (False, None, None)
                 either (True, partial hashid, hashid)
     """
-    # a list of hashid(s) :
-    res = []
-
-    # (1) how many file(s) in the database have a size equal to _size ?
-    for hashid in TARGET_DB:
-        _, target_size, _ = TARGET_DB[hashid]
-        if target_size == _size:
-            res.append(hashid)
-
-    if len(res) == 0:
-        return (True,
-                hashfile64(filename=filename,
-                           stop_after=CST__PARTIALHASHID_BYTESNBR),
-                hashfile64(filename=filename))
-
-    # (2) how many file(s) among those in <res> have a partial hashid equal
-    # to the partial hashid of filename ?
-    new_res = []
-    src_partialhashid = hashfile64(filename=filename,
-                                   stop_after=CST__PARTIALHASHID_BYTESNBR)
-    for hashid in res:
-        target_partialhashid, _, _ = TARGET_DB[hashid]
-        if target_partialhashid == src_partialhashid:
-            new_res.append(hashid)
-
-    res = new_res
-    if len(res) == 0:
-        return (True,
-                src_partialhashid,
-                hashfile64(filename=filename))
-
-    # (3) how many file(s) among those in <res> have an hashid equal to the
-    # hashid of filename ?
-    new_res = []
-    src_hashid = hashfile64(filename=filename)
-    for hashid in res:
-        target_hashid, _, _ = TARGET_DB[hashid]
-        if target_hashid == src_hashid:
-            new_res.append(hashid)
-
-    res = new_res
-    if len(res) == 0:
-        return (True,
-                src_partialhashid,
-                src_hashid)
-
-    if not ARGS.strictcmp:
-        return (False, None, None)
-
-    # (4) bit-to-bit comparision :
-    for hashid in res:
-        if not filecmp.cmp(filename, TARGET_DB[hashid][2], shallow=False):
-            return (True,
-                    src_partialhashid,
-                    src_hashid)
-
-    return (False, None, None)
+    return thefileshavetobeadded__db(((filename, _size),))[0]
 
 #///////////////////////////////////////////////////////////////////////////////
 def thefilehastobeadded__filters(filename, _size, date):
@@ -3331,6 +7356,242 @@ def thefilehastobeadded__filt_size(_filter, _size):
 
     return res
 
+#///////////////////////////////////////////////////////////////////////////////
+def thefileshavetobeadded__db(files):
+    """
+        thefileshavetobeadded__db()
+        ________________________________________________________________________
+
+        Batch version of thefilehastobeadded__db() : compare many files with
+        the database and with the databases of the other target directories
+        (see OTHER_TARGET_DBS), set after set instead of file after file :
+
+        (1) the sizes of all the files are joined with the database(s) (see
+            TargetDB.known_sizes()/LazyTargetDB.known_sizes());
+        (2) every file is read once to compute both its partial hashid and its
+            hashid (see hashfile__partialandfull()) : the hashid of a file is
+            either stored in the database (if the file is new) or required to
+            know if the file is new;
+        (3) the hashids of the files whose size is known are joined with the
+            database(s) (see TargetDB.known_hashids()/LazyTargetDB.known_hashids());
+        (4) if --strictcmp has been used, the files whose hashid is known are
+            compared bit-to-bit with the files stored in the target
+            directories (see strictcmp__pool()).
+        ________________________________________________________________________
+
+        PARAMETER
+                o files : a list of ((str)file's name, (int)file's size)
+
+        RETURNED VALUE
+                a list of (tobeadded, partial hashid, hashid) in the order of
+                <files>, i.e. for each file either (False, None, None) either
+                (True, partial hashid, hashid), see thefilehastobeadded__db().
+    """
+    target_dbs = [TARGET_DB] + OTHER_TARGET_DBS
+
+    # (1) which sizes are known in the database(s) ?
+    sizes = set(size for _, size in files)
+    known_sizes = set()
+    for target_db in target_dbs:
+        known_sizes |= target_db.known_sizes(sizes)
+
+    # (2) partial hashids and hashids :
+    # a list of ((bytes)partial hashid, (bytes)hashid)
+    hashids = []
+    for filename, _ in files:
+        hashids.append(hashfile__partialandfull(filename))
+        progress_update(queues={"to be hashed" : len(files) - len(hashids)})
+
+    # (3) which hashids are known in the database(s) ?
+    # (bytes)hashid : the list of the TargetDB/LazyTargetDB objects where it's known
+    candidates = [(size, hashid)
+                  for (_, size), (_, hashid) in zip(files, hashids)
+                  if size in known_sizes]
+    known_hashids = {}
+    if candidates:
+        for target_db in target_dbs:
+            for hashid in target_db.known_hashids(candidates):
+                known_hashids.setdefault(hashid, []).append(target_db)
+
+    # (4) bit-to-bit comparisions :
+    # indexes (in <files>) of the files different from a file of the database :
+    different = set()
+    if known_hashids and ARGS.strictcmp:
+        pairs = []    # ((str)source file, (str)stored file)
+        indexes = []  # index in <files> of each pair
+        for index, ((filename, _), (_, hashid)) in enumerate(zip(files, hashids)):
+            for target_db in known_hashids.get(hashid, ()):
+                stored_file = target_db.stored_file(hashid)
+                if stored_file is None:
+                    msg("    ! --strictcmp : can't find the file whose hashid is \"{0}\" "
+                        "and which is known in the database : \"{1}\" can't be compared "
+                        "bit-to-bit.".format(b64encode(hashid).decode(), filename),
+                        consolecolor="red")
+                else:
+                    pairs.append((filename, stored_file))
+                    indexes.append(index)
+
+        different.update(index
+                         for index, identical in zip(indexes, strictcmp__pool(pairs))
+                         if not identical)
+
+    res = []
+    for index, (partialhashid, hashid) in enumerate(hashids):
+        tobeadded = hashid not in known_hashids or index in different
+
+        if tobeadded:
+            res.append((True,
+                        b64encode(partialhashid).decode(),
+                        b64encode(hashid).decode()))
+        else:
+            res.append((False, None, None))
+
+    return res
+
+#///////////////////////////////////////////////////////////////////////////////
+def transfer_file(source_name, target_name, sourcedate, mode):
+    """
+        transfer_file()
+        ________________________________________________________________________
+
+        Copy (see copy_file()) or move a file to the target directory and set
+        its modification time. This function is called by the threads of
+        transfer_files().
+
+        If [io]durability is 'file', the target file and its directory (and
+        the source directory of a moved file) are written on disk (see
+        sync_file()).
+        ________________________________________________________________________
+
+        PARAMETERS
+                o source_name : (str) the source file's name
+                o target_name : (str) the target file's name
+                o sourcedate  : (float) epoch time, the modification time of
+                                the target file
+                o mode        : (str) "move" or a value of CST__COPYTO_MODES (see
+                                [target]mode); with "nocopy" or None, nothing is
+                                done.
+
+        no RETURNED VALUE
+    """
+    if mode == "move":
+        io_throttle()
+        if IO_THROTTLE is not None and IO_THROTTLE.active():
+            # the content of the file is only copied if both files are stored
+            # on different filesystems :
+            def copy_function(src, dst):
+                """
+                        shutil.copy2() respecting the I/O limits.
+                """
+                copy_file__throttled(src, dst)
+                shutil.copystat(src, dst)
+            shutil.move(source_name, target_name, copy_function=copy_function)
+        else:
+            shutil.move(source_name, target_name)
+    elif mode in CST__COPYTO_MODES:
+        copy_file(source_name, target_name, mode)
+    else:
+        return
+
+    # a hard link (or a symbolic link) shares the modification time of the
+    # source file, which mustn't be modified :
+    if mode not in ("hardlink", "symlink"):
+        os.utime(target_name, (sourcedate, sourcedate))
+
+    if get_io_durability() == "file":
+        if mode not in ("hardlink", "symlink"):
+            sync_file(target_name)
+        sync_file(os.path.dirname(os.path.abspath(target_name)))
+        if mode == "move":
+            sync_file(os.path.dirname(os.path.abspath(source_name)))
+
+#///////////////////////////////////////////////////////////////////////////////
+def transfer_files(transfers):
+    """
+        transfer_files()
+        ________________________________________________________________________
+
+        Copy or move many files (see transfer_file()) with [io]workers threads :
+        many small files are transferred at the same time but the sum of the
+        sizes of the files being transferred can't exceed [io]max bytes in
+        flight (a bigger file is transferred alone), so that huge files don't
+        fill the page cache.
+
+        This function is a generator : the transfers are yielded in the order
+        of <transfers> once they are over. If a transfer fails, no other
+        transfer is started : the transfers already started are yielded once
+        they are over (except the failed ones), then the exception of the first
+        failed transfer is raised. This way, the caller knows every file which
+        has been copied/moved.
+        ________________________________________________________________________
+
+        PARAMETER
+                o transfers : an iterable of (..., (str)source name,
+                              (str)target name, (int)size, (float)sourcedate,
+                              (str)mode), the first item being free.
+
+        YIELDED VALUE
+                the items of <transfers>
+    """
+    max_bytes_in_flight = get_io_integer("max bytes in flight")
+
+    # (future, transfer), in the order of <transfers> :
+    pending = deque()
+    bytes_in_flight = 0
+    failure = None  # exception raised by the first failed transfer
+
+    #...........................................................................
+    def pop_transfer():
+        """
+                Wait for the oldest pending transfer to be over and return it,
+                or return None if it has failed.
+        """
+        nonlocal bytes_in_flight, failure
+
+        future, done = pending.popleft()
+        bytes_in_flight -= done[3]
+        try:
+            future.result()
+        except Exception as exception:
+            if failure is None:
+                failure = exception
+            return None
+        return done
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=get_io_integer("workers")) \
+         as executor:
+        for transfer in transfers:
+            _, source_name, target_name, size, sourcedate, mode = transfer
+
+            # let's wait for enough bytes to be available :
+            while pending and bytes_in_flight + size > max_bytes_in_flight:
+                done = pop_transfer()
+                if done is not None:
+                    yield done
+
+            if failure is not None:
+                break
+
+            pending.append((executor.submit(transfer_file,
+                                            source_name, target_name, sourcedate, mode),
+                            transfer))
+            bytes_in_flight += size
+            progress_update(queues={"in flight" : len(pending)})
+
+            # the transfers already over are yielded as soon as possible :
+            while pending and pending[0][0].done():
+                done = pop_transfer()
+                if done is not None:
+                    yield done
+
+        while pending:
+            done = pop_transfer()
+            if done is not None:
+                yield done
+
+    if failure is not None:
+        raise failure
+
 #///////////////////////////////////////////////////////////////////////////////
 def welcome(timestamp_start):
     """
@@ -28,7 +28,13 @@
 # pylint: disable=E1101
 
 from collections import namedtuple
+import gzip
 import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
 import unittest
 
 from katal import katal
@@ -36,6 +42,8 @@ katal.ARGS = namedtuple("ARGS", ("configfile", "verbosity", "targetpath",))
 katal.ARGS.verbosity = 'none'
 katal.ARGS.targetpath = "tests"
 katal.ARGS.usentfsprefix = None
+katal.ARGS.off = False
+katal.TARGET_DB = katal.TargetDB()
 
 ################################################################################
 class Tests(unittest.TestCase):
@@ -171,3 +179,991 @@ class Tests(unittest.TestCase):
 
         self.assertFalse(katal.thefilehastobeadded__filt_size(_filter={"size":">1MiB"},
                                                               _size=1024))
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__create_fts_index(self):
+        """
+                Tests.test__create_fts_index()
+
+                Test of the katal.py::create_fts_index() function.
+        """
+        db_connection = sqlite3.connect(":memory:")
+        db_connection.execute(katal.CST__SQL__CREATE_DB)
+        db_connection.execute("INSERT INTO dbfiles VALUES (?,?,?,?,?,?,?)",
+                              ("hashid1", "phashid1", 1, "1.jpg",
+                               "/wedding/a.jpg", 0, "2019"))
+
+        if not katal.create_fts_index(db_connection):
+            self.skipTest("no FTS5 module available")
+
+        # the index has been built from the existing record and is kept up to date :
+        db_connection.execute("UPDATE dbfiles SET tagsstr='2020' WHERE hashid='hashid1'")
+        db_connection.execute("INSERT INTO dbfiles VALUES (?,?,?,?,?,?,?)",
+                              ("hashid2", "phashid2", 2, "2.jpg",
+                               "/birthday/b.jpg", 0, "2019"))
+
+        sqlorder = "SELECT rowid FROM dbfiles_fts WHERE dbfiles_fts MATCH ?"
+        self.assertEqual(len(db_connection.execute(sqlorder, ("wedding",)).fetchall()), 1)
+        self.assertEqual(len(db_connection.execute(sqlorder, ("tagsstr:2019",)).fetchall()), 1)
+        self.assertEqual(len(db_connection.execute(sqlorder, ("tagsstr:2020",)).fetchall()), 1)
+
+        db_connection.close()
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__exportdb_importdb(self):
+        """
+                Tests.test__exportdb_importdb()
+
+                Test of the katal.py::action__exportdb() and action__importdb() functions.
+        """
+        record = ("47DEQpj8HBSa+/TImW+5JCeuQeRkm5NMpJWZG3hSuFU=",
+                  "47DEQpj8HBSa+/TImW+5JCeuQeRkm5NMpJWZG3hSuFU=",
+                  0, "1.jpg", "/wedding/a, b.jpg", 0, "2019;wedding")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            catalogue = katal.Catalogue(os.path.join(tmpdir, "1.db"))
+            catalogue.create()
+            catalogue.add_files((record,))
+
+            for exportname in ("export.csv", "export.jsonl"):
+                exportname = os.path.join(tmpdir, exportname)
+                self.assertEqual(katal.action__exportdb(catalogue, exportname), 1)
+
+                newcatalogue = katal.Catalogue(os.path.join(tmpdir, "2.db"))
+                self.assertEqual(katal.action__importdb(newcatalogue, exportname), 1)
+                self.assertEqual(list(newcatalogue.records()), [record])
+                newcatalogue.close()
+                os.remove(os.path.join(tmpdir, "2.db"))
+
+            catalogue.close()
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__sharded_catalogue(self):
+        """
+                Tests.test__sharded_catalogue()
+
+                Test of the katal.py::Catalogue class with a sharded database.
+        """
+        records = [(katal.b64encode(bytes((index,))*32).decode(),
+                    katal.b64encode(bytes((index,))*32).decode(),
+                    index, "{0}.jpg".format(index), "/src/{0}.jpg".format(index), 0, "")
+                   for index in range(8)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_name = os.path.join(tmpdir, "katal.db")
+            katal.create_empty_db(db_name, shards=4)
+
+            catalogue = katal.Catalogue(db_name)
+            self.assertEqual(catalogue.shards, 4)
+            catalogue.add_files(records)
+            catalogue.modify_tags(((";red", records[5][0]),), mode="append")
+            catalogue.delete_files(((records[2][0],),))
+            catalogue.close()
+
+            # every shard has received its records :
+            for index in range(1, 4):
+                shard = sqlite3.connect(katal.get_database_shardname(db_name, index))
+                self.assertEqual(shard.execute("SELECT count(*) FROM dbfiles").fetchone()[0],
+                                 1 if index == 2 else 2)
+                shard.close()
+
+            catalogue = katal.Catalogue(db_name)
+            self.assertEqual(catalogue.count(), 7)
+            self.assertIsNone(catalogue.record(records[2][0]))
+            self.assertEqual(catalogue.record(records[5][0])[6], ";red")
+            self.assertEqual([size for size, _, _ in catalogue.files_for_targetdb()],
+                             [0, 1, 3, 4, 5, 6, 7])
+            catalogue.close()
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__maintenance(self):
+        """
+                Tests.test__maintenance()
+
+                Test of the katal.py::action__maintenance() function.
+        """
+        records = [(katal.b64encode(index.to_bytes(32, "big")).decode(),
+                    katal.b64encode(index.to_bytes(32, "big")).decode(),
+                    index, "{0}.jpg".format(index), "/src/{0}.jpg".format(index)*10, 0, "")
+                   for index in range(5000)]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            catalogue = katal.Catalogue(os.path.join(tmpdir, "katal.db"))
+            catalogue.create()
+            catalogue.add_files(records)
+            catalogue.delete_files((record[:1] for record in records[1:]))
+            self.assertGreater(catalogue.storage("main")[2], 0)
+
+            # a vacuum which can't free any page doesn't loop forever :
+            catalogue.vacuum = lambda schema, pages: None
+            self.assertEqual(katal.action__maintenance(catalogue), 0)
+            self.assertGreater(catalogue.storage("main")[2], 0)
+            del catalogue.vacuum
+
+            self.assertEqual(katal.action__maintenance(catalogue), 0)
+            self.assertEqual(catalogue.storage("main")[2], 0)
+            self.assertEqual(catalogue.count(), 1)
+            catalogue.close()
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__strictcmp(self):
+        """
+                Tests.test__strictcmp()
+
+                Test of the katal.py::strictcmp() and strictcmp__pool() functions.
+        """
+        content = bytes(range(256)) * (katal.CST__STRICTCMP_BLOCKSIZE // 128 + 1)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = [os.path.join(tmpdir, str(index)) for index in range(4)]
+            for filename, data in zip(filenames,
+                                      (content, content, content[:-1] + b"!", content[:-1])):
+                with open(filename, "wb") as afile:
+                    afile.write(data)
+
+            self.assertTrue(katal.strictcmp(filenames[0], filenames[1]))
+            self.assertFalse(katal.strictcmp(filenames[0], filenames[2]))
+            self.assertFalse(katal.strictcmp(filenames[0], filenames[3]))
+
+            self.assertEqual(katal.strictcmp__pool([(filenames[0], filenames[index])
+                                                    for index in range(4)]),
+                             [True, True, False, False])
+
+            # empty files; a difference in the first block :
+            empty1, empty2, firstblock = [os.path.join(tmpdir, name)
+                                          for name in ("empty1", "empty2", "firstblock")]
+            for filename, data in ((empty1, b""), (empty2, b""), (firstblock, b"!" + content[1:])):
+                with open(filename, "wb") as afile:
+                    afile.write(data)
+
+            self.assertTrue(katal.strictcmp(empty1, empty2))
+            self.assertFalse(katal.strictcmp(empty1, filenames[0]))
+            self.assertFalse(katal.strictcmp(filenames[0], firstblock))
+
+            # the results are given in the order of the pairs, whatever the
+            # order in which the threads compare them :
+            pairs = [(filenames[0], filenames[index % 4]) for index in range(20)] + \
+                    [(empty1, empty2), (filenames[0], firstblock)]
+            self.assertEqual(katal.strictcmp__pool(pairs),
+                             [True, True, False, False]*5 + [True, False])
+            self.assertEqual(katal.strictcmp__pool([]), [])
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__journal(self):
+        """
+                Tests.test__journal()
+
+                Test of the katal.py::Journal class.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            journal = katal.Journal(os.path.join(tmpdir, "add.journal"))
+            self.assertFalse(journal.exists())
+
+            journal.append(({"mode" : "copy"}, {"planned" : ["hashid", 1]}))
+            journal.append(({"done" : "hashid"},))
+            journal.close()
+
+            # the program has been interrupted while writing the last line :
+            with open(journal.filename, "a") as afile:
+                afile.write('{"done" : "has')
+
+            self.assertEqual(list(journal.records()),
+                             [{"mode" : "copy"}, {"planned" : ["hashid", 1]}, {"done" : "hashid"}])
+
+            journal.remove()
+            self.assertFalse(journal.exists())
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__rebaseinplace__renames(self):
+        """
+                Tests.test__rebaseinplace__renames()
+
+                Test of the katal.py::action__rebaseinplace__renames() function :
+                chain and cycle of renamings.
+        """
+        moves = {"a" : "b", "b" : "a", "c" : "d", "d" : "e"}
+        renames = katal.action__rebaseinplace__renames(moves, "temp{0}".format)
+
+        self.assertEqual(renames,
+                         [["d", "e"], ["c", "d"], ["a", "temp0"], ["b", "a"], ["temp0", "b"]])
+
+        # the renamings are applied to a set of names : a name is never overwritten.
+        names = {"a" : "A", "b" : "B", "c" : "C", "d" : "D"}
+        for old, new in renames:
+            self.assertNotIn(new, names)
+            names[new] = names.pop(old)
+        self.assertEqual(names, {"b" : "A", "a" : "B", "d" : "C", "e" : "D"})
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__tokenbucket(self):
+        """
+                Tests.test__tokenbucket()
+
+                Test of the katal.py::TokenBucket class.
+        """
+        bucket = katal.TokenBucket(100)
+        now = bucket.time
+
+        # the bucket is full, then in debt :
+        self.assertEqual(bucket.take(100, now), 0)
+        self.assertAlmostEqual(bucket.take(50, now), 0.5)
+
+        # one second later, the debt has been paid back :
+        self.assertAlmostEqual(bucket.take(25, now+1), 0)
+        self.assertAlmostEqual(bucket.tokens, 25)
+
+        # no limit :
+        bucket.set_rate(0)
+        self.assertEqual(bucket.take(10**9, now+1), 0)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__messagewriter(self):
+        """
+                Tests.test__messagewriter()
+
+                Test of the katal.py::MessageWriter class : the messages are
+                written in order by the thread.
+        """
+        with tempfile.TemporaryFile("w+") as console:
+            stdout, sys.stdout = sys.stdout, console
+            writer = katal.MessageWriter()
+            try:
+                for index in range(2500):
+                    writer.write("{0}\n".format(index), None)
+                writer.flush()
+                self.assertEqual(os.fstat(console.fileno()).st_size,
+                                 len("".join("{0}\n".format(index) for index in range(2500))))
+
+                writer.write("end\n", None)
+                writer.close()
+            finally:
+                sys.stdout = stdout
+
+            console.seek(0)
+            self.assertEqual(console.read().split(),
+                             [str(index) for index in range(2500)] + ["end"])
+            self.assertFalse(writer.thread.is_alive())
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__progress(self):
+        """
+                Tests.test__progress()
+
+                Test of the katal.py::Progress class : rates, queues and ETA.
+        """
+        progress = katal.Progress("copy", total_files=10, total_bytes=4000000)
+        progress.start -= 10.0
+        progress.next_refresh = float("inf")  # nothing is written on console
+        progress.update(files=5, copied=1000000, queues={"in flight" : 3})
+
+        self.assertEqual(progress.line(),
+                         "[copy] 5/10 files (50.0%) ; 0.5 files/s ; copied : 0.1 MB/s ; "
+                         "waiting : 3 in flight ; ETA 0:00:30")
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__backup_logfile__clean(self):
+        """
+                Tests.test__backup_logfile__clean()
+
+                Test of the katal.py::backup_logfile__clean() function : the
+                backuped log files are compressed, the oldest ones and the
+                temporary files of an interrupted compression removed.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        katal.CFG_PARAMETERS["log file"]["compression"] = "gzip"
+        katal.CFG_PARAMETERS["log file"]["maximal number of backups"] = "2"
+        logfile_name = katal.CFG_PARAMETERS["log file"]["name"]
+
+        current_path = os.getcwd()
+        with tempfile.TemporaryDirectory() as path:
+            try:
+                os.chdir(path)
+                logs_path = os.path.join(katal.CST__KATALSYS_SUBDIR, katal.CST__LOG_SUBSUBDIR)
+                os.makedirs(logs_path)
+                names = [logfile_name,
+                         logfile_name + "2020_01_01__000000__000000",
+                         logfile_name + "2021_01_01__000000__000000",
+                         logfile_name + "2022_01_01__000000__000000"]
+                # an interrupted compression of names[3] and a stale temporary file :
+                for name in names + [names[3] + ".gz.tmp",
+                                     logfile_name + "2019_01_01__000000__000000.xz.tmp"]:
+                    with open(os.path.join(logs_path, name), "w") as logfile:
+                        logfile.write(name)
+
+                katal.backup_logfile__clean()
+
+                self.assertEqual(sorted(os.listdir(logs_path)),
+                                 [names[0], names[2] + ".gz", names[3] + ".gz"])
+                with gzip.open(os.path.join(logs_path, names[3] + ".gz"), "rt") as logfile:
+                    self.assertEqual(logfile.read(), names[3])
+            finally:
+                os.chdir(current_path)
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__reset__failure(self):
+        """
+                Tests.test__reset__failure()
+
+                Test of the katal.py::action__reset() function when a file can't
+                be moved to the trash : the files already moved have been
+                removed from the database.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        records = [(katal.b64encode(bytes((index,))*32).decode(),
+                    katal.b64encode(bytes((index,))*32).decode(),
+                    index, "{0}.jpg".format(index), "/src/{0}.jpg".format(index), 0, "")
+                   for index in range(3)]
+
+        targetpath = katal.ARGS.targetpath
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = tmpdir
+                os.makedirs(os.path.join(tmpdir,
+                                         katal.CST__KATALSYS_SUBDIR, katal.CST__TRASH_SUBSUBDIR))
+                # the last file is missing :
+                for record in records[:2]:
+                    with open(os.path.join(tmpdir, record[3]), "w") as afile:
+                        afile.write(record[3])
+
+                catalogue = katal.Catalogue(os.path.join(tmpdir, "katal.db"))
+                catalogue.create()
+                catalogue.add_files(records)
+
+                with self.assertRaises(FileNotFoundError):
+                    katal.action__reset(catalogue)
+
+                self.assertEqual([name for _, name in catalogue.files()], ["2.jpg"])
+                self.assertEqual(sorted(os.listdir(os.path.join(tmpdir,
+                                                                katal.CST__KATALSYS_SUBDIR,
+                                                                katal.CST__TRASH_SUBSUBDIR))),
+                                 ["0.jpg", "1.jpg"])
+                catalogue.close()
+            finally:
+                katal.ARGS.targetpath = targetpath
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__bloomfilter(self):
+        """
+                Tests.test__bloomfilter()
+
+                Test of the katal.py::BloomFilter class : no false negative, the
+                file written in .katal/ is read again.
+        """
+        files = [(index, os.urandom(32), os.urandom(32)) for index in range(2000)]
+
+        bloomfilter = katal.BloomFilter(1000)
+        for size, partialhashid, hashid in files:
+            bloomfilter.add_file(size, partialhashid, hashid)
+        bloomfilter.maxrowid = 2000
+
+        for size, partialhashid, hashid in files:
+            self.assertTrue(bloomfilter.may_contain_size(size))
+            self.assertTrue(bloomfilter.may_contain_partialhashid(partialhashid))
+            self.assertTrue(bloomfilter.may_contain_hashid(hashid))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, katal.CST__KATALSYS_SUBDIR,
+                                    katal.CST__BLOOMFILTER_NAME)
+            self.assertIsNone(katal.BloomFilter.read(filename))
+
+            os.mkdir(os.path.dirname(filename))
+            bloomfilter.write(filename)
+            self.assertFalse(bloomfilter.modified)
+
+            readfilter = katal.BloomFilter.read(filename)
+            self.assertEqual(readfilter.bits, bloomfilter.bits)
+            self.assertEqual((readfilter.capacity, readfilter.files_number,
+                              readfilter.maxrowid, readfilter.removed),
+                             (1000, 2000, 2000, 0))
+
+            # ill-formed file :
+            with open(filename, "r+b") as bloomfile:
+                bloomfile.write(b"X")
+            self.assertIsNone(katal.BloomFilter.read(filename))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__bloomfilter__stale(self):
+        """
+                Tests.test__bloomfilter__stale()
+
+                Test of the katal.py::Catalogue.bloomfilter property : the filter
+                is rebuilt if the database has been modified without it.
+        """
+        records = [(katal.b64encode(bytes((index,))*32).decode(),
+                    katal.b64encode(bytes((index,))*32).decode(),
+                    index, "{0}.jpg".format(index), "/src/{0}.jpg".format(index), 0, "")
+                   for index in range(4)]
+        raw = [katal.b64decode(record[0]) for record in records]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_name = os.path.join(tmpdir, katal.CST__KATALSYS_SUBDIR, katal.CST__DATABASE_NAME)
+            os.mkdir(os.path.dirname(db_name))
+            catalogue = katal.Catalogue(db_name)
+            catalogue.create()
+            catalogue.add_files(records[:2])
+
+            # only the records really deleted are counted as removed :
+            catalogue.delete_files(((records[3][0],),))
+            self.assertEqual(catalogue.bloomfilter.removed, 0)
+            catalogue.close()
+            self.assertTrue(os.path.exists(catalogue.bloomfilter_name))
+
+            # a new file (the number of files has changed) :
+            db_connection = sqlite3.connect(db_name)
+            db_connection.execute("INSERT INTO dbfiles VALUES (?,?,?,?,?,?,?)",
+                                  (raw[2], raw[2]) + records[2][2:])
+            db_connection.commit()
+            self.assertTrue(catalogue.bloomfilter.may_contain_hashid(raw[2]))
+            self.assertEqual(catalogue.bloomfilter.files_number, 3)
+            catalogue.close()
+
+            # a file replaced by another one (the greatest rowid has changed) :
+            db_connection.execute("DELETE FROM dbfiles WHERE hashid=?", (raw[0],))
+            db_connection.execute("INSERT INTO dbfiles VALUES (?,?,?,?,?,?,?)",
+                                  (raw[3], raw[3]) + records[3][2:])
+            db_connection.commit()
+            db_connection.close()
+            self.assertTrue(catalogue.bloomfilter.may_contain_hashid(raw[3]))
+            self.assertEqual(catalogue.bloomfilter.files_number, 3)
+
+            catalogue.delete_files(((records[3][0],),))
+            self.assertEqual((catalogue.bloomfilter.files_number,
+                              catalogue.bloomfilter.removed), (2, 1))
+            catalogue.close()
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__target_kill(self):
+        """
+                Tests.test__target_kill()
+
+                Test of the katal.py::action__target_kill() function : relative
+                names, GLOB patterns, @listfile and a file which can't be moved.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        names = ["a.jpg", "sub/b.jpg", "c[1].jpg", "c1.jpg", "d1.jpg", "d2.jpg",
+                 "f.jpg", "g/e.jpg"]
+        records = [(katal.b64encode(bytes((index,))*32).decode(),
+                    katal.b64encode(bytes((index,))*32).decode(),
+                    index, name, "/src/" + name, 0, "")
+                   for index, name in enumerate(names)]
+
+        targetpath = katal.ARGS.targetpath
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = tmpdir
+                trash = os.path.join(tmpdir, katal.CST__KATALSYS_SUBDIR,
+                                     katal.CST__TRASH_SUBSUBDIR)
+                os.makedirs(trash)
+                for name in names:
+                    os.makedirs(os.path.dirname(os.path.join(tmpdir, name)), exist_ok=True)
+                    with open(os.path.join(tmpdir, name), "w") as afile:
+                        afile.write(name)
+
+                catalogue = katal.Catalogue(os.path.join(tmpdir, "katal.db"))
+                catalogue.create()
+                catalogue.add_files(records)
+
+                #///////////////////////////////////////////////////////////////
+                def names_in_db():
+                    """
+                            Return the sorted names stored in the database.
+                    """
+                    return sorted(name for _, name in catalogue.files())
+
+                # relative names, one of them in a subdirectory :
+                self.assertEqual(katal.action__target_kill(catalogue, ["a.jpg", "sub/b.jpg"]), 0)
+                self.assertTrue(os.path.exists(os.path.join(trash, "sub", "b.jpg")))
+
+                # an existing name containing "[" isn't a GLOB pattern :
+                self.assertEqual(katal.action__target_kill(catalogue, ["c[1].jpg"]), 0)
+                self.assertEqual(names_in_db(), ["c1.jpg", "d1.jpg", "d2.jpg", "f.jpg", "g/e.jpg"])
+
+                # a GLOB pattern read from a list file; an unknown name :
+                listfile = os.path.join(tmpdir, "list.txt")
+                with open(listfile, "w") as afile:
+                    afile.write("d*.jpg\n\n")
+                self.assertEqual(katal.action__target_kill(catalogue, ["@" + listfile]), 0)
+                self.assertEqual(katal.action__target_kill(catalogue, ["z.jpg"]), -2)
+                self.assertEqual(names_in_db(), ["c1.jpg", "f.jpg", "g/e.jpg"])
+
+                # "g/e.jpg" can't be moved since "g" is a file in the trash :
+                with open(os.path.join(trash, "g"), "w") as afile:
+                    afile.write("g")
+                with self.assertRaises(OSError):
+                    katal.action__target_kill(catalogue, ["f.jpg", "g/e.jpg"])
+                self.assertEqual(names_in_db(), ["c1.jpg", "g/e.jpg"])
+                self.assertTrue(os.path.exists(os.path.join(trash, "f.jpg")))
+
+                catalogue.close()
+            finally:
+                katal.ARGS.targetpath = targetpath
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__other_catalogues(self):
+        """
+                Tests.test__other_catalogues()
+
+                Test of the katal.py::thefileshavetobeadded__db() function with
+                another catalogue (see OTHER_TARGET_DBS) whose Bloom filter
+                is missing : the database is queried without building it.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        katal.ARGS.strictcmp = False
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # two source files, the first one being known by the other catalogue :
+            filenames = [os.path.join(tmpdir, name) for name in ("duplicate.jpg", "new.jpg")]
+            for filename in filenames:
+                with open(filename, "w") as afile:
+                    afile.write(filename)
+            hashid = katal.hashfile64(filenames[0])
+
+            db_name = os.path.join(tmpdir, katal.CST__KATALSYS_SUBDIR, katal.CST__DATABASE_NAME)
+            os.mkdir(os.path.dirname(db_name))
+            catalogue = katal.Catalogue(db_name)
+            catalogue.create()
+            catalogue.add_files(((hashid, hashid, os.stat(filenames[0]).st_size,
+                                  "1.jpg", filenames[0], 0, ""),))
+            catalogue.close()
+            os.remove(catalogue.bloomfilter_name)
+
+            other_catalogue = katal.Catalogue(db_name, readonly=True)
+            target_db, other_target_dbs = katal.TARGET_DB, katal.OTHER_TARGET_DBS
+            try:
+                katal.TARGET_DB = katal.TargetDB()
+                katal.OTHER_TARGET_DBS = [katal.LazyTargetDB(other_catalogue)]
+
+                results = katal.thefileshavetobeadded__db([(filename, os.stat(filename).st_size)
+                                                           for filename in filenames])
+            finally:
+                katal.TARGET_DB, katal.OTHER_TARGET_DBS = target_db, other_target_dbs
+
+            self.assertEqual(results[0], (False, None, None))
+            self.assertEqual(results[1], (True,
+                                          katal.hashfile64(filenames[1],
+                                                           katal.CST__PARTIALHASHID_BYTESNBR),
+                                          katal.hashfile64(filenames[1])))
+
+            self.assertIsNone(other_catalogue.bloomfilter)
+            other_catalogue.close()
+            self.assertFalse(os.path.exists(other_catalogue.bloomfilter_name))
+
+    #///////////////////////////////////////////////////////////////////////////
+    def test__transfer_files(self):
+        """
+                Tests.test__transfer_files()
+
+                Test of the katal.py::transfer_files() function : the transfers
+                are yielded in their order and the sizes of the files being
+                transferred never exceed [io]max bytes in flight, except for a
+                bigger file, transferred alone.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        katal.CFG_PARAMETERS["io"] = {"workers" : "4",
+                                      "max bytes in flight" : "1000"}
+        sizes = [300, 100, 500, 2000, 200, 400, 100, 300, 600, 100]
+
+        lock = threading.Lock()
+        in_flight = []       # sizes of the files being transferred
+        max_in_flight = []   # sum of <in_flight>, for each transfer
+
+        #.......................................................................
+        def transfer_file(source_name, target_name, sourcedate, mode):
+            """
+                    Fake katal.py::transfer_file() : the smaller files last longer.
+            """
+            size = int(source_name)
+            with lock:
+                in_flight.append(size)
+                max_in_flight.append(sum(in_flight))
+            time.sleep(0.1/size)
+            with lock:
+                in_flight.remove(size)
+
+        transfer_file__original = katal.transfer_file
+        try:
+            katal.transfer_file = transfer_file
+            transfers = [(index, str(size), None, size, 0, "copy")
+                         for index, size in enumerate(sizes)]
+            self.assertEqual(list(katal.transfer_files(transfers)), transfers)
+        finally:
+            katal.transfer_file = transfer_file__original
+            del katal.CFG_PARAMETERS["io"]
+
+        self.assertEqual(len(max_in_flight), len(sizes))
+        self.assertTrue(all(value <= 1000 or value == 2000 for value in max_in_flight))
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__copy_file(self):
+        """
+                Tests.test__copy_file()
+
+                Test of the katal.py::copy_file() function : 'hardlink' and
+                'symlink', then 'fastest' falling back to copy_file__range()
+                and to a plain copy.
+        """
+        content = bytes(range(256)) * 100
+
+        #.......................................................................
+        def unsupported(source_name, target_name):
+            """
+                    Fake copy_file__reflink()/copy_file__range() : not supported.
+            """
+            raise OSError(katal.errno.ENOTSUP, "not supported", target_name)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "source")
+            with open(source, "wb") as afile:
+                afile.write(content)
+
+            katal.copy_file(source, os.path.join(tmpdir, "hardlink"), "hardlink")
+            self.assertTrue(os.path.samefile(source, os.path.join(tmpdir, "hardlink")))
+            self.assertEqual(os.stat(source).st_nlink, 2)
+
+            katal.copy_file(source, os.path.join(tmpdir, "symlink"), "symlink")
+            self.assertEqual(os.readlink(os.path.join(tmpdir, "symlink")), source)
+
+            katal.copy_file(source, os.path.join(tmpdir, "fastest"), "fastest")
+
+            copy_file__reflink = katal.copy_file__reflink
+            copy_file__range = katal.copy_file__range
+            try:
+                katal.copy_file__reflink = unsupported
+                if hasattr(os, "copy_file_range"):
+                    katal.copy_file(source, os.path.join(tmpdir, "range"), "fastest")
+                    self.assertFalse(os.path.samefile(source, os.path.join(tmpdir, "range")))
+
+                # os.copy_file_range() returning 0 instead of raising an error :
+                if hasattr(os, "copy_file_range"):
+                    copy_file_range = os.copy_file_range
+                    try:
+                        os.copy_file_range = lambda *args: 0
+                        with self.assertRaises(OSError):
+                            katal.copy_file__range(source, os.path.join(tmpdir, "empty"))
+                        self.assertFalse(os.path.exists(os.path.join(tmpdir, "empty")))
+                        katal.copy_file(source, os.path.join(tmpdir, "empty"), "fastest")
+                    finally:
+                        os.copy_file_range = copy_file_range
+
+                katal.copy_file__range = unsupported
+                katal.copy_file(source, os.path.join(tmpdir, "bytes"), "fastest")
+
+                with self.assertRaises(OSError):
+                    katal.copy_file(source, os.path.join(tmpdir, "reflink"), "reflink")
+                self.assertFalse(os.path.exists(os.path.join(tmpdir, "reflink")))
+            finally:
+                katal.copy_file__reflink = copy_file__reflink
+                katal.copy_file__range = copy_file__range
+
+            for name in ("hardlink", "symlink", "fastest", "range", "empty", "bytes"):
+                if os.path.exists(os.path.join(tmpdir, name)):
+                    with open(os.path.join(tmpdir, name), "rb") as afile:
+                        self.assertEqual(afile.read(), content)
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__add__resume(self):
+        """
+                Tests.test__add__resume()
+
+                Test of the katal.py::action__add__resume() function : a journal
+                with "planned" and "done" lines, a source file which doesn't
+                exist anymore and the question asked by --select.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        targetpath = katal.ARGS.targetpath
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = os.path.join(tmpdir, "target")
+                os.makedirs(os.path.join(tmpdir, "source"))
+                os.makedirs(os.path.join(tmpdir, "target", katal.CST__KATALSYS_SUBDIR,
+                                         katal.CST__TASKS_SUBSUBDIR))
+
+                records = []
+                for index, name in enumerate(("a", "b", "c", "d")):
+                    sourcename = os.path.join(tmpdir, "source", name)
+                    if name != "d":
+                        with open(sourcename, "w") as afile:
+                            afile.write(name)
+                    hashid = katal.b64encode(bytes((index,))*32).decode()
+                    records.append([hashid, hashid, 1, name + ".txt", sourcename, 0, ""])
+
+                # "a" has been copied and written in the journal, "b" has been
+                # partially copied, "c" hasn't been copied, "d" has been removed :
+                with open(os.path.join(katal.ARGS.targetpath, "a.txt"), "w") as afile:
+                    afile.write("a")
+                with open(os.path.join(katal.ARGS.targetpath, "b.txt"), "w") as afile:
+                    afile.write("?")
+                journal = katal.Journal(katal.get_journal_fullname(katal.CST__ADD_JOURNALNAME))
+                journal.append([{"mode" : "copy"}] +
+                               [{"planned" : record} for record in records] +
+                               [{"done" : records[0][0]}])
+                journal.close()
+
+                catalogue = katal.Catalogue(os.path.join(katal.ARGS.targetpath, "katal.db"))
+
+                # --select : the question can't be asked, the journal is kept :
+                self.assertTrue(katal.action__add__resume(catalogue, ask=True))
+                self.assertTrue(journal.exists())
+                self.assertFalse(os.path.exists(os.path.join(katal.ARGS.targetpath, "c.txt")))
+
+                self.assertTrue(katal.action__add__resume(catalogue))
+                self.assertFalse(journal.exists())
+                self.assertEqual(sorted(name for _, name in catalogue.files()),
+                                 ["a.txt", "b.txt", "c.txt"])
+                for name in ("a", "b", "c"):
+                    with open(os.path.join(katal.ARGS.targetpath, name + ".txt")) as afile:
+                        self.assertEqual(afile.read(), name)
+
+                self.assertFalse(katal.action__add__resume(catalogue))
+                catalogue.close()
+            finally:
+                katal.ARGS.targetpath = targetpath
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__rebase(self):
+        """
+                Tests.test__rebase()
+
+                Test of the katal.py::action__rebase() function : the new names
+                are relative to the new target directory, the source names are
+                kept and --rebasemode=move removes the records from the current
+                database.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        with open(os.path.join("tests", "cfgfile1.ini")) as afile:
+            cfgfile = afile.read().replace("name of the target files : %%dd__%%i.%%e",
+                                           "name of the target files : new_%%i.%%e")
+
+        targetpath = katal.ARGS.targetpath
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = os.path.join(tmpdir, "old")
+                os.makedirs(katal.ARGS.targetpath)
+                records = []
+                for index, name in enumerate(("a.txt", "b.txt")):
+                    with open(os.path.join(katal.ARGS.targetpath, name), "w") as afile:
+                        afile.write(name)
+                    hashid = katal.b64encode(bytes((index,))*32).decode()
+                    records.append((hashid, hashid, index, name, "/src/" + name, 0, ""))
+
+                catalogue = katal.Catalogue(os.path.join(katal.ARGS.targetpath, "katal.db"))
+                catalogue.create()
+                catalogue.add_files(records)
+
+                for mode in ("copy", "move"):
+                    katal.ARGS.rebasemode = mode
+                    newtargetpath = os.path.join(tmpdir, mode)
+                    os.makedirs(os.path.join(newtargetpath, katal.CST__KATALSYS_SUBDIR))
+                    with open(os.path.join(newtargetpath, katal.CST__KATALSYS_SUBDIR,
+                                           katal.CST__DEFAULT_CONFIGFILE_NAME), "w") as afile:
+                        afile.write(cfgfile)
+
+                    katal.action__rebase(catalogue, newtargetpath)
+
+                    newcatalogue = katal.Catalogue(os.path.join(newtargetpath,
+                                                                katal.CST__KATALSYS_SUBDIR,
+                                                                katal.CST__DATABASE_NAME))
+                    self.assertEqual(sorted(record[3:5] for record in newcatalogue.records()),
+                                     [("new_0.txt", "/src/a.txt"), ("new_1.txt", "/src/b.txt")])
+                    newcatalogue.close()
+                    for index, name in enumerate(("a.txt", "b.txt")):
+                        with open(os.path.join(newtargetpath,
+                                               "new_{0}.txt".format(index))) as afile:
+                            self.assertEqual(afile.read(), name)
+
+                    self.assertEqual(len(list(catalogue.records())), 0 if mode == "move" else 2)
+                    self.assertEqual(os.path.exists(os.path.join(katal.ARGS.targetpath, "a.txt")),
+                                     mode != "move")
+
+                catalogue.close()
+            finally:
+                katal.ARGS.targetpath = targetpath
+                katal.ARGS.rebasemode = None
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__rebaseinplace__resume(self):
+        """
+                Tests.test__rebaseinplace__resume()
+
+                Test of the katal.py::action__rebaseinplace__resume() function :
+                a renaming applied but not marked as done and files which have
+                been removed.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        names = ("a", "b", "c", "d", "f")
+        hashids = dict((name, katal.b64encode(name.encode()*32).decode()) for name in names)
+
+        targetpath = katal.ARGS.targetpath
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = tmpdir
+                os.makedirs(os.path.join(tmpdir, katal.CST__KATALSYS_SUBDIR,
+                                         katal.CST__TASKS_SUBSUBDIR))
+
+                catalogue = katal.Catalogue(os.path.join(tmpdir, "katal.db"))
+                catalogue.create()
+                catalogue.add_files((hashids[name], hashids[name], 1, name, name, 0, "")
+                                    for name in names)
+
+                # "a" and "f" have been removed, "d" has been renamed as "e"
+                # without being marked as done :
+                for name, content in (("b", "b"), ("c", "c"), ("e", "d")):
+                    with open(os.path.join(tmpdir, name), "w") as afile:
+                        afile.write(content)
+
+                moves = {"a" : "b", "b" : "a", "c" : "d", "d" : "e", "f" : "g"}
+                renames = katal.action__rebaseinplace__renames(moves, "temp{0}".format)
+                journal = katal.Journal(
+                    katal.get_journal_fullname(katal.CST__REBASEINPLACE_JOURNALNAME))
+                journal.append([{"rename" : rename} for rename in renames] +
+                               [{"name" : (new, hashids[old])} for old, new in moves.items()])
+                journal.close()
+
+                katal.action__rebaseinplace__resume(catalogue)
+                self.assertFalse(journal.exists())
+
+                # "a" is given to "b", so the record of "a" is removed; "f" isn't renamed :
+                self.assertEqual(sorted((name, hashid) for hashid, name in catalogue.files()),
+                                 [("a", hashids["b"]), ("d", hashids["c"]),
+                                  ("e", hashids["d"]), ("f", hashids["f"])])
+                for name, content in (("a", "b"), ("d", "c"), ("e", "d")):
+                    with open(os.path.join(tmpdir, name)) as afile:
+                        self.assertEqual(afile.read(), content)
+
+                catalogue.close()
+            finally:
+                katal.ARGS.targetpath = targetpath
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__findtag__copyto(self):
+        """
+                Tests.test__findtag__copyto()
+
+                Test of the katal.py::action__findtag() function with --copyto
+                and --copytomode=hardlink/symlink; a missing file isn't copied.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        names = ("a.txt", "b.txt", "missing.txt", "notag.txt")
+        targetpath = katal.ARGS.targetpath
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = os.path.join(tmpdir, "target")
+                os.makedirs(katal.ARGS.targetpath)
+                for name in names:
+                    if name != "missing.txt":
+                        with open(os.path.join(katal.ARGS.targetpath, name), "w") as afile:
+                            afile.write(name)
+
+                catalogue = katal.Catalogue(os.path.join(katal.ARGS.targetpath, "katal.db"))
+                catalogue.create()
+                catalogue.add_files((katal.b64encode(bytes((index,))*32).decode(),
+                                     katal.b64encode(bytes((index,))*32).decode(),
+                                     1, name, name, 0, "" if name == "notag.txt" else ";tag")
+                                    for index, name in enumerate(names))
+
+                for mode in ("hardlink", "symlink"):
+                    katal.ARGS.copytomode = mode
+                    katal.ARGS.copyto = os.path.join(tmpdir, mode)
+                    katal.action__findtag(catalogue, "tag")
+
+                    self.assertEqual(sorted(os.listdir(katal.ARGS.copyto)), ["a.txt", "b.txt"])
+                    for name in ("a.txt", "b.txt"):
+                        copy = os.path.join(katal.ARGS.copyto, name)
+                        self.assertTrue(os.path.samefile(copy,
+                                                         os.path.join(katal.ARGS.targetpath,
+                                                                      name)))
+                        self.assertEqual(os.path.islink(copy), mode == "symlink")
+
+                catalogue.close()
+            finally:
+                katal.ARGS.targetpath = targetpath
+                katal.ARGS.copyto = None
+                katal.ARGS.copytomode = None
+
+    #//////////////////////////////////////////////////////////////////////////
+    def test__rebase__failure(self):
+        """
+                Tests.test__rebase__failure()
+
+                Test of the katal.py::action__rebase() function with
+                --rebasemode=move when a transfer fails : every file moved,
+                including the transfers in flight, is written in the new
+                database and removed from the current one.
+        """
+        katal.CFG_PARAMETERS = katal.read_parameters_from_cfgfile(os.path.join("tests",
+                                                                               "cfgfile1.ini"))
+        katal.CFG_PARAMETERS["io"] = {"workers" : "4"}
+        with open(os.path.join("tests", "cfgfile1.ini")) as afile:
+            cfgfile = afile.read().replace("name of the target files : %%dd__%%i.%%e",
+                                           "name of the target files : new_%%i.%%e")
+        names = ["{0}.txt".format(index) for index in range(8)]
+
+        #.......................................................................
+        def transfer_file(source_name, target_name, sourcedate, mode):
+            """
+                    Fake katal.py::transfer_file() : "2.txt" can't be moved,
+                    the other files are still being moved when it fails.
+            """
+            if os.path.basename(source_name) == "2.txt":
+                raise OSError("2.txt can't be moved")
+            time.sleep(0.05)
+            transfer_file__original(source_name, target_name, sourcedate, mode)
+
+        targetpath = katal.ARGS.targetpath
+        transfer_file__original = katal.transfer_file
+        with tempfile.TemporaryDirectory() as tmpdir:
+            try:
+                katal.ARGS.targetpath = os.path.join(tmpdir, "old")
+                katal.ARGS.rebasemode = "move"
+                newtargetpath = os.path.join(tmpdir, "new")
+                os.makedirs(katal.ARGS.targetpath)
+                os.makedirs(os.path.join(newtargetpath, katal.CST__KATALSYS_SUBDIR))
+                with open(os.path.join(newtargetpath, katal.CST__KATALSYS_SUBDIR,
+                                       katal.CST__DEFAULT_CONFIGFILE_NAME), "w") as afile:
+                    afile.write(cfgfile)
+
+                for name in names:
+                    with open(os.path.join(katal.ARGS.targetpath, name), "w") as afile:
+                        afile.write(name)
+                catalogue = katal.Catalogue(os.path.join(katal.ARGS.targetpath, "katal.db"))
+                catalogue.create()
+                catalogue.add_files((katal.b64encode(bytes((index,))*32).decode(),
+                                     katal.b64encode(bytes((index,))*32).decode(),
+                                     1, name, name, 0, "")
+                                    for index, name in enumerate(names))
+
+                katal.transfer_file = transfer_file
+                with self.assertRaises(OSError):
+                    katal.action__rebase(catalogue, newtargetpath)
+                katal.transfer_file = transfer_file__original
+
+                newcatalogue = katal.Catalogue(os.path.join(newtargetpath,
+                                                            katal.CST__KATALSYS_SUBDIR,
+                                                            katal.CST__DATABASE_NAME))
+                old = [record[3] for record in catalogue.records()]
+                new = [record[3:5] for record in newcatalogue.records()]
+                newcatalogue.close()
+                catalogue.close()
+
+                # the files in flight when "2.txt" failed have been moved :
+                self.assertIn("2.txt", old)
+                self.assertIn("3.txt", [sourcename for _, sourcename in new])
+                self.assertEqual(sorted(old + [sourcename for _, sourcename in new]), names)
+                for name in old:
+                    self.assertTrue(os.path.exists(os.path.join(katal.ARGS.targetpath, name)))
+                for name, _ in new:
+                    self.assertTrue(os.path.exists(os.path.join(newtargetpath, name)))
+            finally:
+                katal.transfer_file = transfer_file__original
+                katal.ARGS.targetpath = targetpath
+                katal.ARGS.rebasemode = None
+                del katal.CFG_PARAMETERS["io"]